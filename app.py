@@ -1,5 +1,10 @@
+import os
+
 from src.api import app
+from src.jobs import start_job_workers
 
 
 if __name__ == '__main__':
+    # Entwicklungsserver: Jobs in Threads dieses Prozesses statt in einem eigenen Job-Prozess
+    start_job_workers(int(os.getenv('JOB_WORKERS', '1')))
     app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1 @@
+"""Benchmarks für die OCR-Pipeline (Aufruf über `python -m benchmarks.<modul>`)."""
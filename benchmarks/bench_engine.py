@@ -0,0 +1,53 @@
+"""Benchmark: Aufwand pro Aufruf mit pytesseract (Prozess pro Aufruf) und tesserocr (Engine-Pool).
+
+Erkennt viele kleine Bilder (typisch für Bild-Uploads und Zeilen-Nacherkennung) nacheinander
+mit beiden Engines. Bei kleinen Bildern dominiert der Start von `tesseract` und das Laden der
+Sprachmodelle, den der Engine-Pool nur einmal pro Sprachauswahl bezahlt. Benötigt Tesseract
+und für die zweite Messung das optionale Paket `tesserocr`.
+
+Aufruf:
+    python -m benchmarks.bench_engine [--images 20] [--lang deu]
+"""
+
+import argparse
+import os
+import time
+
+from PIL import Image, ImageDraw
+
+from src import engine
+
+
+def small_image():
+    """Kleines Bild mit einer Textzeile, etwa ein Ausschnitt oder ein Beleg-Foto-Crop."""
+    image = Image.new('L', (600, 60), 255)
+    ImageDraw.Draw(image).text((10, 20), 'Rechnung Nr. 4711 - Betrag CHF 1234.50', fill=0)
+    return image.resize((1200, 120))
+
+
+def run(name, image, lang, count):
+    os.environ['OCR_ENGINE'] = name
+    engine.image_to_data(image, lang)  # Aufwärmen (Engine laden)
+    start = time.perf_counter()
+    for _ in range(count):
+        engine.image_to_data(image, lang)
+    return (time.perf_counter() - start) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', type=int, default=20)
+    parser.add_argument('--lang', default='deu')
+    args = parser.parse_args()
+
+    image = small_image()
+    print(f"{'Engine':<12} {'ms/Bild':>10}")
+    print(f"{'pytesseract':<12} {run('pytesseract', image, args.lang, args.images) * 1000:>10.1f}")
+    if engine.tesserocr is None:
+        print("tesserocr ist nicht installiert (pip install tesserocr)")
+    else:
+        print(f"{'tesserocr':<12} {run('tesserocr', image, args.lang, args.images) * 1000:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Benchmark: Bildübergabe pro Seite mit und ohne Temp-Dateien / PNG-Umweg.
+
+Vergleicht die frühere Übergabe (PNG in BytesIO für die OCR, JPEG über eine temporäre Datei
+für ReportLab) mit der In-Memory-Übergabe (PIL-Bild direkt an die OCR, JPEG-Puffer über
+`ImageReader` an ReportLab). Tesseract selbst wird nicht ausgeführt, gemessen wird nur der
+Übergabe-Aufwand pro Seite.
+
+Aufruf:
+    python -m benchmarks.bench_handoff [--pages 10] [--dpi 200]
+"""
+
+import argparse
+import io
+import os
+import tempfile
+import time
+
+from PIL import Image, ImageDraw
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+
+def synthetic_page(dpi):
+    """Erzeugt eine A4-Seite mit Textzeilen in der angegebenen Auflösung."""
+    width, height = int(8.27 * dpi), int(11.69 * dpi)
+    image = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(image)
+    for y in range(dpi, height - dpi, dpi // 4):
+        draw.text((dpi, y), 'Rechnung Nr. 4711 - Betrag CHF 1234.50 - Zahlbar innert 30 Tagen', fill='black')
+    return image
+
+
+def legacy_handoff(image, c):
+    """Frühere Übergabe: PNG-Roundtrip für die OCR, JPEG über Temp-Datei für ReportLab."""
+    png = io.BytesIO()
+    image.save(png, format='PNG')
+    png.seek(0)
+    Image.open(png).load()
+
+    temp_image_path = tempfile.mktemp(suffix='.jpg')
+    image.save(temp_image_path, 'JPEG', quality=95)
+    disk_bytes = os.path.getsize(temp_image_path)
+    c.drawImage(temp_image_path, 0, 0, width=A4[0], height=A4[1])
+    os.unlink(temp_image_path)
+    return disk_bytes
+
+
+def in_memory_handoff(image, c):
+    """Aktuelle Übergabe: PIL-Bild direkt, JPEG-Puffer über ImageReader."""
+    image.load()  # OCR erhält das dekodierte Bild ohne Umkodierung
+
+    jpeg_buffer = io.BytesIO()
+    image.convert('RGB').save(jpeg_buffer, 'JPEG', quality=95)
+    jpeg_buffer.seek(0)
+    c.drawImage(ImageReader(jpeg_buffer), 0, 0, width=A4[0], height=A4[1])
+    return 0
+
+
+def run(handoff, image, pages):
+    c = canvas.Canvas(io.BytesIO(), pagesize=A4)
+    disk_bytes = 0
+    start = time.perf_counter()
+    for _ in range(pages):
+        disk_bytes += handoff(image, c)
+        c.showPage()
+    c.save()
+    elapsed = time.perf_counter() - start
+    return elapsed / pages, disk_bytes / pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=10)
+    parser.add_argument('--dpi', type=int, default=200)
+    args = parser.parse_args()
+
+    image = synthetic_page(args.dpi)
+    print(f"Seite: {image.size[0]}x{image.size[1]} Pixel ({args.dpi} DPI), {args.pages} Seiten")
+
+    legacy_time, legacy_disk = run(legacy_handoff, image, args.pages)
+    memory_time, memory_disk = run(in_memory_handoff, image, args.pages)
+
+    print(f"{'Variante':<12} {'ms/Seite':>10} {'Disk-Bytes/Seite':>18}")
+    print(f"{'temp-datei':<12} {legacy_time * 1000:>10.1f} {legacy_disk:>18.0f}")
+    print(f"{'in-memory':<12} {memory_time * 1000:>10.1f} {memory_disk:>18.0f}")
+    print(f"Ersparnis: {(legacy_time - memory_time) * 1000:.1f} ms und {legacy_disk - memory_disk:.0f} Bytes Disk-I/O pro Seite")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Benchmark: OCR mit und ohne Bildvorverarbeitung (`utils.preprocess_image`).
+
+Erzeugt synthetische Seiten mit bekanntem Text (sauberer Scan, schräger Scan mit dunklem Rand,
+großformatiges Kamerabild, Kamerabild mit Schatten), erkennt sie einmal ohne und einmal mit Vorverarbeitung und
+vergleicht Laufzeit pro Seite und Zeichengenauigkeit gegenüber dem Originaltext. Benötigt
+eine lokale Tesseract-Installation mit den Sprachmodellen aus dem Dockerfile.
+
+Aufruf:
+    python -m benchmarks.bench_preprocess [--repeat 1] [--lang deu]
+"""
+
+import argparse
+import difflib
+import os
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+os.environ.setdefault('OCR_CACHE_ENABLED', '0')
+os.environ.setdefault('OCR_SKIP_BLANK_PAGES', '0')
+
+from src import ocr  # noqa: E402
+from .corpus import apply_shadow  # noqa: E402
+
+LINES = [
+    'Rechnung Nr. 4711 vom 12. März 2025',
+    'Sehr geehrte Damen und Herren,',
+    'wir danken Ihnen für Ihren Auftrag und stellen',
+    'Ihnen folgende Leistungen in Rechnung:',
+    'Beratung und Analyse 8 Stunden CHF 1200.00',
+    'Umsetzung der Schnittstelle CHF 3450.50',
+    'Zahlbar innert 30 Tagen ohne Abzug.',
+    'Freundliche Grüsse',
+]
+
+
+def _font(size):
+    for name in ('DejaVuSans.ttf', 'Arial.ttf', 'LiberationSans-Regular.ttf'):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+
+def render_page(size, font_size, skew=0.0, border=False):
+    """Rendert `LINES` auf eine Seite der Größe `size`, optional schräg und mit Scannerrand."""
+    image = Image.new('RGB', size, 'white')
+    draw = ImageDraw.Draw(image)
+    font = _font(font_size)
+    y = size[1] // 8
+    for line in LINES:
+        draw.text((size[0] // 10, y), line, fill='black', font=font)
+        y += int(font_size * 1.8)
+    if skew:
+        image = image.rotate(skew, resample=Image.BICUBIC, fillcolor='white')
+    if border:
+        draw = ImageDraw.Draw(image)
+        draw.rectangle((0, 0, size[0], size[1] // 40), fill='black')
+        draw.rectangle((0, 0, size[0] // 50, size[1]), fill='black')
+    return image
+
+
+CORPUS = {
+    'scan-200dpi': lambda: render_page((1654, 2339), 36),
+    'scan-schraeg-rand': lambda: render_page((1654, 2339), 36, skew=2.5, border=True),
+    'kamera-4000px': lambda: render_page((3024, 4032), 110, skew=-1.5),
+    'kamera-schatten': lambda: apply_shadow(render_page((3024, 4032), 110, skew=-1.5)),
+}
+
+
+def accuracy(recognized):
+    """Zeichengenauigkeit (0-1) des erkannten Textes gegenüber dem Originaltext."""
+    expected = ' '.join(LINES)
+    actual = ' '.join(recognized.split())
+    return difflib.SequenceMatcher(None, expected, actual).ratio()
+
+
+def run(image, lang, preprocess, repeat):
+    if preprocess:
+        os.environ.pop('OCR_PREPROCESS', None)  # Standard: alle Schritte
+    else:
+        os.environ['OCR_PREPROCESS'] = 'none'
+    start = time.perf_counter()
+    for _ in range(repeat):
+        page_result = ocr.ocr_page(image, lang=lang)
+    elapsed = (time.perf_counter() - start) / repeat
+    return elapsed, accuracy(page_result['text'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--lang', default='deu')
+    args = parser.parse_args()
+
+    print(f"{'Seite':<20} {'Variante':<10} {'s/Seite':>8} {'Genauigkeit':>12}")
+    for name, make_page in CORPUS.items():
+        image = make_page()
+        for label, preprocess in (('roh', False), ('vorverarb', True)):
+            elapsed, score = run(image, args.lang, preprocess, args.repeat)
+            print(f"{name:<20} {label:<10} {elapsed:>8.2f} {score:>11.1%}")
+
+
+if __name__ == '__main__':
+    main()
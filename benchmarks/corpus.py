@@ -0,0 +1,214 @@
+"""Deterministische synthetische Testkorpora für die Benchmarks.
+
+Alle Dokumente werden offline aus festen Textbausteinen und einem festen Zufalls-Seed erzeugt,
+zwei Läufe mit denselben Parametern vergleichen also exakt dieselben Eingaben:
+
+- `text-*`: mit ReportLab gesetzte PDFs mit eingebettetem Text (kein OCR nötig)
+- `scan-*`: gerasterte "gescannte" PDFs (nur Bild) in verschiedenen Auflösungen und Seitenzahlen
+- `lang-*`: gescannte Seiten in Englisch, Französisch und Italienisch
+- `mixed-*`: PDFs aus Seiten mit eingebettetem Text und gescannten Seiten
+- `noisy-*`: Bilder mit Rauschen, Schräglage und JPEG-Artefakten
+- `shadow-*`: Kamerafoto mit Helligkeitsverlauf (Schatten über einer Seitenhälfte)
+
+Jeder Eintrag ist ein Dict mit `name`, `filename`, `data` (Bytes), `pages`, `kind`,
+`page_texts` (Originaltext pro Seite) und `expected` (ganzer Originaltext, für die
+Zeichengenauigkeit).
+"""
+
+import io
+import random
+
+from PIL import Image, ImageChops, ImageDraw, ImageFilter, ImageFont
+
+SEED = 4711
+
+TEXTS = {
+    'deu': [
+        'Rechnung Nr. 4711 vom 12. März 2025',
+        'Sehr geehrte Damen und Herren,',
+        'wir danken Ihnen für Ihren Auftrag und stellen',
+        'Ihnen folgende Leistungen in Rechnung:',
+        'Beratung und Analyse 8 Stunden CHF 1200.00',
+        'Umsetzung der Schnittstelle CHF 3450.50',
+        'Die Lieferung erfolgt innerhalb von zwei Wochen.',
+        'Bitte überweisen Sie den Betrag auf unser Konto.',
+        'Zahlbar innert 30 Tagen ohne Abzug.',
+        'Freundliche Grüsse',
+    ],
+    'eng': [
+        'Invoice No. 4711 dated 12 March 2025',
+        'Dear Sir or Madam,',
+        'thank you for your order. We are pleased to invoice',
+        'the following services to your account:',
+        'Consulting and analysis 8 hours CHF 1200.00',
+        'Implementation of the interface CHF 3450.50',
+        'The delivery will be made within two weeks.',
+        'Please transfer the amount to our bank account.',
+        'Payable within 30 days without deduction.',
+        'Kind regards',
+    ],
+    'fra': [
+        'Facture no 4711 du 12 mars 2025',
+        'Madame, Monsieur,',
+        'nous vous remercions de votre commande et vous',
+        'facturons les prestations suivantes :',
+        'Conseil et analyse 8 heures CHF 1200.00',
+        'Réalisation de l\'interface CHF 3450.50',
+        'La livraison sera effectuée dans les deux semaines.',
+        'Veuillez virer le montant sur notre compte.',
+        'Payable dans les 30 jours sans déduction.',
+        'Meilleures salutations',
+    ],
+    'ita': [
+        'Fattura n. 4711 del 12 marzo 2025',
+        'Gentili signore e signori,',
+        'vi ringraziamo per il vostro ordine e vi fatturiamo',
+        'le seguenti prestazioni:',
+        'Consulenza e analisi 8 ore CHF 1200.00',
+        'Realizzazione dell\'interfaccia CHF 3450.50',
+        'La consegna avverrà entro due settimane.',
+        'Vi preghiamo di versare l\'importo sul nostro conto.',
+        'Pagabile entro 30 giorni senza deduzioni.',
+        'Cordiali saluti',
+    ],
+}
+
+# A4 in Punkt
+PAGE_SIZE = (595.27, 841.89)
+FONT_SIZE = 11  # Punkt
+LINES_PER_PAGE = 12
+
+
+def _document(name, filename, data, pages, kind):
+    page_texts = ['\n'.join(lines) for lines in pages]
+    return {'name': name, 'filename': filename, 'data': data, 'pages': len(pages), 'kind': kind,
+            'page_texts': page_texts, 'expected': '\n'.join(page_texts)}
+
+
+def _font(size):
+    for name in ('DejaVuSans.ttf', 'Arial.ttf', 'LiberationSans-Regular.ttf'):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+
+def page_lines(rng, lang):
+    """Zeilen einer Seite: zufällige, aber durch `rng` festgelegte Auswahl der Textbausteine."""
+    return [rng.choice(TEXTS[lang]) for _ in range(LINES_PER_PAGE)]
+
+
+def render_page_image(lines, dpi, skew=0.0, noise=0.0, rng=None):
+    """Rendert Zeilen auf eine A4-Seite in der angegebenen Auflösung (Schrift `FONT_SIZE` Punkt)."""
+    width, height = int(PAGE_SIZE[0] / 72 * dpi), int(PAGE_SIZE[1] / 72 * dpi)
+    image = Image.new('L', (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    font = _font(max(6, round(FONT_SIZE / 72 * dpi)))
+    y = dpi
+    for line in lines:
+        draw.text((dpi, y), line, fill=0, font=font)
+        y += round(FONT_SIZE / 72 * dpi * 1.8)
+    if skew:
+        image = image.rotate(skew, resample=Image.BICUBIC, fillcolor=255)
+    if noise:
+        # Salz-und-Pfeffer-Rauschen mit festem Seed, danach leicht weichgezeichnet wie ein Scan
+        rng = rng or random.Random(SEED)
+        pixels = image.load()
+        for _ in range(int(width * height * noise)):
+            pixels[rng.randrange(width), rng.randrange(height)] = rng.choice((0, 255))
+        image = image.filter(ImageFilter.GaussianBlur(0.6))
+    image.info['dpi'] = (dpi, dpi)
+    return image
+
+
+def apply_shadow(image, strength=0.75):
+    """Legt einen Helligkeitsverlauf über das Bild: links unverändert, rechts um `strength` dunkler.
+
+    Entspricht einem Handyfoto mit Schatten; Papier im Schatten ist dunkler als Schrift im Licht.
+    """
+    gradient = Image.linear_gradient('L').rotate(90, expand=True).resize(image.size)
+    light = gradient.point(lambda v: 255 - round(v * strength))
+    return ImageChops.multiply(image, light.convert(image.mode))
+
+
+def _text_pdf(pages):
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=PAGE_SIZE, invariant=1)
+    for lines in pages:
+        c.setFont('Helvetica', FONT_SIZE)
+        y = PAGE_SIZE[1] - 72
+        for line in lines:
+            c.drawString(72, y, line)
+            y -= FONT_SIZE * 1.8
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def _scanned_pdf(pages, dpi, text_pages=()):
+    """PDF aus Seitenbildern (JPEG, wie vom Scanner); Seiten in `text_pages` mit eingebettetem Text."""
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=PAGE_SIZE, invariant=1)
+    for i, lines in enumerate(pages):
+        if i in text_pages:
+            c.setFont('Helvetica', FONT_SIZE)
+            y = PAGE_SIZE[1] - 72
+            for line in lines:
+                c.drawString(72, y, line)
+                y -= FONT_SIZE * 1.8
+        else:
+            jpeg = io.BytesIO()
+            render_page_image(lines, dpi).save(jpeg, 'JPEG', quality=85)
+            jpeg.seek(0)
+            c.drawImage(ImageReader(jpeg), 0, 0, width=PAGE_SIZE[0], height=PAGE_SIZE[1])
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def build_corpus(quick=False, seed=SEED):
+    """Erzeugt das Korpus. `quick` liefert eine kleine Auswahl für schnelle Läufe (z. B. in CI)."""
+    rng = random.Random(seed)
+    documents = []
+
+    def pages_for(count, lang='deu'):
+        return [page_lines(rng, lang) for _ in range(count)]
+
+    for count in ((1,) if quick else (1, 10)):
+        pages = pages_for(count)
+        documents.append(_document(f'text-{count}p', f'text-{count}p.pdf', _text_pdf(pages), pages, 'text-pdf'))
+
+    scans = ((200, 1),) if quick else ((150, 1), (200, 1), (300, 1), (200, 5))
+    for dpi, count in scans:
+        pages = pages_for(count)
+        documents.append(_document(f'scan-{dpi}dpi-{count}p', f'scan-{dpi}dpi-{count}p.pdf',
+                                   _scanned_pdf(pages, dpi), pages, 'scanned-pdf'))
+
+    for lang in (() if quick else ('eng', 'fra', 'ita')):
+        pages = pages_for(1, lang)
+        documents.append(_document(f'lang-{lang}', f'lang-{lang}.pdf', _scanned_pdf(pages, 200), pages, 'scanned-pdf'))
+
+    if not quick:
+        pages = pages_for(3)
+        documents.append(_document('mixed-3p', 'mixed-3p.pdf', _scanned_pdf(pages, 200, text_pages=(0,)), pages,
+                                   'mixed-pdf'))
+
+    for fmt in (('png',) if quick else ('png', 'jpg')):
+        lines = page_lines(rng, 'deu')
+        image = render_page_image(lines, 200, skew=1.5, noise=0.01, rng=rng)
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG' if fmt == 'jpg' else 'PNG', **({'quality': 60} if fmt == 'jpg' else {}))
+        documents.append(_document(f'noisy-{fmt}', f'noisy.{fmt}', buffer.getvalue(), [lines], 'image'))
+
+    lines = page_lines(rng, 'deu')
+    buffer = io.BytesIO()
+    apply_shadow(render_page_image(lines, 200)).save(buffer, 'JPEG', quality=85)
+    documents.append(_document('shadow-jpg', 'shadow.jpg', buffer.getvalue(), [lines], 'image'))
+
+    return documents
@@ -0,0 +1,317 @@
+"""Benchmark-Suite: ganze Pipeline auf synthetischen Korpora, mit Ergebnis-JSON und Regressionsvergleich.
+
+Erzeugt die Korpora aus `benchmarks.corpus` (offline, deterministisch) und führt für jedes
+Dokument `process_file`, für PDFs zusätzlich `extract_text_from_pdf` und für gescannte PDFs
+`create_pdf_with_text` aus. Pro Lauf werden gemessen:
+
+- Gesamtzeit und Seiten pro Sekunde
+- Zeit pro Stufe (Klassifizierung, Rasterung, Sprachprobe, Leerseiten-Erkennung,
+  Vorverarbeitung, Tesseract, PDF-Erstellung, Zusammenführen); Eigenzeit ohne verschachtelte
+  Stufen, summiert über alle OCR-Threads
+- Spitzen-RSS des Prozesses während des Laufs
+- Zeichengenauigkeit gegenüber dem Originaltext (bei PDF-Ergebnissen über den Text-Layer)
+
+Die Ergebnisse werden als JSON gespeichert; `compare` vergleicht zwei Läufe und meldet
+Regressionen (Rückgabewert 1). Benötigt Tesseract und Poppler wie der Dienst selbst; der
+Ergebnis-Cache ist während der Messung abgeschaltet.
+
+Aufruf:
+    python -m benchmarks.suite run [--quick] [--repeat 1] [--only scan-] [--output ergebnis.json]
+    python -m benchmarks.suite compare basis.json ergebnis.json [--time-threshold 0.15]
+"""
+
+import argparse
+import contextlib
+import difflib
+import functools
+import io
+import json
+import os
+import platform
+import re
+import resource
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import PyPDF2
+
+from src import engine, ocr
+
+from .corpus import build_corpus
+
+# Gemessene Stufen: Funktionen, deren Eigenzeit der Stufe zugerechnet wird
+STAGES = {
+    'classify': [(ocr, 'classify_pdf_page')],
+    'render': [(ocr, 'convert_from_path')],
+    'language_probe': [(ocr, 'probe_language')],
+    'blank_check': [(ocr, 'is_blank_page')],
+    'preprocess': [(ocr, 'preprocess_image')],
+    'tesseract': [(engine, 'image_to_data'), (engine, 'image_to_string')],
+    'ocr_other': [(ocr, 'ocr_page')],
+    'draw_pdf': [(ocr, '_draw_page_with_text'), (ocr, '_draw_text_layer')],
+    'merge_pdf': [(ocr, '_merge_hybrid_pdf'), (ocr, '_overlay_text_layer')],
+}
+
+_local = threading.local()
+
+
+def _timed(stage, func, totals, lock):
+    """Misst die Eigenzeit von `func`: Zeit verschachtelter gemessener Aufrufe im selben Thread zählt nicht mit."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        stack = _local.__dict__.setdefault('stack', [])
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            with lock:
+                totals[stage] = totals.get(stage, 0.0) + elapsed - children
+    return wrapper
+
+
+@contextlib.contextmanager
+def stage_timings():
+    """Instrumentiert die Funktionen aus `STAGES` und liefert ein Dict mit Sekunden pro Stufe."""
+    totals, lock, originals = {}, threading.Lock(), []
+    for stage, targets in STAGES.items():
+        for module, name in targets:
+            original = getattr(module, name)
+            originals.append((module, name, original))
+            setattr(module, name, _timed(stage, original, totals, lock))
+    try:
+        yield totals
+    finally:
+        for module, name, original in originals:
+            setattr(module, name, original)
+
+
+def _current_rss():
+    """Aktueller Arbeitsspeicher des Prozesses in Bytes (Linux: /proc, sonst Spitzenwert aus getrusage)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+@contextlib.contextmanager
+def peak_rss(interval=0.01):
+    """Tastet den RSS während des Blocks ab und liefert ein Dict mit `peak` (Bytes)."""
+    result = {'peak': _current_rss()}
+    stop = threading.Event()
+
+    def sample():
+        while not stop.wait(interval):
+            result['peak'] = max(result['peak'], _current_rss())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    try:
+        yield result
+    finally:
+        stop.set()
+        sampler.join()
+        result['peak'] = max(result['peak'], _current_rss())
+
+
+def _normalize(text):
+    text = re.sub(r'--- Seite \d+ ---', ' ', text or '')
+    return ' '.join(text.split())
+
+
+def char_accuracy(expected, actual):
+    """Zeichengenauigkeit (0-1) des erkannten Textes gegenüber dem Originaltext, Leerraum normalisiert."""
+    return round(difflib.SequenceMatcher(None, _normalize(expected), _normalize(actual), autojunk=False).ratio(), 4)
+
+
+def pdf_text(path):
+    """Text aller Seiten einer PDF (bei Ergebnis-PDFs der unsichtbare Text-Layer)."""
+    with open(path, 'rb') as f:
+        return '\n'.join(page.extract_text() or '' for page in PyPDF2.PdfReader(f).pages)
+
+
+def _result_text(result):
+    """Text eines Pipeline-Ergebnisses; Ergebnis-PDFs werden gelesen und danach gelöscht."""
+    if isinstance(result, os.PathLike):
+        try:
+            return pdf_text(result)
+        finally:
+            os.unlink(result)
+    return result if isinstance(result, str) else ''
+
+
+def run_process_file(document):
+    return _result_text(ocr.process_file(io.BytesIO(document['data']), document['filename']))
+
+
+def run_extract_text_from_pdf(document):
+    return _result_text(ocr.extract_text_from_pdf(io.BytesIO(document['data'])))
+
+
+def run_create_pdf_with_text(document):
+    with tempfile.TemporaryDirectory(prefix='pdf2ocr-bench-') as work_dir:
+        input_path = os.path.join(work_dir, document['filename'])
+        output_path = os.path.join(work_dir, 'with_text.pdf')
+        with open(input_path, 'wb') as f:
+            f.write(document['data'])
+        if not ocr.create_pdf_with_text(input_path, document['page_texts'], output_path):
+            raise RuntimeError('create_pdf_with_text failed')
+        return pdf_text(output_path)
+
+
+FUNCTIONS = {
+    'process_file': (run_process_file, ('text-pdf', 'scanned-pdf', 'mixed-pdf', 'image')),
+    'extract_text_from_pdf': (run_extract_text_from_pdf, ('text-pdf', 'scanned-pdf', 'mixed-pdf')),
+    'create_pdf_with_text': (run_create_pdf_with_text, ('scanned-pdf',)),
+}
+
+
+def measure(document, function_name):
+    """Führt eine Funktion einmal auf einem Dokument aus und liefert die Messwerte."""
+    runner = FUNCTIONS[function_name][0]
+    entry = {'document': document['name'], 'kind': document['kind'], 'pages': document['pages'],
+             'function': function_name}
+    with peak_rss() as memory, stage_timings() as stages, contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        try:
+            text = runner(document)
+        except Exception as e:
+            text = ''
+            entry['error'] = str(e)
+        seconds = time.perf_counter() - start
+    entry.update({
+        'seconds': round(seconds, 4),
+        'pages_per_second': round(document['pages'] / seconds, 3) if seconds else None,
+        'peak_rss_mb': round(memory['peak'] / 1024 / 1024, 1),
+        'accuracy': char_accuracy(document['expected'], text),
+        'stages': {stage: round(value, 4) for stage, value in sorted(stages.items())},
+    })
+    return entry
+
+
+def run_suite(quick=False, repeat=1, only=None):
+    """Misst alle Dokumente und Funktionen; bei `repeat` > 1 zählt der Lauf mit der mittleren Zeit."""
+    os.environ.setdefault('OCR_CACHE_ENABLED', '0')  # sonst misst jede Wiederholung nur den Cache
+    results = []
+    for document in build_corpus(quick=quick):
+        if only and not document['name'].startswith(only):
+            continue
+        for function_name, (_, kinds) in FUNCTIONS.items():
+            if document['kind'] not in kinds:
+                continue
+            runs = sorted((measure(document, function_name) for _ in range(repeat)), key=lambda r: r['seconds'])
+            entry = runs[len(runs) // 2]
+            results.append(entry)
+            print(f"{entry['document']:<18} {function_name:<22} {entry['seconds']:>8.2f}s "
+                  f"{entry['pages_per_second'] or 0:>7.2f} S/s {entry['peak_rss_mb']:>8.1f} MB "
+                  f"{entry['accuracy']:>7.1%}" + (f"  FEHLER: {entry['error']}" if 'error' in entry else ''))
+    return {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'engine': engine.engine_name(),
+            'ocr_workers': ocr._default_ocr_workers(),
+            'quick': quick,
+            'repeat': repeat,
+            'env': {key: value for key, value in sorted(os.environ.items()) if key.startswith('OCR_')},
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current, time_threshold=0.15, memory_threshold=0.2, accuracy_threshold=0.02,
+            min_seconds=0.05):
+    """Vergleicht zwei Läufe und liefert eine Liste gefundener Regressionen (Texte).
+
+    Eine Regression ist eine um mehr als `time_threshold` (relativ) längere Laufzeit, ein um mehr
+    als `memory_threshold` höherer Spitzen-RSS oder eine um mehr als `accuracy_threshold`
+    (absolut) niedrigere Zeichengenauigkeit. Laufzeiten unter `min_seconds` werden wegen
+    Messrauschen nicht verglichen.
+    """
+    before = {(r['document'], r['function']): r for r in baseline['results']}
+    regressions = []
+    for entry in current['results']:
+        key = (entry['document'], entry['function'])
+        old = before.get(key)
+        if old is None:
+            continue
+        name = f"{key[0]} / {key[1]}"
+        if 'error' in entry and 'error' not in old:
+            regressions.append(f"{name}: Fehler {entry['error']}")
+            continue
+        if max(old['seconds'], entry['seconds']) >= min_seconds and \
+                entry['seconds'] > old['seconds'] * (1 + time_threshold):
+            regressions.append(f"{name}: Laufzeit {old['seconds']:.2f}s -> {entry['seconds']:.2f}s "
+                               f"(+{entry['seconds'] / old['seconds'] - 1:.0%})")
+        if entry['peak_rss_mb'] > old['peak_rss_mb'] * (1 + memory_threshold):
+            regressions.append(f"{name}: Spitzen-RSS {old['peak_rss_mb']:.0f} MB -> {entry['peak_rss_mb']:.0f} MB")
+        if entry['accuracy'] < old['accuracy'] - accuracy_threshold:
+            regressions.append(f"{name}: Genauigkeit {old['accuracy']:.1%} -> {entry['accuracy']:.1%}")
+    return regressions
+
+
+def _print_comparison(baseline, current):
+    before = {(r['document'], r['function']): r for r in baseline['results']}
+    print(f"{'Dokument':<18} {'Funktion':<22} {'Zeit alt':>9} {'Zeit neu':>9} {'Genauigkeit':>12}")
+    for entry in current['results']:
+        old = before.get((entry['document'], entry['function']))
+        if old is None:
+            print(f"{entry['document']:<18} {entry['function']:<22} {'neu':>9} {entry['seconds']:>8.2f}s")
+            continue
+        print(f"{entry['document']:<18} {entry['function']:<22} {old['seconds']:>8.2f}s {entry['seconds']:>8.2f}s "
+              f"{old['accuracy']:>5.1%} -> {entry['accuracy']:.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='Korpus erzeugen und messen')
+    run_parser.add_argument('--quick', action='store_true', help='kleines Korpus für schnelle Läufe')
+    run_parser.add_argument('--repeat', type=int, default=1)
+    run_parser.add_argument('--only', help='nur Dokumente, deren Name so beginnt (z. B. scan-)')
+    run_parser.add_argument('--output', help='Ergebnis als JSON speichern')
+
+    compare_parser = commands.add_parser('compare', help='zwei Ergebnisdateien vergleichen')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--time-threshold', type=float, default=0.15)
+    compare_parser.add_argument('--memory-threshold', type=float, default=0.2)
+    compare_parser.add_argument('--accuracy-threshold', type=float, default=0.02)
+    compare_parser.add_argument('--min-seconds', type=float, default=0.05)
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        report = run_suite(quick=args.quick, repeat=args.repeat, only=args.only)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+            print(f"Ergebnis gespeichert: {args.output}")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    _print_comparison(baseline, current)
+    regressions = compare(baseline, current, args.time_threshold, args.memory_threshold,
+                          args.accuracy_threshold, args.min_seconds)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if not regressions:
+        print("Keine Regressionen")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
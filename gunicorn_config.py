@@ -1,16 +1,23 @@
 # gunicorn_config.py
+import gc
+import os
+import subprocess
+import sys
 
 # Server socket
 bind = "0.0.0.0:5000"
 backlog = 2048
 
 # Worker processes
-workers = 4
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+# Die Worker teilen sich die CPU-Kerne für die Seiten-OCR (OCR_WORKERS, siehe src/ocr.py)
+os.environ["WEB_CONCURRENCY"] = str(workers)
 worker_class = "sync"  # Für CPU-intensive Tasks wie OCR
 worker_connections = 1000
 
 # Worker timeout (in seconds)
 # Wichtig: OCR-Verarbeitung kann lange dauern (PDF zu Bild, OCR pro Seite, PDF-Erstellung)
+# Nur der synchrone Endpoint /api/ocr braucht so viel Zeit; /api/jobs antwortet sofort.
 timeout = 900  # 15 Minuten
 graceful_timeout = 900  # Wartezeit beim Shutdown
 keepalive = 2  # Zeit, die Keep-Alive-Verbindungen aufrechterhalten werden
@@ -25,6 +32,72 @@ errorlog = "-"   # stderr
 loglevel = "info"
 access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s" %(D)s'
 
+# Anwendung und schwere Module einmal im Master laden, die Worker teilen die Module
+# copy-on-write und starten ohne Import-Kosten (GUNICORN_PRELOAD=0 schaltet ab)
+preload_app = os.getenv("GUNICORN_PRELOAD", "1").lower() not in ("0", "false", "no")
+
+
+# Job-Prozess (python -m src.jobs) vom Master starten, wenn kein eigener Prozess dafür läuft
+# (Docker-Image: JOB_PROCESS=1; mit Procfile übernimmt das der `worker`-Prozess)
+job_process = os.getenv("JOB_PROCESS", "0").lower() in ("1", "true", "yes")
+_job_process = None
+
+
+def on_starting(server):
+    """Metrik-Dateien früherer Läufe entfernen, die Zähler beginnen mit dem Dienst bei 0."""
+    from src import metrics
+    metrics.reset()
+
+
+def when_ready(server):
+    """Läuft im Master, nachdem die App geladen ist und bevor die Worker geforkt werden."""
+    global _job_process
+    if job_process and _job_process is None:
+        # Eigener Prozess statt Threads in den HTTP-Workern: läuft ab dem Start und übersteht
+        # das Recycling der Worker durch max_requests
+        _job_process = subprocess.Popen([sys.executable, "-m", "src.jobs"])
+        server.log.info(f"Job-Prozess gestartet (PID {_job_process.pid})")
+    if server.cfg.preload_app:
+        from src import warmup
+        warmup.preload()
+        # Vorhandene Objekte vom Garbage Collector ausnehmen, damit er die geteilten Seiten
+        # in den Workern nicht anfasst (und dadurch kopiert)
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    """Tesseract-Engines und OCR-Pool lassen sich nicht vererben: pro Worker vorwärmen (siehe /ready)."""
+    from src import jobs, warmup
+    warmup.start_worker_warm_up()
+    # Nur mit JOB_WORKERS > 0: Job-Threads zusätzlich im HTTP-Worker (Standard: eigener Prozess)
+    jobs.start_job_workers()
+
+
+def worker_exit(server, worker):
+    """Im Worker vor dem Beenden (z. B. Recycling durch max_requests): letzte Zählerstände schreiben."""
+    from src import metrics
+    try:
+        metrics.flush()
+    except OSError as e:
+        server.log.warning(f"Metriken konnten nicht geschrieben werden: {e}")
+
+
+def child_exit(server, worker):
+    """Im Master: Metrik-Datei des beendeten Workers in die Summe einfalten (siehe src/metrics.py)."""
+    from src import metrics
+    metrics.retire(worker.pid)
+
+
+def on_exit(server):
+    """Job-Prozess mitbeenden; laufende Jobs dürfen bis graceful_timeout fertig werden."""
+    if _job_process is not None and _job_process.poll() is None:
+        _job_process.terminate()
+        try:
+            _job_process.wait(graceful_timeout)
+        except subprocess.TimeoutExpired:
+            _job_process.kill()
+
+
 # Process naming
 proc_name = "pdf2ocr"
 
@@ -5,6 +5,8 @@ Leeres Modul, damit `import src.*` in Tests und Anwendung funktioniert.
 
 __all__ = [
     "api",
+    "cache",
+    "jobs",
     "ocr",
     "utils",
 ]
@@ -0,0 +1,235 @@
+"""Zulassungskontrolle (Admission Control) für synchrone OCR-Requests.
+
+Mit `worker_class = "sync"` belegt jeder Request einen Gunicorn-Worker, bis die OCR fertig ist.
+Damit eine Welle großer PDFs nicht alle Worker blockiert und Health-Checks sowie kleine Bilder
+im Backlog verhungern, wird der Aufwand jedes Uploads vor der eigentlichen Verarbeitung
+geschätzt (`estimate_cost`, Megapixel, die gerastert und erkannt werden müssen) und über
+`admit` gegen ein gemeinsames Budget gebucht:
+
+- Große Requests (über `OCR_ADMISSION_SMALL_COST`) dürfen zusammen höchstens
+  `OCR_ADMISSION_BUDGET` Megapixel in Arbeit haben und höchstens `OCR_ADMISSION_MAX_LARGE`
+  Worker belegen, sonst HTTP 503. So bleibt immer ein Worker für kleine Requests frei.
+- Optional laufen pro API-Key (ohne Key pro Client-Adresse) höchstens
+  `OCR_MAX_CONCURRENT_PER_KEY` große Requests gleichzeitig, sonst HTTP 429. Kleine Requests
+  zählen nicht mit; bei einem gemeinsamen Key für alle Clients bleibt das Limit aus.
+
+Die Buchungen (Leases) liegen wie Jobs und Cache in einer SQLite-Datenbank, damit alle Worker
+dasselbe Budget sehen. Leases abgestürzter Worker werden beim nächsten Zugriff entfernt. Ist die
+Datenbank nicht nutzbar (gesperrt, Platte voll), werden Requests ohne Kontrolle zugelassen.
+"""
+
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+
+import PyPDF2
+from PIL import Image
+
+from . import metrics
+from .ocr import PDF_DPI, render_dpi, _resources_have_fonts
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_DIR = os.getenv('OCR_ADMISSION_DIR', os.path.join(tempfile.gettempdir(), 'pdf2ocr-admission'))
+
+# Megapixel, die große Requests gemeinsam in Arbeit haben dürfen (0 schaltet die Kontrolle ab)
+ADMISSION_BUDGET = float(os.getenv('OCR_ADMISSION_BUDGET', '400'))
+
+# Requests bis zu dieser Größe (Megapixel) werden nie wegen des Budgets abgewiesen
+ADMISSION_SMALL_COST = float(os.getenv('OCR_ADMISSION_SMALL_COST', '8'))
+
+# Große Requests gleichzeitig (Standard: alle Gunicorn-Worker bis auf einen)
+ADMISSION_MAX_LARGE = int(os.getenv('OCR_ADMISSION_MAX_LARGE', '0')) or max(
+    1, int(os.getenv('WEB_CONCURRENCY', '1') or 1) - 1)
+
+# Gleichzeitige große Requests pro API-Key bzw. Client (Standard 0 = unbegrenzt)
+MAX_CONCURRENT_PER_KEY = int(os.getenv('OCR_MAX_CONCURRENT_PER_KEY', '0'))
+
+# Wartezeit für den Retry-After-Header abgewiesener Requests (Sekunden)
+RETRY_AFTER = int(os.getenv('OCR_RETRY_AFTER', '10'))
+
+# Leases, die länger laufen als der Gunicorn-Timeout, gelten als verwaist
+LEASE_TIMEOUT = int(os.getenv('OCR_ADMISSION_LEASE_TIMEOUT', '900'))
+
+# PDF-Seiten mit eingebetteten Schriften und ohne Bilder werden (meist) nicht gerastert
+TEXT_PAGE_COST = 0.1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    id TEXT PRIMARY KEY,
+    identity TEXT NOT NULL,
+    cost REAL NOT NULL,
+    large INTEGER NOT NULL,
+    pid INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+class AdmissionRejected(Exception):
+    """Request wird abgewiesen; `status` ist 429 (Limit des Keys) oder 503 (Dienst ausgelastet)."""
+
+    def __init__(self, status, message, retry_after=RETRY_AFTER):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def admission_enabled():
+    return ADMISSION_BUDGET > 0
+
+
+def _connect():
+    os.makedirs(ADMISSION_DIR, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(ADMISSION_DIR, 'admission.db'), timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def estimate_cost(file_stream, filename, pages=None):
+    """Schätzt den Aufwand eines Uploads in Megapixeln, ohne zu rastern.
+
+    PDF-Seiten zählen mit ihrer Fläche bei der Rasterauflösung (`OCR_DPI`, bei `auto` `PDF_DPI`),
+    Seiten mit Schriften und ohne Bilder pauschal `TEXT_PAGE_COST`. Bilder zählen mit ihrer
+    Pixelfläche pro Frame. Mit `pages` nur diese Seiten. Nicht lesbare Dateien kosten 0, der
+    Fehler wird dann von der Verarbeitung gemeldet.
+    """
+    extension = filename.lower().rsplit('.', 1)[-1] if '.' in filename else ''
+    try:
+        file_stream.seek(0)
+        if extension == 'pdf':
+            dpi = render_dpi()
+            dpi = PDF_DPI if dpi == 'auto' else dpi
+            reader = PyPDF2.PdfReader(file_stream)
+            page_count = len(reader.pages)
+            cost = 0.0
+            for i in (range(page_count) if pages is None else [i for i in pages if i < page_count]):
+                page = reader.pages[i]
+                resources = page.get('/Resources')
+                if _resources_have_fonts(resources) and not _has_images(resources):
+                    cost += TEXT_PAGE_COST
+                else:
+                    box = page.mediabox
+                    cost += float(box.width) * float(box.height) * (dpi / 72) ** 2 / 1e6
+            return cost
+        image = Image.open(file_stream)
+        frames = getattr(image, 'n_frames', 1)
+        selected = frames if pages is None else len([i for i in pages if i < frames])
+        return image.size[0] * image.size[1] * selected / 1e6
+    except Exception:
+        return 0.0
+    finally:
+        file_stream.seek(0)
+
+
+def _has_images(resources):
+    """Prüft, ob die Seiten-Ressourcen Bilder enthalten (gescannte Seite, ggf. mit Text-Layer)."""
+    if resources is None:
+        return False
+    xobjects = resources.get_object().get('/XObject')
+    if not xobjects:
+        return False
+    return any(x.get_object().get('/Subtype') == '/Image' for x in xobjects.get_object().values())
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _prune(conn):
+    """Entfernt Leases von beendeten Workern und solche, die älter als `LEASE_TIMEOUT` sind."""
+    conn.execute('DELETE FROM leases WHERE created_at < ?', (time.time() - LEASE_TIMEOUT,))
+    for row in conn.execute('SELECT DISTINCT pid FROM leases').fetchall():
+        if not _process_alive(row['pid']):
+            conn.execute('DELETE FROM leases WHERE pid = ?', (row['pid'],))
+
+
+def admit(identity, cost):
+    """Bucht einen Request mit Aufwand `cost` für `identity` und liefert die Lease-ID.
+
+    Wirft `AdmissionRejected`, wenn das Limit des Keys oder das globale Budget erschöpft ist.
+    Die Lease muss nach der Verarbeitung mit `release` freigegeben werden. Ist die Datenbank nicht
+    nutzbar, wird der Request ohne Lease zugelassen (None): die Kontrolle schützt die Worker und
+    soll selbst keine Requests scheitern lassen.
+    """
+    large = cost > ADMISSION_SMALL_COST
+    try:
+        lease_id = _book(identity, cost, large)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(f"Zulassungskontrolle nicht verfügbar, Request wird ohne Kontrolle zugelassen: {e}")
+        metrics.inc('pdf2ocr_admission_total', decision='error')
+        return None
+    metrics.inc('pdf2ocr_admission_total', decision='admitted', size='large' if large else 'small')
+    return lease_id
+
+
+def _book(identity, cost, large):
+    conn = _connect()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            _prune(conn)
+            if large and MAX_CONCURRENT_PER_KEY:
+                running = conn.execute('SELECT COUNT(*) FROM leases WHERE identity = ? AND large = 1',
+                                       (identity,)).fetchone()[0]
+                if running >= MAX_CONCURRENT_PER_KEY:
+                    metrics.inc('pdf2ocr_admission_total', decision='rejected_key')
+                    raise AdmissionRejected(
+                        429, f"Too many concurrent large requests for this API key (max {MAX_CONCURRENT_PER_KEY})")
+            if large:
+                count, used = conn.execute(
+                    'SELECT COUNT(*), COALESCE(SUM(cost), 0) FROM leases WHERE large = 1').fetchone()
+                # Ein einzelner übergroßer Request darf laufen, wenn sonst nichts Großes läuft
+                if count >= ADMISSION_MAX_LARGE or (count and used + cost > ADMISSION_BUDGET):
+                    metrics.inc('pdf2ocr_admission_total', decision='rejected_budget')
+                    raise AdmissionRejected(503, 'Service saturated, please retry later')
+            lease_id = uuid.uuid4().hex
+            conn.execute('INSERT INTO leases (id, identity, cost, large, pid, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+                         (lease_id, identity, cost, int(large), os.getpid(), time.time()))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+    finally:
+        conn.close()
+    return lease_id
+
+
+def release(lease_id):
+    """Gibt eine Lease frei (mehrfacher Aufruf ist unschädlich).
+
+    Fehler der Datenbank werden nur geloggt, die Lease verfällt dann nach `LEASE_TIMEOUT`.
+    """
+    try:
+        conn = _connect()
+        try:
+            conn.execute('DELETE FROM leases WHERE id = ?', (lease_id,))
+        finally:
+            conn.close()
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(f"Lease {lease_id} konnte nicht freigegeben werden: {e}")
+
+
+def usage():
+    """Laufende Requests und gebuchter Aufwand, getrennt nach klein und groß (für `/metrics`)."""
+    conn = _connect()
+    try:
+        _prune(conn)
+        rows = conn.execute('SELECT large, COUNT(*) AS n, COALESCE(SUM(cost), 0) AS cost FROM leases GROUP BY large')
+        result = {'small': {'requests': 0, 'cost': 0.0}, 'large': {'requests': 0, 'cost': 0.0}}
+        for row in rows:
+            result['large' if row['large'] else 'small'] = {'requests': row['n'], 'cost': row['cost']}
+    finally:
+        conn.close()
+    return result
@@ -1,10 +1,34 @@
-from flask import Flask, request, jsonify, redirect
+import logging
+import os
+import shutil
+
+from flask import Flask, Response, request, jsonify, redirect, send_file, stream_with_context
 from flasgger import Swagger
-from .ocr import process_file
-from .utils import require_api_key
+from werkzeug.middleware.proxy_fix import ProxyFix
+from .ocr import (process_file, check_document, iter_document_pages, parse_page_ranges, parse_regions,
+                  OUTPUT_MODES, IMAGE_OUTPUTS)
+from .formats import iter_formatted, FORMATS, MIMETYPES
+from .compression import COMPRESSION_PRESETS
+from .batch import spool_uploads, stream_batch, new_work_dir, OUTPUT_FORMATS
+from .jobs import submit_job, get_job, job_status, queue_depth
+from .cache import cache_stats
+from .admission import AdmissionRejected, admission_enabled, estimate_cost, admit, release, usage
+from .utils import require_api_key, request_identity
+from .warmup import start_worker_warm_up, readiness
+from . import metrics
+
+logger = logging.getLogger(__name__)
+metrics.configure_logging()
 
 app = Flask(__name__)
 
+# Hinter Heroku, Coolify oder einem Reverse Proxy ist `remote_addr` die Adresse des Proxys; die
+# Client-Adresse (Kontingente ohne API-Key) steht in X-Forwarded-For. Anzahl vertrauenswürdiger
+# Proxys über `TRUSTED_PROXIES` (Standard 1, 0 wertet den Header nicht aus)
+_trusted_proxies = int(os.getenv('TRUSTED_PROXIES', '1'))
+if _trusted_proxies:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=_trusted_proxies)
+
 # Swagger configuration with security definitions
 swagger_config = {
     "headers": [],
@@ -38,6 +62,114 @@ swagger_config = {
 swagger = Swagger(app, config=swagger_config)
 
 
+def _ocr_options_from_request():
+    """Liest optionale Verarbeitungsparameter aus dem Formular. Wirft ValueError bei ungültigen Werten."""
+    options = {}
+    mode = request.form.get('mode')
+    if mode:
+        if mode not in OUTPUT_MODES:
+            raise ValueError(f"Invalid mode '{mode}', expected one of: {', '.join(OUTPUT_MODES)}")
+        options['output_mode'] = mode
+    image_output = request.form.get('image_output')
+    if image_output:
+        if image_output not in IMAGE_OUTPUTS:
+            raise ValueError(f"Invalid image_output '{image_output}', expected one of: {', '.join(IMAGE_OUTPUTS)}")
+        options['image_output'] = image_output
+    compression = request.form.get('compression')
+    if compression:
+        if compression not in COMPRESSION_PRESETS:
+            raise ValueError(f"Invalid compression '{compression}', expected one of: {', '.join(COMPRESSION_PRESETS)}")
+        options['compression'] = compression
+    pages = request.form.get('pages')
+    if pages:
+        options['pages'] = parse_page_ranges(pages)
+    regions = request.form.get('regions')
+    if regions:
+        options['regions'] = parse_regions(regions)
+    return options
+
+
+def _result_pdf_name(filename):
+    """Dateiname der durchsuchbaren PDF zu einer Eingabedatei (`scan.pdf`/`fax.tif` -> `..._with_text.pdf`)."""
+    return os.path.splitext(filename)[0] + '_with_text.pdf'
+
+
+def _language_headers(language):
+    """Header mit der gewählten OCR-Sprachauswahl (für PDF-Antworten, die kein JSON sind)."""
+    return {'X-OCR-Language': language} if language else {}
+
+
+def _send_result_pdf(path, download_name, language=None):
+    """Streamt eine Ergebnis-PDF in Blöcken (bzw. per sendfile) und löscht sie nach der Antwort."""
+    response = send_file(os.fspath(path), mimetype='application/pdf', as_attachment=True,
+                         download_name=download_name)
+    response.headers['fileName'] = download_name
+    response.headers.update(_language_headers(language))
+
+    def remove_result():
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    response.call_on_close(remove_result)
+    return response
+
+
+def _admit(file, options):
+    """Schätzt den Aufwand des Uploads und bucht ihn (siehe `admission`). Liefert die Lease-ID oder None."""
+    if not admission_enabled():
+        return None
+    cost = estimate_cost(file.stream, file.filename, options.get('pages'))
+    return admit(request_identity(), cost)
+
+
+def _admit_batch(entries, options):
+    """Bucht den geschätzten Aufwand aller gespoolten Dateien eines Stapels als eine Lease."""
+    if not admission_enabled():
+        return None
+    cost = 0.0
+    for filename, path in entries:
+        with open(path, 'rb') as f:
+            cost += estimate_cost(f, filename, options.get('pages'))
+    return admit(request_identity(), cost)
+
+
+def _release(lease):
+    if lease:
+        release(lease)
+
+
+def _rejected(error):
+    """Antwort für abgewiesene Requests mit `Retry-After`."""
+    response = jsonify({'error': str(error), 'retry_after': error.retry_after})
+    response.status_code = error.status
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
+def _structured_result(file, output_format, options):
+    """Streamt das Ergebnis einer Datei Seite für Seite als JSON, hOCR oder ALTO.
+
+    Die Datei wird vor der Antwort geöffnet und geprüft, da der Status mit der ersten Seite
+    gesendet wird. Der Ergebnis-Cache wird hier nicht genutzt (siehe `iter_document_pages`).
+    """
+    if output_format not in FORMATS:
+        return jsonify({'error': f"Invalid format '{output_format}', expected one of: {', '.join(FORMATS)}"}), 400
+    try:
+        check_document(file.stream, file.filename)
+    except ValueError as e:
+        logger.info(f"API: {file.filename} abgewiesen: {e}")
+        return jsonify({'error': str(e)}), 400
+
+    logger.info(f"API: Verarbeite Datei {file.filename} (Format {output_format})")
+    details = {}
+    pages = iter_document_pages(file.stream, file.filename, details=details,
+                                pages=options.get('pages'), regions=options.get('regions'))
+    body = stream_with_context(iter_formatted(output_format, pages, details))
+    return Response(body, mimetype=MIMETYPES[output_format])
+
+
 @app.route('/apidocs')
 def apidocs():
     """Redirect to Swagger UI"""
@@ -66,17 +198,20 @@ def ocr_endpoint():
           
           **Unterstützte Formate:**
           - **PDF**: Direkte Textextraktion oder OCR nach Bildkonvertierung
-          - **Bilder**: PNG, JPG, JPEG, GIF, BMP, TIFF
+          - **Bilder**: PNG, JPG, JPEG, GIF, BMP, TIFF (auch mehrseitige TIFFs und GIFs)
           
           **Verarbeitung:**
-          - PDFs werden zuerst auf eingebetteten Text geprüft
-          - Falls kein Text gefunden wird, werden PDF-Seiten zu Bildern konvertiert und OCR angewendet
-          - Bilder werden direkt mit OCR verarbeitet
+          - PDF-Seiten werden einzeln auf eingebetteten Text geprüft
+          - Nur Seiten ohne eingebetteten Text werden zu Bildern konvertiert und per OCR erkannt;
+            gemischte Dokumente werden aus beiden Seitenarten zusammengesetzt
+          - Bilder werden direkt mit OCR verarbeitet, mehrseitige Bilder Frame für Frame wie PDF-Seiten
           
           **Automatische Spracherkennung:**
           - Erkennt automatisch Deutsch, Englisch, Französisch und Italienisch
-          - Optimiert OCR-Genauigkeit basierend auf erkannten Sprachen
+          - Die Sprache wird einmal pro Dokument bestimmt (eingebetteter Text oder Probe-Lauf auf
+            der verkleinerten ersten Seite), alle Seiten laufen dann nur mit diesen Sprachmodellen
           - Fallback auf Mehrsprachen-Modus bei unsicherer Erkennung
+          - Die gewählte Sprachauswahl steht im Feld `language` bzw. im Header `X-OCR-Language`
         security:
           - ApiKeyAuth: []
           - BearerAuth: []
@@ -86,11 +221,66 @@ def ocr_endpoint():
             type: file
             required: true
             description: Datei für OCR-Verarbeitung (PDF oder Bild)
+          - in: formData
+            name: mode
+            type: string
+            enum: [rebuild, overlay]
+            required: false
+            description: |
+              Ausgabemodus für gescannte PDF-Seiten. `rebuild` baut die Seite als Bild neu auf,
+              `overlay` legt nur den unsichtbaren Text-Layer auf die Originalseite (kleinere Dateien,
+              Originalauflösung und Seitengröße bleiben erhalten). Standard: `OCR_OUTPUT_MODE`.
+          - in: formData
+            name: image_output
+            type: string
+            enum: [text, pdf]
+            required: false
+            description: |
+              Ergebnis für Bilddateien: `text` (JSON) oder `pdf` (durchsuchbare PDF mit einer Seite
+              pro Frame). Standard: `OCR_IMAGE_OUTPUT`.
+          - in: formData
+            name: compression
+            type: string
+            enum: [size, balanced, quality]
+            required: false
+            description: |
+              Kompression der Seitenbilder neu aufgebauter PDFs (`mode=rebuild`, `image_output=pdf`).
+              Schwarz-Weiß-Seiten werden als CCITT G4 eingebettet, Graustufen- und Farbseiten als
+              JPEG; `size` verkleinert stärker (niedrigere Qualität und Auflösung), `quality`
+              behält die Auflösung. Standard: `OCR_COMPRESSION` (`balanced`).
+          - in: formData
+            name: format
+            type: string
+            enum: [json, hocr, alto]
+            required: false
+            description: |
+              Strukturiertes Ergebnis statt PDF bzw. Text: `json` (Absätze, Zeilen und Wörter mit
+              Boxen und Konfidenz), `hocr` oder `alto` (ALTO-XML v4). Entsteht aus demselben
+              OCR-Lauf und wird Seite für Seite gestreamt. Koordinaten sind Pixel der erkannten
+              Seite (`dpi`); Seiten mit eingebettetem PDF-Text enthalten nur Textzeilen.
+              Defekte Dateien werden vorab mit 400 abgewiesen, nicht erkennbare Seiten erscheinen
+              mit `error`. Der Ergebnis-Cache gilt hier nicht.
+          - in: formData
+            name: pages
+            type: string
+            required: false
+            description: |
+              Nur diese Seiten (bzw. Frames) verarbeiten, 1-basiert, z. B. `1-2` oder `1,3-5`. Es
+              werden nur diese Seiten gerastert, die Ausgabe enthält nur diese Seiten.
+          - in: formData
+            name: regions
+            type: string
+            required: false
+            description: |
+              Nur diese Ausschnitte erkennen: `links,oben,rechts,unten` als Anteil (0-1) der Seite,
+              mehrere mit `;` getrennt, `N:` davor beschränkt einen Bereich auf Seite N,
+              z. B. `0,0,1,0.2` (Kopfbereich jeder Seite) oder `1:0.5,0,1,0.3`. Liefert Text
+              (bzw. strukturierte Ausgabe mit Koordinaten der ganzen Seite), keine PDF.
         responses:
           200:
             description: |
               **Für PDF-Dateien**: PDF mit integriertem durchsuchbarem Text wird als Download zurückgegeben
-              **Für Bilder**: Extrahierter Text wird als JSON zurückgegeben
+              **Für Bilder**: Extrahierter Text wird als JSON zurückgegeben (mit `image_output=pdf` als PDF-Download)
             content:
               application/json:
                 schema:
@@ -99,6 +289,9 @@ def ocr_endpoint():
                     text:
                       type: string
                       example: "Dies ist der extrahierte Text aus der Datei."
+                    language:
+                      type: string
+                      example: "deu"
                 description: "Für Bilddateien - extrahierter Text"
               application/pdf:
                 schema:
@@ -121,6 +314,10 @@ def ocr_endpoint():
                 error:
                   type: string
                   example: "Unauthorized"
+          429:
+            description: Zu viele gleichzeitige große Requests für diesen API-Key, nur mit `OCR_MAX_CONCURRENT_PER_KEY` (Header `Retry-After`)
+          503:
+            description: Dienst ausgelastet, große Dokumente später erneut senden oder `/api/jobs` verwenden (Header `Retry-After`)
           500:
             description: Server-Fehler
             schema:
@@ -139,30 +336,476 @@ def ocr_endpoint():
                 return jsonify({'error': 'No selected file'}), 400
 
         try:
-                print(f"API: Verarbeite Datei {file.filename}")
-                result = process_file(file.stream, file.filename)
+                options = _ocr_options_from_request()
+        except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+
+        # Aufwand schätzen und buchen, bevor Rasterung und OCR den Worker belegen
+        try:
+                lease = _admit(file, options)
+        except AdmissionRejected as e:
+                logger.info(f"API: {file.filename} abgewiesen ({e.status}): {e}")
+                return _rejected(e)
+
+        output_format = request.form.get('format')
+        if output_format:
+                response = _structured_result(file, output_format, options)
+                if isinstance(response, Response):
+                    # Die Seiten werden erst beim Streamen erkannt
+                    response.call_on_close(lambda: _release(lease))
+                else:
+                    _release(lease)
+                return response
+
+        try:
+                logger.info(f"API: Verarbeite Datei {file.filename}")
+                details = {}
+                result = process_file(file.stream, file.filename, details=details, **options)
                 
-                # Prüfe ob Ergebnis PDF-Daten oder Text ist
-                if isinstance(result, bytes):
-                    print(f"API: PDF mit integriertem Text erstellt: {len(result)} Bytes")
-                    # Gib PDF-Datei zurück
-                    from flask import Response
-                    return Response(
-                        result,
-                        mimetype='application/pdf',
-                        headers={
-                            'Content-Disposition': f'attachment; filename="{file.filename.replace(".pdf", "_with_text.pdf")}"',
-                            'fileName': file.filename.replace(".pdf", "_with_text.pdf")
-                        }
-                    )
+                # Prüfe ob Ergebnis eine PDF-Datei oder Text ist
+                if isinstance(result, os.PathLike):
+                    logger.info(f"API: PDF mit integriertem Text erstellt: {os.path.getsize(result)} Bytes")
+                    # PDF von der Platte streamen statt sie in den Speicher zu laden
+                    return _send_result_pdf(result, _result_pdf_name(file.filename),
+                                            details.get('language'))
                 else:
-                    print(f"API: Text-Ergebnis: {len(result) if result else 0} Zeichen")
-                    return jsonify({'text': result}), 200
+                    logger.info(f"API: Text-Ergebnis: {len(result) if result else 0} Zeichen")
+                    return jsonify({'text': result, 'language': details.get('language')}), 200
         except Exception as e:
-                print(f"API: Fehler: {e}")
-                import traceback
-                traceback.print_exc()
+                logger.exception(f"API: Fehler: {e}")
                 return jsonify({'error': str(e)}), 500
+        finally:
+                _release(lease)
+
+
+@app.route('/api/ocr/batch', methods=['POST'])
+@require_api_key
+def ocr_batch_endpoint():
+    """
+    Stapel-OCR für viele Dateien
+    ---
+    tags:
+      - OCR
+    summary: OCR many files in one request
+    description: |
+      Verarbeitet mehrere Dateien (mehrere `files`-Felder oder ein einzelnes ZIP-Archiv)
+      parallel über einen gemeinsamen Worker-Pool. Die Antwort wird gestreamt, sobald einzelne
+      Dateien fertig sind, also nicht in Upload-Reihenfolge; `index` ordnet jedes Ergebnis der
+      Eingabedatei zu. Fehler in einer Datei erscheinen als Eintrag mit `status: error`,
+      die übrigen Dateien werden weiter verarbeitet.
+
+      - `output=ndjson` (Standard): eine JSON-Zeile pro Datei mit `text` bzw. `pdf_base64`
+      - `output=zip`: ZIP mit einer Ergebnisdatei pro Eingabedatei und `results.json`
+    security:
+      - ApiKeyAuth: []
+      - BearerAuth: []
+    consumes:
+      - multipart/form-data
+    parameters:
+      - in: formData
+        name: files
+        type: file
+        required: true
+        description: Dateien (PDF oder Bild, Feld mehrfach angeben) oder ein ZIP-Archiv
+      - in: formData
+        name: output
+        type: string
+        enum: [ndjson, zip]
+        required: false
+        description: Antwortformat (Standard `ndjson`)
+      - in: formData
+        name: mode
+        type: string
+        enum: [rebuild, overlay]
+        required: false
+        description: Ausgabemodus für gescannte PDF-Seiten (siehe `/api/ocr`)
+      - in: formData
+        name: image_output
+        type: string
+        enum: [text, pdf]
+        required: false
+        description: Ergebnis für Bilddateien (siehe `/api/ocr`)
+      - in: formData
+        name: compression
+        type: string
+        enum: [size, balanced, quality]
+        required: false
+        description: Kompression der Seitenbilder (siehe `/api/ocr`)
+      - in: formData
+        name: pages
+        type: string
+        required: false
+        description: Seitenauswahl, z. B. `1-2` (siehe `/api/ocr`)
+      - in: formData
+        name: regions
+        type: string
+        required: false
+        description: Normierte Ausschnitte, z. B. `0,0,1,0.2` (siehe `/api/ocr`)
+    produces:
+      - application/x-ndjson
+      - application/zip
+    responses:
+      200:
+        description: Ergebnisse in Fertigstellungsreihenfolge
+      400:
+        description: Ungültige Anfrage
+      401:
+        description: Nicht autorisiert
+      429:
+        description: Zu viele gleichzeitige große Requests für diesen API-Key, nur mit `OCR_MAX_CONCURRENT_PER_KEY` (Header `Retry-After`)
+      503:
+        description: Dienst ausgelastet, der geschätzte Aufwand aller Dateien übersteigt das Budget (Header `Retry-After`)
+    """
+    files = request.files.getlist('files') + request.files.getlist('file')
+    if not files:
+        return jsonify({'error': 'No file part'}), 400
+
+    output_format = request.form.get('output', 'ndjson')
+    if output_format not in OUTPUT_FORMATS:
+        return jsonify({'error': f"Invalid output '{output_format}', expected one of: {', '.join(OUTPUT_FORMATS)}"}), 400
+
+    try:
+        options = _ocr_options_from_request()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    work_dir = new_work_dir()
+    try:
+        entries = spool_uploads(files, work_dir)
+    except ValueError as e:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        return jsonify({'error': str(e)}), 400
+
+    # Der ganze Stapel zählt gegen das Budget, er belegt den Worker wie ein großes Dokument
+    try:
+        lease = _admit_batch(entries, options)
+    except AdmissionRejected as e:
+        logger.info(f"API: Stapel mit {len(entries)} Dateien abgewiesen ({e.status}): {e}")
+        shutil.rmtree(work_dir, ignore_errors=True)
+        return _rejected(e)
+
+    logger.info(f"API: Stapel mit {len(entries)} Dateien ({output_format})")
+    body = stream_with_context(stream_batch(entries, work_dir, output_format, options))
+    if output_format == 'zip':
+        response = Response(body, mimetype='application/zip',
+                            headers={'Content-Disposition': 'attachment; filename=ocr_results.zip'})
+    else:
+        response = Response(body, mimetype='application/x-ndjson')
+    response.call_on_close(lambda: _release(lease))
+    return response
+
+
+@app.route('/api/jobs', methods=['POST'])
+@require_api_key
+def create_job():
+    """
+    OCR-Job anlegen (asynchron)
+    ---
+    tags:
+      - Jobs
+    summary: Queue a file for asynchronous OCR
+    description: |
+      Reiht die Datei zur OCR-Verarbeitung ein und antwortet sofort mit einer Job-ID.
+      Der Fortschritt kann über `/api/jobs/<id>` abgefragt und das Ergebnis über
+      `/api/jobs/<id>/result` abgeholt werden.
+    security:
+      - ApiKeyAuth: []
+      - BearerAuth: []
+    parameters:
+      - in: formData
+        name: file
+        type: file
+        required: true
+        description: Datei für OCR-Verarbeitung (PDF oder Bild)
+      - in: formData
+        name: mode
+        type: string
+        enum: [rebuild, overlay]
+        required: false
+        description: Ausgabemodus für gescannte PDF-Seiten (siehe `/api/ocr`)
+      - in: formData
+        name: image_output
+        type: string
+        enum: [text, pdf]
+        required: false
+        description: Ergebnis für Bilddateien (siehe `/api/ocr`)
+      - in: formData
+        name: compression
+        type: string
+        enum: [size, balanced, quality]
+        required: false
+        description: Kompression der Seitenbilder (siehe `/api/ocr`)
+      - in: formData
+        name: pages
+        type: string
+        required: false
+        description: Seitenauswahl, z. B. `1-2` (siehe `/api/ocr`)
+      - in: formData
+        name: regions
+        type: string
+        required: false
+        description: Normierte Ausschnitte, z. B. `0,0,1,0.2` (siehe `/api/ocr`)
+    responses:
+      202:
+        description: Job wurde eingereiht
+        schema:
+          type: object
+          properties:
+            job_id:
+              type: string
+            status:
+              type: string
+              example: "queued"
+            status_url:
+              type: string
+            result_url:
+              type: string
+      400:
+        description: Ungültige Anfrage
+      401:
+        description: Nicht autorisiert
+    """
+    if 'file' not in request.files:
+        return jsonify({'error': 'No file part'}), 400
+
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({'error': 'No selected file'}), 400
+
+    try:
+        options = _ocr_options_from_request()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    job_id = submit_job(file.stream, file.filename, options)
+    return jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f'/api/jobs/{job_id}',
+        'result_url': f'/api/jobs/{job_id}/result',
+    }), 202
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@require_api_key
+def job_status_endpoint(job_id):
+    """
+    OCR-Job Status
+    ---
+    tags:
+      - Jobs
+    summary: Get job status and page progress
+    security:
+      - ApiKeyAuth: []
+      - BearerAuth: []
+    parameters:
+      - in: path
+        name: job_id
+        type: string
+        required: true
+    responses:
+      200:
+        description: Status des Jobs (queued, running, done, failed) mit Seitenfortschritt
+        schema:
+          type: object
+          properties:
+            id:
+              type: string
+            status:
+              type: string
+              example: "running"
+            pages_done:
+              type: integer
+              example: 12
+            pages_total:
+              type: integer
+              example: 200
+            error:
+              type: string
+      404:
+        description: Job nicht gefunden
+    """
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job_status(job)), 200
+
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+@require_api_key
+def job_result_endpoint(job_id):
+    """
+    OCR-Job Ergebnis
+    ---
+    tags:
+      - Jobs
+    summary: Download the result of a finished job
+    description: |
+      **PDF mit integriertem Text** wird als Download gestreamt, **Text** als JSON zurückgegeben
+      (wie bei `/api/ocr`).
+    security:
+      - ApiKeyAuth: []
+      - BearerAuth: []
+    parameters:
+      - in: path
+        name: job_id
+        type: string
+        required: true
+    responses:
+      200:
+        description: Ergebnis des Jobs
+      404:
+        description: Job nicht gefunden
+      409:
+        description: Job ist noch nicht fertig
+      500:
+        description: Job ist fehlgeschlagen
+    """
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job['status'] == 'failed':
+        return jsonify({'error': job['error'] or 'OCR processing failed'}), 500
+    if job['status'] != 'done':
+        return jsonify({'error': 'Job not finished', 'status': job['status']}), 409
+
+    if job['result_type'] == 'pdf':
+        download_name = _result_pdf_name(job['filename'])
+        response = send_file(job['result_path'], mimetype='application/pdf', as_attachment=True,
+                             download_name=download_name)
+        response.headers.update(_language_headers(job['language']))
+        return response
+
+    with open(job['result_path'], encoding='utf-8') as f:
+        return jsonify({'text': f.read(), 'language': job['language']}), 200
+
+
+@app.route('/api/cache/stats', methods=['GET'])
+@require_api_key
+def cache_stats_endpoint():
+    """
+    Ergebnis-Cache Statistik
+    ---
+    tags:
+      - System
+    summary: Result cache counters
+    description: Treffer, Fehlschläge und Verdrängungen des Ergebnis-Caches (über alle Worker).
+    security:
+      - ApiKeyAuth: []
+      - BearerAuth: []
+    responses:
+      200:
+        description: Cache-Zähler und Belegung
+        schema:
+          type: object
+          properties:
+            hits:
+              type: integer
+            misses:
+              type: integer
+            evictions:
+              type: integer
+            entries:
+              type: integer
+            bytes:
+              type: integer
+            max_bytes:
+              type: integer
+    """
+    return jsonify(cache_stats()), 200
+
+
+def _live_metrics():
+    """Werte, die beim Abruf aus den gemeinsamen SQLite-Datenbanken gelesen werden."""
+    values = []
+    for status, count in queue_depth().items():
+        values.append(('pdf2ocr_jobs', 'gauge', 'Jobs in der Warteschlange nach Status', {'status': status}, count))
+    for size, current in usage().items():
+        labels = {'size': size}
+        values += [
+            ('pdf2ocr_admission_in_flight', 'gauge', 'Zugelassene laufende Requests', labels, current['requests']),
+            ('pdf2ocr_admission_cost_megapixels', 'gauge', 'Gebuchter Aufwand laufender Requests', labels,
+             current['cost']),
+        ]
+    try:
+        stats = cache_stats()
+    except Exception as e:
+        logger.warning(f"Cache-Statistik nicht verfügbar: {e}")
+        return values
+    for cache, counters in (('result', stats), ('page', stats['pages'])):
+        labels = {'cache': cache}
+        values += [
+            ('pdf2ocr_cache_hits_total', 'counter', 'Cache-Treffer', labels, counters['hits']),
+            ('pdf2ocr_cache_misses_total', 'counter', 'Cache-Fehlschläge', labels, counters['misses']),
+            ('pdf2ocr_cache_evictions_total', 'counter', 'Verdrängte Cache-Einträge', labels, counters['evictions']),
+            ('pdf2ocr_cache_bytes', 'gauge', 'Belegter Cache-Speicher', labels, counters['bytes']),
+        ]
+    return values
+
+
+@app.route('/metrics', methods=['GET'])
+@require_api_key
+def metrics_endpoint():
+    """
+    Prometheus-Metriken
+    ---
+    tags:
+      - System
+    summary: Metrics in Prometheus text format
+    description: |
+      Histogramme der Verarbeitungsstufen (`pdf2ocr_stage_seconds`, Label `stage`: upload, extract,
+      rasterize, ocr, draw, save), Dauer und Durchsatz pro Dokument, verarbeitete Seiten und
+      Dokumente, Länge der Job-Warteschlange sowie Cache-Treffer. Die Zähler umfassen alle Worker.
+    security:
+      - ApiKeyAuth: []
+      - BearerAuth: []
+    produces:
+      - text/plain
+    responses:
+      200:
+        description: Metriken im Prometheus-Textformat (Version 0.0.4)
+    """
+    return Response(metrics.render(_live_metrics()), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """
+    Readiness Check
+    ---
+    tags:
+      - System
+    summary: Worker is warmed up
+    description: |
+      Meldet, ob der antwortende Worker seine Module, Tesseract-Engines und den OCR-Pool
+      vorgewärmt hat. Im Gegensatz zu `/health` (Prozess lebt) eignet sich der Endpunkt als
+      Readiness-Probe, z. B. damit ein Load Balancer erst nach dem Vorwärmen Requests schickt.
+    responses:
+      200:
+        description: Worker ist bereit
+        schema:
+          type: object
+          properties:
+            status:
+              type: string
+              example: "ready"
+            seconds:
+              type: number
+              example: 1.42
+      503:
+        description: Worker wärmt noch vor
+        schema:
+          type: object
+          properties:
+            status:
+              type: string
+              example: "warming"
+    """
+    # Ohne Gunicorn-Hook (z. B. Entwicklungsserver) beginnt das Vorwärmen mit der ersten Abfrage
+    start_worker_warm_up()
+    state = readiness()
+    status = 'ready' if state['ready'] else 'warming'
+    return jsonify(dict(state, status=status)), 200 if state['ready'] else 503
 
 
 @app.route('/health', methods=['GET'])
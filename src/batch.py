@@ -0,0 +1,280 @@
+"""Stapelverarbeitung: viele Dateien pro Request mit gemeinsamem Worker-Pool.
+
+Die Dateien eines Stapels (mehrere Multipart-Felder oder ein ZIP-Archiv) werden zuerst in ein
+Arbeitsverzeichnis gespoolt und dann parallel mit `process_file` verarbeitet. Die Ergebnisse
+werden in der Reihenfolge geliefert, in der die Dateien fertig werden. Jede Datei wird für
+sich behandelt: ein Fehler in einer Datei erscheint als Fehlereintrag im Ergebnis, der Rest des
+Stapels läuft weiter.
+"""
+
+import base64
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from . import metrics
+from .ocr import process_file, SUPPORTED_EXTENSIONS, _default_ocr_workers
+
+logger = logging.getLogger(__name__)
+
+# Höchstzahl Dateien pro Stapel
+BATCH_MAX_FILES = int(os.getenv('OCR_BATCH_MAX_FILES', '1000'))
+
+# Höchste entpackte Gesamtgröße eines ZIP-Archivs (Standard: 1 GiB)
+BATCH_MAX_BYTES = int(os.getenv('OCR_BATCH_MAX_BYTES', str(1024 * 1024 * 1024)))
+
+OUTPUT_FORMATS = ('ndjson', 'zip')
+
+
+def _batch_workers():
+    """Anzahl gleichzeitig verarbeiteter Dateien (`OCR_BATCH_WORKERS`, Standard wie `OCR_WORKERS`)."""
+    configured = os.getenv('OCR_BATCH_WORKERS')
+    if configured:
+        return max(1, int(configured))
+    return _default_ocr_workers()
+
+
+_batch_executor = None
+_batch_executor_pid = None
+_batch_executor_lock = threading.Lock()
+
+
+def _get_batch_executor():
+    """Thread-Pool für Dateien eines Stapels (einer pro Prozess, nach fork neu erstellt).
+
+    Getrennt vom Seiten-Pool der OCR, weil PDF-Dateien ihre Seiten dort einreihen und auf sie
+    warten; im selben Pool könnten sich die Aufgaben gegenseitig blockieren.
+    """
+    global _batch_executor, _batch_executor_pid
+    with _batch_executor_lock:
+        if _batch_executor is None or _batch_executor_pid != os.getpid():
+            _batch_executor = ThreadPoolExecutor(max_workers=_batch_workers(), thread_name_prefix='ocr-batch')
+            _batch_executor_pid = os.getpid()
+        return _batch_executor
+
+
+def _safe_name(name, index):
+    """Dateiname ohne Pfadanteile; eindeutig durch vorangestellten Index."""
+    base = os.path.basename(name.replace('\\', '/')) or 'datei'
+    return f"{index:05d}_{base}"
+
+
+def spool_uploads(files, work_dir):
+    """Speichert hochgeladene Dateien (`FileStorage`) im Arbeitsverzeichnis.
+
+    Ein einzelnes ZIP-Archiv wird entpackt. Liefert eine Liste `(dateiname, pfad)`. Wirft
+    ValueError, wenn der Stapel leer ist oder die Grenzen überschreitet.
+    """
+    with metrics.span('upload', target='batch') as tags:
+        entries = _spool(files, work_dir)
+        tags['files'] = len(entries)
+    if not entries:
+        raise ValueError('No files in batch')
+    return entries
+
+
+def _spool(files, work_dir):
+    entries = []
+    if len(files) == 1 and files[0].filename.lower().endswith('.zip'):
+        try:
+            archive = zipfile.ZipFile(files[0].stream)
+        except zipfile.BadZipFile:
+            raise ValueError('Invalid ZIP archive')
+        with archive:
+            members = [m for m in archive.infolist()
+                       if not m.is_dir() and not m.filename.startswith('__MACOSX/')
+                       and not os.path.basename(m.filename).startswith('.')]
+            if len(members) > BATCH_MAX_FILES:
+                raise ValueError(f"Too many files in archive (max {BATCH_MAX_FILES})")
+            if sum(m.file_size for m in members) > BATCH_MAX_BYTES:
+                raise ValueError(f"Archive too large (max {BATCH_MAX_BYTES} bytes uncompressed)")
+            for index, member in enumerate(members):
+                path = os.path.join(work_dir, _safe_name(member.filename, index))
+                with archive.open(member) as source, open(path, 'wb') as target:
+                    shutil.copyfileobj(source, target, 1024 * 1024)
+                entries.append((member.filename, path))
+    else:
+        files = [f for f in files if f.filename]
+        if len(files) > BATCH_MAX_FILES:
+            raise ValueError(f"Too many files (max {BATCH_MAX_FILES})")
+        for index, file in enumerate(files):
+            path = os.path.join(work_dir, _safe_name(file.filename, index))
+            file.save(path)
+            entries.append((file.filename, path))
+    return entries
+
+
+def _process_entry(index, filename, path, options):
+    """Verarbeitet eine Datei des Stapels; Fehler werden als Ergebnis zurückgegeben, nicht geworfen."""
+    extension = filename.lower().rsplit('.', 1)[-1] if '.' in filename else ''
+    if extension not in SUPPORTED_EXTENSIONS:
+        return {'index': index, 'filename': filename, 'status': 'error',
+                'error': f"Unsupported file type '{extension}'"}
+    details = {}
+    try:
+        with open(path, 'rb') as f:
+            result = process_file(f, filename, details=details, **options)
+    except Exception as e:
+        logger.warning(f"Stapel: Fehler bei {filename}: {e}")
+        return {'index': index, 'filename': filename, 'status': 'error', 'error': str(e)}
+    finally:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass  # Arbeitsverzeichnis nach Abbruch des Stapels bereits entfernt
+
+    entry = {'index': index, 'filename': filename, 'status': 'ok', 'language': details.get('language')}
+    if isinstance(result, os.PathLike):
+        entry['result_path'] = os.fspath(result)
+    else:
+        entry['text'] = result
+    return entry
+
+
+def iter_batch_results(entries, options=None):
+    """Verarbeitet `(dateiname, pfad)`-Einträge parallel und liefert die Ergebnisse in Fertigstellungsreihenfolge.
+
+    Jedes Ergebnis ist ein Dict mit `index` (Position im Stapel), `filename`, `status` (`ok`
+    oder `error`) und `text`, `result_path` (durchsuchbare PDF, vom Aufrufer zu löschen) oder
+    `error`. Bricht der Aufrufer ab (Client trennt die Verbindung), werden noch nicht begonnene
+    Dateien nicht mehr verarbeitet und die Ergebnis-PDFs nicht abgeholter Dateien gelöscht, auch
+    von Dateien, die erst danach fertig werden.
+    """
+    options = options or {}
+    executor = _get_batch_executor()
+    futures = [executor.submit(_process_entry, index, filename, path, options)
+               for index, (filename, path) in enumerate(entries)]
+    delivered = set()
+    try:
+        for future in as_completed(futures):
+            delivered.add(future)
+            yield future.result()
+    finally:
+        for future in futures:
+            if future not in delivered and not future.cancel():
+                future.add_done_callback(_discard_result)
+
+
+def _discard_result(future):
+    """Löscht die Ergebnis-PDF einer Datei, deren Ergebnis nicht mehr abgeholt wird."""
+    if future.cancelled() or future.exception() is not None:
+        return
+    path = future.result().get('result_path')
+    if path:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def _result_name(entry):
+    base = os.path.basename(entry['filename'].replace('\\', '/'))
+    if 'result_path' in entry:
+        return f"{entry['index']:05d}_{os.path.splitext(base)[0]}_with_text.pdf"
+    return f"{entry['index']:05d}_{base}.txt"
+
+
+# Blockgröße beim Base64-Kodieren von Ergebnis-PDFs (Vielfaches von 3, damit Blöcke ohne Padding aneinanderpassen)
+_BASE64_CHUNK = 3 * 256 * 1024
+
+
+def _base64_chunks(path):
+    """Liest eine Datei blockweise und liefert sie Base64-kodiert, ohne sie ganz in den Speicher zu laden."""
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(_BASE64_CHUNK)
+            if not data:
+                return
+            yield base64.b64encode(data).decode('ascii')
+
+
+def ndjson_lines(results):
+    """Eine JSON-Zeile pro Datei; durchsuchbare PDFs sind Base64-kodiert (`pdf_base64`).
+
+    Die Base64-Daten werden blockweise geschrieben, eine Zeile kann also über mehrere Blöcke der
+    Antwort gehen.
+    """
+    for entry in results:
+        line = json.dumps({key: value for key, value in entry.items() if key != 'result_path'}, ensure_ascii=False)
+        if 'result_path' not in entry:
+            yield line + '\n'
+            continue
+        try:
+            yield line[:-1] + ', "pdf_base64": "'
+            yield from _base64_chunks(entry['result_path'])
+            yield '"}\n'
+        finally:
+            os.unlink(entry['result_path'])
+
+
+class _ZipStream:
+    """Nicht durchsuchbares Schreibziel für `zipfile`, dessen Inhalt blockweise abgeholt wird."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def zip_chunks(results):
+    """Streamt ein ZIP mit einer Ausgabedatei pro Datei (PDF oder .txt) und `results.json` am Ende.
+
+    Die Einträge werden geschrieben, sobald eine Datei fertig ist; `results.json` enthält Status,
+    Sprache, Fehler und den Namen der Ausgabedatei pro Eingabedatei.
+    """
+    stream = _ZipStream()
+    manifest = []
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for entry in results:
+            item = {key: value for key, value in entry.items() if key not in ('result_path', 'text')}
+            if entry['status'] == 'ok':
+                item['output'] = _result_name(entry)
+                if 'result_path' in entry:
+                    try:
+                        # PDFs sind bereits komprimiert
+                        archive.write(entry['result_path'], item['output'], compress_type=zipfile.ZIP_STORED)
+                    finally:
+                        os.unlink(entry['result_path'])
+                else:
+                    archive.writestr(item['output'], entry['text'] or '')
+            manifest.append(item)
+            yield stream.take()
+        archive.writestr('results.json', json.dumps(manifest, ensure_ascii=False, indent=2))
+    yield stream.take()
+
+
+def stream_batch(entries, work_dir, output_format='ndjson', options=None):
+    """Verarbeitet einen gespoolten Stapel und liefert die Antwort blockweise; räumt `work_dir` danach auf.
+
+    Trennt der Client die Verbindung, werden die Generatoren sofort geschlossen, damit offene
+    Dateien abgebrochen und ihre Ergebnisse gelöscht werden (siehe `iter_batch_results`).
+    """
+    results = iter_batch_results(entries, options)
+    chunks = zip_chunks(results) if output_format == 'zip' else ndjson_lines(results)
+    try:
+        for chunk in chunks:
+            if chunk:
+                yield chunk
+    finally:
+        chunks.close()
+        results.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def new_work_dir():
+    return tempfile.mkdtemp(prefix='pdf2ocr-batch-')
@@ -0,0 +1,303 @@
+"""Inhaltsadressierter Ergebnis-Cache für wiederholte Uploads.
+
+Ergebnisse (durchsuchbare PDF oder Text) werden unter einem Schlüssel aus dem SHA-256 der
+hochgeladenen Bytes und den wirksamen OCR-Parametern in `OCR_CACHE_DIR` abgelegt. Ein
+SQLite-Index im selben Verzeichnis hält Größe und letzten Zugriff pro Eintrag sowie die
+Zähler für Treffer, Fehlschläge und Verdrängungen, damit alle Gunicorn-Worker denselben
+Cache nutzen. Überschreitet der Cache `OCR_CACHE_MAX_BYTES`, werden die am längsten nicht
+genutzten Einträge gelöscht (LRU).
+
+Zusätzlich gibt es einen Seiten-Cache: strukturierte OCR-Ergebnisse (Text und Wortboxen) werden
+pro gerasterter Seite gespeichert, sodass bei Dokumenten, die sich nur in einzelnen Seiten
+unterscheiden, nur die neuen Seiten durch Tesseract laufen (`OCR_PAGE_CACHE_MAX_BYTES`).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv('OCR_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'pdf2ocr-cache'))
+
+# Maximale Gesamtgröße aller Ergebnisse (Standard: 1 GiB)
+CACHE_MAX_BYTES = int(os.getenv('OCR_CACHE_MAX_BYTES', str(1024 * 1024 * 1024)))
+
+# Maximale Gesamtgröße aller Seitenergebnisse (Standard: 256 MiB)
+PAGE_CACHE_MAX_BYTES = int(os.getenv('OCR_PAGE_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    result_type TEXT NOT NULL,
+    details TEXT,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+CREATE TABLE IF NOT EXISTS pages (
+    key TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_last_access ON pages (last_access);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def cache_enabled():
+    """Der Cache ist aktiv, solange `OCR_CACHE_ENABLED` nicht auf 0/false gesetzt ist."""
+    return os.getenv('OCR_CACHE_ENABLED', '1').lower() not in ('0', 'false', 'no')
+
+
+def _connect():
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(CACHE_DIR, 'index.db'), timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.executescript(_SCHEMA)
+    columns = {row['name'] for row in conn.execute('PRAGMA table_info(entries)')}
+    if 'details' not in columns:
+        # Cache-Index aus älteren Versionen ohne Ergebnisangaben
+        conn.execute('ALTER TABLE entries ADD COLUMN details TEXT')
+    return conn
+
+
+def _increment(conn, name, amount=1):
+    conn.execute(
+        'INSERT INTO counters (name, value) VALUES (?, ?) '
+        'ON CONFLICT(name) DO UPDATE SET value = value + excluded.value',
+        (name, amount),
+    )
+
+
+def cache_key(file_stream, params):
+    """Berechnet den Cache-Schlüssel aus dem Inhalt des Streams und den OCR-Parametern.
+
+    Der Stream wird danach wieder auf den Anfang gesetzt.
+    """
+    digest = hashlib.sha256()
+    file_stream.seek(0)
+    for chunk in iter(lambda: file_stream.read(1024 * 1024), b''):
+        digest.update(chunk)
+    file_stream.seek(0)
+    digest.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _link_or_copy(source, target):
+    """Legt `target` als Hardlink auf `source` an (kein Kopieren), über Dateisystemgrenzen als Kopie."""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+def _read_entry(row):
+    """Liest einen Eintrag: Text als str, PDF als Hardlink (bzw. Kopie) in einer eigenen temporären Datei."""
+    if row['result_type'] != 'pdf':
+        with open(row['path'], encoding='utf-8') as f:
+            return f.read()
+    fd, result_path = tempfile.mkstemp(prefix='pdf2ocr-', suffix='_with_text.pdf')
+    os.close(fd)
+    os.unlink(result_path)
+    try:
+        _link_or_copy(row['path'], result_path)
+    except FileNotFoundError:
+        # Eine abgebrochene Kopie nicht liegen lassen
+        if os.path.exists(result_path):
+            os.unlink(result_path)
+        raise
+    return Path(result_path)
+
+
+def get_cached_result(key, details=None):
+    """Liefert das gespeicherte Ergebnis oder None.
+
+    PDF-Ergebnisse werden wie bei `process_file` als Pfad (`pathlib.Path`) auf eine eigene
+    temporäre Datei geliefert, die der Aufrufer nach Gebrauch löscht; Text als str. Die mit
+    dem Ergebnis gespeicherten Angaben (z. B. Sprache) werden in `details` übernommen.
+    """
+    conn = _connect()
+    try:
+        row = conn.execute('SELECT * FROM entries WHERE key = ?', (key,)).fetchone()
+        result = None
+        if row is not None:
+            try:
+                result = _read_entry(row)
+            except FileNotFoundError:
+                # Datei fehlt oder wurde gerade von einem anderen Worker verdrängt
+                conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+        if result is None:
+            _increment(conn, 'misses')
+            return None
+
+        if details is not None and row['details']:
+            details.update(json.loads(row['details']))
+        conn.execute('UPDATE entries SET last_access = ? WHERE key = ?', (time.time(), key))
+        _increment(conn, 'hits')
+    finally:
+        conn.close()
+
+    logger.debug(f"Cache-Treffer: {key[:12]}")
+    return result
+
+
+def store_result(key, result, details=None):
+    """Speichert ein Ergebnis (Pfad einer PDF oder Text) samt `details` und verdrängt bei Bedarf alte Einträge.
+
+    Die PDF wird per Hardlink übernommen, der Aufrufer kann seine Datei danach wie gewohnt löschen.
+    """
+    directory = os.path.join(CACHE_DIR, key[:2])
+    os.makedirs(directory, exist_ok=True)
+
+    # Atomar schreiben, damit andere Worker nie eine halbe Datei lesen
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    if isinstance(result, os.PathLike):
+        result_type, suffix = 'pdf', '.pdf'
+        os.close(fd)
+        os.unlink(temp_path)
+        _link_or_copy(result, temp_path)
+    else:
+        result_type, suffix = 'text', '.txt'
+        with os.fdopen(fd, 'wb') as f:
+            f.write(result.encode('utf-8'))
+    path = os.path.join(directory, key + suffix)
+    os.replace(temp_path, path)
+
+    conn = _connect()
+    try:
+        conn.execute(
+            'INSERT OR REPLACE INTO entries (key, path, result_type, details, size, last_access) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (key, path, result_type, json.dumps(details or {}), os.path.getsize(path), time.time()),
+        )
+        _evict(conn)
+    finally:
+        conn.close()
+
+
+def _evict(conn):
+    """Löscht die am längsten nicht genutzten Einträge, bis der Cache wieder in sein Limit passt."""
+    total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+    if total <= CACHE_MAX_BYTES:
+        return
+
+    evicted = 0
+    for row in conn.execute('SELECT key, path, size FROM entries ORDER BY last_access').fetchall():
+        if total <= CACHE_MAX_BYTES:
+            break
+        if os.path.exists(row['path']):
+            os.unlink(row['path'])
+        conn.execute('DELETE FROM entries WHERE key = ?', (row['key'],))
+        total -= row['size']
+        evicted += 1
+
+    if evicted:
+        _increment(conn, 'evictions', evicted)
+        logger.info(f"Cache: {evicted} Einträge verdrängt")
+
+
+def page_cache_key(image, params):
+    """Schlüssel für eine gerasterte Seite: Hash der Pixeldaten plus OCR-Parameter."""
+    digest = hashlib.sha256()
+    digest.update(f'{image.mode}:{image.size[0]}x{image.size[1]}:'.encode('ascii'))
+    digest.update(image.tobytes())
+    digest.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def get_cached_pages(keys):
+    """Liefert die gespeicherten Seitenergebnisse für die Schlüssel als Dict (fehlende fehlen)."""
+    keys = [key for key in keys if key]
+    if not keys:
+        return {}
+    conn = _connect()
+    try:
+        placeholders = ', '.join('?' for _ in keys)
+        rows = conn.execute(f'SELECT key, data FROM pages WHERE key IN ({placeholders})', keys).fetchall()
+        found = {row['key']: json.loads(row['data']) for row in rows}
+        if found:
+            conn.execute(
+                f'UPDATE pages SET last_access = ? WHERE key IN ({", ".join("?" for _ in found)})',
+                (time.time(), *found),
+            )
+        _increment(conn, 'page_hits', len(found))
+        _increment(conn, 'page_misses', len(keys) - len(found))
+    finally:
+        conn.close()
+    return found
+
+
+def store_pages(entries):
+    """Speichert Seitenergebnisse (`{schlüssel: seitenergebnis}`) und verdrängt alte Seiten (LRU)."""
+    if not entries:
+        return
+    now = time.time()
+    conn = _connect()
+    try:
+        for key, page_result in entries.items():
+            data = json.dumps(page_result, ensure_ascii=False)
+            conn.execute(
+                'INSERT OR REPLACE INTO pages (key, data, size, last_access) VALUES (?, ?, ?, ?)',
+                (key, data, len(data), now),
+            )
+        _evict_pages(conn)
+    finally:
+        conn.close()
+
+
+def _evict_pages(conn):
+    """Wie `_evict`, aber für den Seiten-Cache."""
+    total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM pages').fetchone()[0]
+    if total <= PAGE_CACHE_MAX_BYTES:
+        return
+
+    evicted = 0
+    for row in conn.execute('SELECT key, size FROM pages ORDER BY last_access').fetchall():
+        if total <= PAGE_CACHE_MAX_BYTES:
+            break
+        conn.execute('DELETE FROM pages WHERE key = ?', (row['key'],))
+        total -= row['size']
+        evicted += 1
+
+    if evicted:
+        _increment(conn, 'page_evictions', evicted)
+
+
+def cache_stats():
+    """Zähler und Belegung des Caches."""
+    conn = _connect()
+    try:
+        counters = {row['name']: row['value'] for row in conn.execute('SELECT name, value FROM counters')}
+        entries, size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        pages, page_size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages').fetchone()
+    finally:
+        conn.close()
+    return {
+        'hits': counters.get('hits', 0),
+        'misses': counters.get('misses', 0),
+        'evictions': counters.get('evictions', 0),
+        'entries': entries,
+        'bytes': size,
+        'max_bytes': CACHE_MAX_BYTES,
+        'pages': {
+            'hits': counters.get('page_hits', 0),
+            'misses': counters.get('page_misses', 0),
+            'evictions': counters.get('page_evictions', 0),
+            'entries': pages,
+            'bytes': page_size,
+            'max_bytes': PAGE_CACHE_MAX_BYTES,
+        },
+    }
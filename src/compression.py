@@ -0,0 +1,191 @@
+"""Kompression der Seitenbilder in neu aufgebauten PDFs (`rebuild`, Bild-Ausgabe als PDF).
+
+Statt jede Seite als Farb-JPEG in Qualität 95 einzubetten, wird der Inhalt pro Seite bestimmt
+(`classify_image`) und passend kodiert (`encode_page_image`):
+
+- `bilevel` (reines Schwarz-Weiß, z. B. Fax und Textscans): 1 Bit pro Pixel, CCITT Group 4
+  (mit libtiff in Pillow) bzw. Flate.
+- `gray`: Graustufen-JPEG.
+- `color`: Farb-JPEG, je nach Preset mit Chroma-Subsampling und reduzierter Auflösung.
+
+Die Presets `size`, `balanced` (Standard) und `quality` legen Schwellwerte, JPEG-Qualität und
+Zielauflösungen fest (`OCR_COMPRESSION`, pro Request über das Formularfeld `compression`). Die
+kodierten Daten werden nicht neu kodiert (`draw_encoded_image`): JPEG-Seiten über das öffentliche
+`Canvas.drawImage`, das JPEG-Daten unverändert übernimmt, G4/Flate-Seiten über ReportLab-Interna,
+weil `drawImage` sie als RGB neu packen würde.
+"""
+
+import hashlib
+import io
+import os
+import zlib
+
+from PIL import Image, ImageChops, TiffImagePlugin, features
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfdoc
+
+COMPRESSION_PRESETS = {
+    # bilevel_ratio: Anteil an Grautönen (Kantenglättung, Rauschen), bis zu dem eine Seite als
+    # Schwarz-Weiß gilt; gray_dpi/color_dpi: Zielauflösung auf der A4-Seite (None = unverändert)
+    'size': {'bilevel_ratio': 0.08, 'jpeg_quality': 50, 'subsampling': 2, 'gray_dpi': 200, 'color_dpi': 150},
+    'balanced': {'bilevel_ratio': 0.03, 'jpeg_quality': 75, 'subsampling': 2, 'gray_dpi': 300, 'color_dpi': 200},
+    'quality': {'bilevel_ratio': 0.0, 'jpeg_quality': 92, 'subsampling': 0, 'gray_dpi': None, 'color_dpi': None},
+}
+
+# Farbabstand (max - min der Kanäle), ab dem ein Pixel als farbig gilt, und Anteil farbiger
+# Pixel, ab dem die Seite als Farbseite kodiert wird
+COLOR_CHROMA = 32
+COLOR_RATIO = 0.002
+
+# Grauwerte zwischen diesen Grenzen zählen als Zwischentöne (nicht Schwarz oder Papierweiß)
+_MID_TONES = (48, 208)
+
+
+def default_compression():
+    """Kompressions-Preset aus `OCR_COMPRESSION`: `size`, `balanced` (Standard) oder `quality`."""
+    preset = os.getenv('OCR_COMPRESSION', 'balanced').lower()
+    return preset if preset in COMPRESSION_PRESETS else 'balanced'
+
+
+def _is_color(image):
+    if image.mode in ('1', 'L', 'LA', 'I', 'F'):
+        return False
+    rgb = image.convert('RGB')
+    if min(rgb.size) >= 64:
+        rgb = rgb.reduce(4)  # mittelt JPEG-Farbrauschen an Kanten heraus
+    r, g, b = rgb.split()
+    chroma = ImageChops.subtract(ImageChops.lighter(ImageChops.lighter(r, g), b),
+                                 ImageChops.darker(ImageChops.darker(r, g), b))
+    histogram = chroma.histogram()
+    return sum(histogram[COLOR_CHROMA:]) > COLOR_RATIO * rgb.size[0] * rgb.size[1]
+
+
+def classify_image(image, preset='balanced'):
+    """Bestimmt den Seiteninhalt: `bilevel`, `gray` oder `color`."""
+    if image.mode == '1':
+        return 'bilevel'
+    if _is_color(image):
+        return 'color'
+    histogram = image.convert('L').histogram()
+    mid_tones = sum(histogram[_MID_TONES[0]:_MID_TONES[1]])
+    if mid_tones <= COMPRESSION_PRESETS[preset]['bilevel_ratio'] * image.size[0] * image.size[1]:
+        return 'bilevel'
+    return 'gray'
+
+
+def _downsample(image, dpi, target_dpi):
+    """Verkleinert das Bild auf `target_dpi`, wenn es deutlich feiner aufgelöst ist."""
+    if not target_dpi or not dpi or dpi <= target_dpi * 1.1:
+        return image
+    factor = target_dpi / dpi
+    size = (max(1, round(image.size[0] * factor)), max(1, round(image.size[1] * factor)))
+    return image.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+
+def _encode_bilevel(image):
+    """1-Bit-Kodierung, CCITT Group 4 wie in Pillows PDF-Export, ohne libtiff Flate."""
+    if image.mode != '1':
+        image = image.convert('L').point(lambda p: 255 if p >= 128 else 0, mode='1')
+    width, height = image.size
+    if features.check('libtiff'):
+        buffer = io.BytesIO()
+        # Ein einziger Streifen, damit die G4-Daten zusammenhängend in der TIFF-Datei liegen
+        image.save(buffer, 'TIFF', compression='group4', strip_size=(width + 7) // 8 * height)
+        buffer.seek(0)
+        with Image.open(buffer) as tiff:
+            offset = tiff.tag_v2[TiffImagePlugin.STRIPOFFSETS]
+            length = tiff.tag_v2[TiffImagePlugin.STRIPBYTECOUNTS]
+        offset = offset[0] if isinstance(offset, tuple) else offset
+        length = length[0] if isinstance(length, tuple) else length
+        data = buffer.getvalue()[offset:offset + length]
+        params = {'K': -1, 'BlackIs1': 'true', 'Columns': width, 'Rows': height}
+        return data, 'CCITTFaxDecode', params
+    # Mode '1' ist zeilenweise auf Bytes aufgefüllt, 1 = weiß wie bei DeviceGray
+    return zlib.compress(image.tobytes(), 6), 'FlateDecode', None
+
+
+def encode_page_image(image, preset='balanced', dpi=None):
+    """Kodiert ein Seitenbild für die Einbettung in die PDF.
+
+    `dpi` ist die Auflösung, mit der das Bild auf der Seite erscheint (für das Verkleinern von
+    Graustufen- und Farbseiten). Liefert ein Dict mit `encoding` (`bilevel`, `gray`, `color`),
+    den kodierten Daten und den Angaben für das Bild-XObject.
+    """
+    settings = COMPRESSION_PRESETS[preset]
+    encoding = classify_image(image, preset)
+    if encoding == 'bilevel':
+        data, pdf_filter, params = _encode_bilevel(image)
+        width, height = image.size
+        color_space, bits = 'DeviceGray', 1
+    else:
+        gray = encoding == 'gray'
+        target = _downsample(image.convert('L' if gray else 'RGB'), dpi,
+                             settings['gray_dpi' if gray else 'color_dpi'])
+        buffer = io.BytesIO()
+        target.save(buffer, 'JPEG', quality=settings['jpeg_quality'], subsampling=settings['subsampling'],
+                    optimize=True)
+        data, pdf_filter, params = buffer.getvalue(), 'DCTDecode', None
+        width, height = target.size
+        color_space, bits = ('DeviceGray' if gray else 'DeviceRGB'), 8
+    return {'encoding': encoding, 'data': data, 'filter': pdf_filter, 'params': params,
+            'width': width, 'height': height, 'color_space': color_space, 'bits': bits}
+
+
+class _EncodedImageXObject(pdfdoc.PDFImageXObject):
+    """Bild-XObject mit bereits kodierten Daten (ReportLab würde sie dekodieren und neu packen)."""
+
+    def __init__(self, name, encoded):
+        self.name = name
+        self.width, self.height = encoded['width'], encoded['height']
+        self.bitsPerComponent = encoded['bits']
+        self.colorSpace = encoded['color_space']
+        self.streamContent = encoded['data']
+        self._filters = (encoded['filter'],)
+        self._params = encoded['params']
+        self.mask = None
+
+    def format(self, document):
+        stream = pdfdoc.PDFStream(content=self.streamContent)
+        dictionary = stream.dictionary
+        dictionary['Type'] = pdfdoc.PDFName('XObject')
+        dictionary['Subtype'] = pdfdoc.PDFName('Image')
+        dictionary['Width'] = self.width
+        dictionary['Height'] = self.height
+        dictionary['BitsPerComponent'] = self.bitsPerComponent
+        dictionary['ColorSpace'] = pdfdoc.PDFName(self.colorSpace)
+        dictionary['Filter'] = pdfdoc.PDFArray([pdfdoc.PDFName(f) for f in self._filters])
+        if self._params:
+            dictionary['DecodeParms'] = pdfdoc.PDFArray([pdfdoc.PDFDictionary(dict(self._params))])
+        dictionary['Length'] = len(self.streamContent)
+        return stream.format(document)
+
+
+def _register_xobject(c, name, xobject):
+    """Meldet ein Bild-XObject beim Dokument des Canvas an, wie es `Canvas.drawImage` intern tut.
+
+    Nur für 1-Bit-Seiten (G4/Flate): `drawImage` übernimmt außer JPEG keine kodierten Daten und
+    würde sie als 8-Bit-RGB neu packen. Die internen Aufrufe sind auf diese Funktion beschränkt,
+    `requirements.txt` begrenzt ReportLab auf die Hauptversion 5 und
+    `tests/test_compression.py` prüft, dass die verwendeten Attribute noch existieren.
+    """
+    reg_name = c._doc.getXObjectName(name)
+    if not c._doc.idToObject.get(reg_name):
+        c._setXObjects(xobject)
+        c._doc.Reference(xobject, reg_name)
+        c._doc.addForm(name, xobject)
+
+
+def draw_encoded_image(c, encoded, x, y, width, height):
+    """Zeichnet ein mit `encode_page_image` kodiertes Bild auf den Canvas (wie `drawImage`)."""
+    if encoded['filter'] == 'DCTDecode':
+        # drawImage übernimmt JPEG-Daten unverändert (DCTDecode), ohne sie neu zu kodieren
+        c.drawImage(ImageReader(io.BytesIO(encoded['data'])), x, y, width, height)
+        return
+    name = 'pdf2ocr' + hashlib.md5(encoded['data']).hexdigest()
+    _register_xobject(c, name, _EncodedImageXObject(name, encoded))
+    c._currentPageHasImages = 1  # ProcSet der Seite um Bilder ergänzen
+    c.saveState()
+    c.translate(x, y)
+    c.scale(width, height)
+    c.doForm(name)
+    c.restoreState()
@@ -0,0 +1,164 @@
+"""OCR-Engine: dauerhaft geladene Tesseract-Instanzen statt eines Prozesses pro Aufruf.
+
+pytesseract startet für jeden Aufruf einen `tesseract`-Prozess, schreibt das Bild in eine
+temporäre Datei und lädt die Sprachmodelle neu. Ist `tesserocr` (Python-Bindings der
+Tesseract-C-API) installiert, hält dieses Modul stattdessen pro Prozess einen Pool fertig
+initialisierter Engines je Sprachauswahl und Seitensegmentierung; ein Thread leiht sich eine
+Instanz für einen Aufruf aus und gibt sie danach zurück. Ohne `tesserocr` (oder mit
+`OCR_ENGINE=pytesseract`) wird wie bisher pytesseract verwendet.
+
+Beide Wege liefern dasselbe Format wie `pytesseract.image_to_data(..., output_type=Output.DICT)`.
+"""
+
+import logging
+import os
+import queue
+import shlex
+import threading
+from contextlib import contextmanager
+
+import pytesseract
+
+try:
+    import tesserocr
+except ImportError:  # optionale Abhängigkeit
+    tesserocr = None
+
+logger = logging.getLogger(__name__)
+
+# Standard-Seitensegmentierung von Tesseract (vollautomatisch, ohne OSD)
+_DEFAULT_PSM = 3
+
+
+def engine_name():
+    """Aktive Engine: `OCR_ENGINE` (`tesserocr`/`pytesseract`), Standard `auto` = tesserocr falls installiert."""
+    configured = os.getenv('OCR_ENGINE', 'auto').strip().lower()
+    if configured == 'pytesseract' or tesserocr is None:
+        return 'pytesseract'
+    return 'tesserocr'
+
+
+def _parse_config(config):
+    """Zerlegt eine Tesseract-Kommandozeilen-Konfiguration (`--psm 6 -c name=wert`) für die C-API."""
+    psm, variables = _DEFAULT_PSM, {}
+    args = shlex.split(config or '')
+    for i, arg in enumerate(args):
+        if arg == '--psm' and i + 1 < len(args):
+            psm = int(args[i + 1])
+        elif arg == '-c' and i + 1 < len(args) and '=' in args[i + 1]:
+            name, value = args[i + 1].split('=', 1)
+            variables[name] = value
+    return psm, tuple(sorted(variables.items()))
+
+
+_pools = {}
+_pools_pid = None
+_pools_lock = threading.Lock()
+
+
+def _pool(key):
+    """Warteschlange freier Engines für `(sprachen, psm, variablen)`, pro Prozess (nach fork neu)."""
+    global _pools, _pools_pid
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            # Engines aus dem Elternprozess sind nach fork nicht verwendbar
+            _pools = {}
+            _pools_pid = os.getpid()
+        return _pools.setdefault(key, queue.LifoQueue())
+
+
+def _create_api(key):
+    lang, psm, variables = key
+    api = tesserocr.PyTessBaseAPI(lang=lang, psm=psm)
+    for name, value in variables:
+        api.SetVariable(name, value)
+    logger.info(f"Tesseract-Engine geladen: {lang} (psm {psm})")
+    return api
+
+
+@contextmanager
+def _borrowed_api(lang, config):
+    """Leiht eine Engine aus dem Pool aus (legt bei Bedarf eine neue an) und gibt sie danach zurück."""
+    psm, variables = _parse_config(config)
+    key = (lang, psm, variables)
+    pool = _pool(key)
+    try:
+        api = pool.get_nowait()
+    except queue.Empty:
+        api = _create_api(key)
+    try:
+        yield api
+    except BaseException:
+        # Nach einem Fehler ist der Zustand der Instanz unklar, sie wird verworfen
+        api.End()
+        raise
+    api.Clear()
+    pool.put(api)
+
+
+def _tesserocr_data(api):
+    """Wortergebnisse der letzten Erkennung im Format von `image_to_data` (Output.DICT)."""
+    RIL = tesserocr.RIL
+    data = {key: [] for key in ('level', 'text', 'left', 'top', 'width', 'height', 'conf',
+                                'block_num', 'par_num', 'line_num', 'word_num')}
+    block = par = line = word = 0
+    iterator = api.GetIterator()
+    if iterator is None:
+        return data
+    for result in tesserocr.iterate_level(iterator, RIL.WORD):
+        if result.IsAtBeginningOf(RIL.BLOCK):
+            block, par, line = block + 1, 0, 0
+        if result.IsAtBeginningOf(RIL.PARA):
+            par, line = par + 1, 0
+        if result.IsAtBeginningOf(RIL.TEXTLINE):
+            line, word = line + 1, 0
+        word += 1
+        box = result.BoundingBox(RIL.WORD)
+        if box is None:
+            continue
+        left, top, right, bottom = box
+        data['level'].append(5)
+        data['text'].append(result.GetUTF8Text(RIL.WORD) or '')
+        data['left'].append(left)
+        data['top'].append(top)
+        data['width'].append(right - left)
+        data['height'].append(bottom - top)
+        data['conf'].append(result.Confidence(RIL.WORD))
+        data['block_num'].append(block)
+        data['par_num'].append(par)
+        data['line_num'].append(line)
+        data['word_num'].append(word)
+    return data
+
+
+def image_to_data(image, lang, config=''):
+    """Erkennt ein Bild und liefert Wörter mit Boxen und Konfidenz (wie `pytesseract.image_to_data`)."""
+    if engine_name() == 'pytesseract':
+        return pytesseract.image_to_data(image, lang=lang, config=config, output_type=pytesseract.Output.DICT)
+    with _borrowed_api(lang, config) as api:
+        api.SetImage(image)
+        api.Recognize()
+        return _tesserocr_data(api)
+
+
+def image_to_string(image, lang, config=''):
+    """Erkennt ein Bild und liefert nur den Text (wie `pytesseract.image_to_string`)."""
+    if engine_name() == 'pytesseract':
+        return pytesseract.image_to_string(image, lang=lang, config=config)
+    with _borrowed_api(lang, config) as api:
+        api.SetImage(image)
+        return api.GetUTF8Text()
+
+
+def warm_up(langs, config=''):
+    """Lädt für jede Sprachauswahl vorab eine Engine in den Pool dieses Prozesses."""
+    if engine_name() == 'pytesseract':
+        return 0
+    loaded = 0
+    for lang in langs:
+        key = (lang, *_parse_config(config))
+        pool = _pool(key)
+        if pool.empty():
+            pool.put(_create_api(key))
+            loaded += 1
+    return loaded
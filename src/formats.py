@@ -0,0 +1,233 @@
+"""Strukturierte Ausgabeformate: JSON, hOCR und ALTO aus den Seitenergebnissen der OCR.
+
+Grundlage sind die Seitenergebnisse aus `ocr.iter_document_pages` (Wörter mit Boxen, Konfidenz
+sowie Block-, Absatz- und Zeilennummer aus dem einen OCR-Lauf je Seite). Jedes Format wird als
+Generator Seite für Seite erzeugt, sodass die Antwort gestreamt werden kann, während die
+folgenden Seiten noch erkannt werden.
+
+Koordinaten sind Pixel der erkannten Seite (`dpi` gibt die Auflösung an). Seiten mit
+eingebettetem PDF-Text werden ohne OCR übernommen und enthalten nur Textzeilen ohne Boxen.
+"""
+
+import json
+from html import escape
+
+FORMATS = ('json', 'hocr', 'alto')
+
+MIMETYPES = {
+    'json': 'application/json',
+    'hocr': 'text/html',
+    'alto': 'application/xml',
+}
+
+
+def _bbox(words):
+    """Umschließendes Rechteck `[links, oben, rechts, unten]` einer Wortliste."""
+    return [
+        min(w['left'] for w in words),
+        min(w['top'] for w in words),
+        max(w['left'] + w['width'] for w in words),
+        max(w['top'] + w['height'] for w in words),
+    ]
+
+
+def _confidence(words):
+    """Mittlere Konfidenz (0-100) einer Wortliste, `None` wenn Tesseract keine geliefert hat."""
+    confidences = [w['conf'] for w in words if w['conf'] >= 0]
+    return round(sum(confidences) / len(confidences), 2) if confidences else None
+
+
+def group_words(words):
+    """Gruppiert Wörter in Lesereihenfolge zu Absätzen und Zeilen: `[[zeile, ...], ...]`.
+
+    Ein Absatz ist eine Folge von Wörtern mit gleichem (Block, Absatz), eine Zeile eine Folge mit
+    gleicher (Block, Absatz, Zeile).
+    """
+    paragraphs = []
+    previous = None
+    for word in words:
+        key = (word.get('block', 0), word.get('par', 0), word.get('line', 0))
+        if previous is None or key[:2] != previous[:2]:
+            paragraphs.append([[word]])
+        elif key != previous:
+            paragraphs[-1].append([word])
+        else:
+            paragraphs[-1][-1].append(word)
+        previous = key
+    return paragraphs
+
+
+def _text_lines(text):
+    return [line.strip() for line in (text or '').splitlines() if line.strip()]
+
+
+def _single_language(lang):
+    """Sprachattribut für hOCR/ALTO, nur bei genau einem Sprachmodell eindeutig."""
+    return lang if lang and '+' not in lang else None
+
+
+def page_to_dict(index, page_result):
+    """Seitenergebnis als JSON-Objekt mit Absätzen, Zeilen und Wörtern inkl. Boxen und Konfidenz."""
+    page = {
+        'page': index + 1,
+        'width': page_result.get('width'),
+        'height': page_result.get('height'),
+        'dpi': page_result.get('dpi'),
+        'source': page_result.get('source', 'ocr'),
+        'language': page_result.get('lang'),
+        'text': page_result.get('text') or '',
+    }
+    words = page_result.get('words') or []
+    if words:
+        page['paragraphs'] = [{
+            'bbox': _bbox([w for line in lines for w in line]),
+            'lines': [{
+                'bbox': _bbox(line),
+                'confidence': _confidence(line),
+                'text': ' '.join(w['text'] for w in line),
+                'words': [{'text': w['text'], 'bbox': _bbox([w]), 'confidence': w['conf'] if w['conf'] >= 0 else None}
+                          for w in line],
+            } for line in lines],
+        } for lines in group_words(words)]
+    else:
+        page['paragraphs'] = [{'lines': [{'text': line} for line in _text_lines(page['text'])]}] if page['text'] else []
+    for key in ('blank', 'error'):
+        if page_result.get(key):
+            page[key] = page_result[key]
+    return page
+
+
+def iter_json(pages, details=None):
+    """Ein JSON-Dokument `{"pages": [...], "language": ...}`, eine Seite pro Block."""
+    yield '{"pages": ['
+    for n, (index, page_result) in enumerate(pages):
+        yield (',' if n else '') + '\n' + json.dumps(page_to_dict(index, page_result), ensure_ascii=False)
+    language = (details or {}).get('language')
+    yield '\n], "language": ' + json.dumps(language) + '}\n'
+
+
+def _hocr_bbox(box):
+    return 'bbox {} {} {} {}'.format(*box)
+
+
+def _hocr_page(index, page_result):
+    n = index + 1
+    width, height = int(page_result.get('width') or 0), int(page_result.get('height') or 0)
+    title = f"bbox 0 0 {width} {height}; ppageno {index}"
+    if page_result.get('dpi'):
+        title += f"; scan_res {page_result['dpi']} {page_result['dpi']}"
+    lang = _single_language(page_result.get('lang'))
+    lang_attr = f" lang='{escape(lang)}'" if lang else ''
+    parts = [f"  <div class='ocr_page' id='page_{n}' title='{title}'{lang_attr}>\n"]
+
+    words = page_result.get('words') or []
+    if words:
+        word_id = line_id = 0
+        for par_id, lines in enumerate(group_words(words), start=1):
+            par_words = [w for line in lines for w in line]
+            parts.append(f"   <p class='ocr_par' id='par_{n}_{par_id}' title='{_hocr_bbox(_bbox(par_words))}'>\n")
+            for line in lines:
+                line_id += 1
+                parts.append(f"    <span class='ocr_line' id='line_{n}_{line_id}' title='{_hocr_bbox(_bbox(line))}'>")
+                spans = []
+                for w in line:
+                    word_id += 1
+                    title = _hocr_bbox(_bbox([w]))
+                    if w['conf'] >= 0:
+                        title += f"; x_wconf {round(w['conf'])}"
+                    spans.append(f"<span class='ocrx_word' id='word_{n}_{word_id}' title='{title}'>{escape(w['text'])}</span>")
+                parts.append(' '.join(spans) + '</span>\n')
+            parts.append('   </p>\n')
+    elif page_result.get('text'):
+        # Eingebetteter PDF-Text: Zeilen ohne Positionen
+        parts.append(f"   <p class='ocr_par' id='par_{n}_1'>\n")
+        for line_id, line in enumerate(_text_lines(page_result['text']), start=1):
+            parts.append(f"    <span class='ocr_line' id='line_{n}_{line_id}'>{escape(line)}</span>\n")
+        parts.append('   </p>\n')
+    parts.append('  </div>\n')
+    return ''.join(parts)
+
+
+def iter_hocr(pages, details=None):
+    """hOCR-Dokument (XHTML) mit `ocr_page`, `ocr_par`, `ocr_line` und `ocrx_word` samt `x_wconf`."""
+    yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN" '
+           '"http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">\n'
+           '<html xmlns="http://www.w3.org/1999/xhtml">\n'
+           ' <head>\n'
+           '  <title></title>\n'
+           '  <meta http-equiv="Content-Type" content="text/html;charset=utf-8"/>\n'
+           "  <meta name='ocr-system' content='pdf2ocr (tesseract)'/>\n"
+           "  <meta name='ocr-capabilities' content='ocr_page ocr_par ocr_line ocrx_word'/>\n"
+           ' </head>\n'
+           ' <body>\n')
+    for index, page_result in pages:
+        yield _hocr_page(index, page_result)
+    yield ' </body>\n</html>\n'
+
+
+def _alto_box(box):
+    left, top, right, bottom = box
+    return f'HPOS="{left}" VPOS="{top}" WIDTH="{right - left}" HEIGHT="{bottom - top}"'
+
+
+def _alto_page(index, page_result):
+    n = index + 1
+    width, height = int(page_result.get('width') or 0), int(page_result.get('height') or 0)
+    lang = _single_language(page_result.get('lang'))
+    lang_attr = f' LANG="{escape(lang)}"' if lang else ''
+    parts = [f'   <Page ID="page_{n}" PHYSICAL_IMG_NR="{n}" WIDTH="{width}" HEIGHT="{height}">\n',
+             f'    <PrintSpace HPOS="0" VPOS="0" WIDTH="{width}" HEIGHT="{height}">\n']
+
+    words = page_result.get('words') or []
+    if words:
+        word_id = line_id = 0
+        for block_id, lines in enumerate(group_words(words), start=1):
+            block_box = _bbox([w for line in lines for w in line])
+            parts.append(f'     <TextBlock ID="block_{n}_{block_id}" {_alto_box(block_box)}{lang_attr}>\n')
+            for line in lines:
+                line_id += 1
+                parts.append(f'      <TextLine ID="line_{n}_{line_id}" {_alto_box(_bbox(line))}>')
+                strings = []
+                for w in line:
+                    word_id += 1
+                    wc = f' WC="{w["conf"] / 100:.2f}"' if w['conf'] >= 0 else ''
+                    strings.append(f'<String ID="string_{n}_{word_id}" {_alto_box(_bbox([w]))}{wc} '
+                                   f'CONTENT="{escape(w["text"])}"/>')
+                parts.append('<SP/>'.join(strings) + '</TextLine>\n')
+            parts.append('     </TextBlock>\n')
+    elif page_result.get('text'):
+        # Eingebetteter PDF-Text: Zeilen ohne Positionen
+        parts.append(f'     <TextBlock ID="block_{n}_1"{lang_attr}>\n')
+        for line_id, line in enumerate(_text_lines(page_result['text']), start=1):
+            parts.append(f'      <TextLine ID="line_{n}_{line_id}"><String CONTENT="{escape(line)}"/></TextLine>\n')
+        parts.append('     </TextBlock>\n')
+    parts.append('    </PrintSpace>\n   </Page>\n')
+    return ''.join(parts)
+
+
+def iter_alto(pages, details=None):
+    """ALTO-XML (v4) mit `TextBlock`, `TextLine` und `String` samt Wortkonfidenz `WC` (0-1)."""
+    yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<alto xmlns="http://www.loc.gov/standards/alto/ns-v4#" '
+           'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+           'xsi:schemaLocation="http://www.loc.gov/standards/alto/ns-v4# '
+           'http://www.loc.gov/standards/alto/v4/alto-4-2.xsd">\n'
+           ' <Description>\n'
+           '  <MeasurementUnit>pixel</MeasurementUnit>\n'
+           '  <OCRProcessing ID="ocr_1"><ocrProcessingStep><processingSoftware>'
+           '<softwareName>pdf2ocr (tesseract)</softwareName>'
+           '</processingSoftware></ocrProcessingStep></OCRProcessing>\n'
+           ' </Description>\n'
+           ' <Layout>\n')
+    for index, page_result in pages:
+        yield _alto_page(index, page_result)
+    yield ' </Layout>\n</alto>\n'
+
+
+def iter_formatted(output_format, pages, details=None):
+    """Serialisiert `(seitenindex, Seitenergebnis)`-Paare blockweise im gewünschten Format."""
+    writers = {'json': iter_json, 'hocr': iter_hocr, 'alto': iter_alto}
+    if output_format not in writers:
+        raise ValueError(f"Invalid format '{output_format}', expected one of: {', '.join(FORMATS)}")
+    return writers[output_format](pages, details)
@@ -0,0 +1,337 @@
+"""Asynchrone OCR-Jobs mit SQLite-Warteschlange.
+
+Uploads werden in `JOBS_DIR` abgelegt und in einer SQLite-Datenbank eingereiht. Ein eigener
+Prozess (`python -m src.jobs`, mit `JOB_PROCESS_WORKERS` Threads) holt sich die Jobs ab, führt
+`process_file` aus und speichert das Ergebnis auf der Platte. Damit bleiben die HTTP-Worker frei,
+der Durchsatz lässt sich unabhängig von der Anzahl gleichzeitiger Requests steuern, und Jobs
+laufen ab dem Start weiter, ohne dass ein Request sie anstößt oder das Recycling der Gunicorn-Worker
+(`max_requests`) sie abbricht. Die Web-Worker starten nur mit `JOB_WORKERS` > 0 eigene Threads.
+
+Jede Übernahme eines Jobs bekommt eine eigene Claim-ID. Solange ein Worker einen Job bearbeitet,
+meldet ein Heartbeat-Thread alle `JOB_HEARTBEAT_INTERVAL` Sekunden, dass er noch lebt (unabhängig
+vom Seitenfortschritt, eine einzelne große Seite kann lange dauern). Erst wenn der Heartbeat
+`JOB_STALE_SECONDS` ausbleibt, wird der Job neu eingereiht. Ein Worker, dessen Claim inzwischen
+ersetzt wurde, schreibt weder Ergebnis noch Status und lässt den Upload liegen.
+"""
+
+import json
+import logging
+import os
+import shutil
+import signal
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+
+from . import metrics
+from .ocr import process_file
+
+logger = logging.getLogger(__name__)
+
+JOBS_DIR = os.getenv('JOBS_DIR', os.path.join(tempfile.gettempdir(), 'pdf2ocr-jobs'))
+
+# Jobs, deren Worker sich so lange nicht gemeldet hat, gelten als verwaist und werden neu eingereiht
+JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', '900'))
+
+# Abstand der Lebenszeichen laufender Jobs (deutlich kleiner als JOB_STALE_SECONDS)
+JOB_HEARTBEAT_INTERVAL = float(os.getenv('JOB_HEARTBEAT_INTERVAL', '30'))
+
+# Fertige Jobs (inkl. Ergebnis) werden nach dieser Zeit gelöscht
+JOB_RESULT_TTL = int(os.getenv('JOB_RESULT_TTL', '86400'))
+
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '1.0'))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    input_path TEXT NOT NULL,
+    options TEXT,
+    result_path TEXT,
+    result_type TEXT,
+    language TEXT,
+    error TEXT,
+    pages_done INTEGER NOT NULL DEFAULT 0,
+    pages_total INTEGER,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    updated_at REAL NOT NULL,
+    finished_at REAL,
+    claim_id TEXT,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+_PUBLIC_FIELDS = ('id', 'status', 'filename', 'result_type', 'language', 'error', 'pages_done', 'pages_total',
+                  'created_at', 'started_at', 'finished_at')
+
+
+def _connect():
+    """Öffnet eine Verbindung zur Job-Datenbank (eine pro Aufruf, damit Threads und Prozesse sicher sind)."""
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(JOBS_DIR, 'jobs.db'), timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.executescript(_SCHEMA)
+    columns = {row['name'] for row in conn.execute('PRAGMA table_info(jobs)')}
+    # Datenbanken aus älteren Versionen ohne Verarbeitungsoptionen, Sprache bzw. Claim
+    for column, kind in (('options', 'TEXT'), ('language', 'TEXT'), ('claim_id', 'TEXT'), ('heartbeat_at', 'REAL')):
+        if column not in columns:
+            conn.execute(f'ALTER TABLE jobs ADD COLUMN {column} {kind}')
+    return conn
+
+
+def _job_dir(job_id):
+    return os.path.join(JOBS_DIR, job_id)
+
+
+def submit_job(file_stream, filename, options=None):
+    """Speichert den Upload und reiht einen neuen Job ein. Gibt die Job-ID zurück.
+
+    `options` sind zusätzliche Schlüsselwortargumente für `process_file` (z. B. `output_mode`).
+    """
+    job_id = uuid.uuid4().hex
+    job_dir = _job_dir(job_id)
+    os.makedirs(job_dir, exist_ok=True)
+    input_path = os.path.join(job_dir, 'input')
+    with metrics.span('upload', target='job') as tags, open(input_path, 'wb') as f:
+        shutil.copyfileobj(file_stream, f, 1024 * 1024)
+        tags['bytes'] = f.tell()
+
+    now = time.time()
+    conn = _connect()
+    try:
+        conn.execute(
+            'INSERT INTO jobs (id, status, filename, input_path, options, created_at, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (job_id, 'queued', filename, input_path, json.dumps(options or {}), now, now),
+        )
+    finally:
+        conn.close()
+    logger.info(f"Job {job_id} eingereiht: {filename}")
+    return job_id
+
+
+def get_job(job_id):
+    """Liefert den Status eines Jobs als Dict oder None, wenn der Job nicht existiert."""
+    conn = _connect()
+    try:
+        row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    finally:
+        conn.close()
+    return dict(row) if row else None
+
+
+def job_status(job):
+    """Öffentliche Sicht auf einen Job für die API (ohne interne Pfade)."""
+    return {field: job[field] for field in _PUBLIC_FIELDS}
+
+
+def queue_depth():
+    """Anzahl wartender und laufender Jobs."""
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT status, COUNT(*) AS n FROM jobs WHERE status IN ('queued', 'running') GROUP BY status"
+        ).fetchall()
+    finally:
+        conn.close()
+    depth = {'queued': 0, 'running': 0}
+    depth.update({row['status']: row['n'] for row in rows})
+    return depth
+
+
+def claim_next_job():
+    """Übernimmt atomar den ältesten wartenden Job (über alle Prozesse hinweg) oder liefert None.
+
+    Der gelieferte Job enthält die neue `claim_id`, mit der `run_job` ihn bearbeitet.
+    """
+    conn = _connect()
+    try:
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        # Verwaiste Jobs (Worker abgestürzt oder recycelt, kein Heartbeat mehr) wieder einreihen
+        conn.execute(
+            "UPDATE jobs SET status = 'queued', claim_id = NULL, updated_at = ? "
+            "WHERE status = 'running' AND COALESCE(heartbeat_at, updated_at) < ?",
+            (now, now - JOB_STALE_SECONDS),
+        )
+        row = conn.execute(
+            "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+        ).fetchone()
+        if row is None:
+            conn.execute('COMMIT')
+            return None
+        claim_id = uuid.uuid4().hex
+        conn.execute(
+            "UPDATE jobs SET status = 'running', started_at = ?, updated_at = ?, heartbeat_at = ?, pages_done = 0, "
+            "claim_id = ? WHERE id = ?",
+            (now, now, now, claim_id, row['id']),
+        )
+        conn.execute('COMMIT')
+        return dict(row, claim_id=claim_id)
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+
+def _update_job(job_id, claim_id, **fields):
+    """Aktualisiert einen Job, sofern er noch unter `claim_id` läuft. Gibt zurück, ob das der Fall war."""
+    fields['updated_at'] = time.time()
+    assignments = ', '.join(f'{name} = ?' for name in fields)
+    conn = _connect()
+    try:
+        cursor = conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ? AND claim_id = ? AND status = 'running'",
+                              (*fields.values(), job_id, claim_id))
+        return cursor.rowcount > 0
+    finally:
+        conn.close()
+
+
+def _heartbeat(job_id, claim_id, stop_event):
+    while not stop_event.wait(JOB_HEARTBEAT_INTERVAL):
+        try:
+            if not _update_job(job_id, claim_id, heartbeat_at=time.time()):
+                return  # Job wurde neu vergeben
+        except sqlite3.Error as e:
+            logger.warning(f"Job {job_id}: Heartbeat fehlgeschlagen: {e}")
+
+
+def _cleanup_expired_jobs():
+    """Löscht fertige Jobs samt Dateien, deren Aufbewahrungszeit abgelaufen ist."""
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT id FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+            (time.time() - JOB_RESULT_TTL,),
+        ).fetchall()
+        for row in rows:
+            shutil.rmtree(_job_dir(row['id']), ignore_errors=True)
+            conn.execute('DELETE FROM jobs WHERE id = ?', (row['id'],))
+    finally:
+        conn.close()
+
+
+def run_job(job):
+    """Führt einen übernommenen Job aus und speichert Ergebnis oder Fehler.
+
+    Wurde der Job zwischenzeitlich neu vergeben (Claim ersetzt), wird das eigene Ergebnis verworfen;
+    Upload und Status gehören dann dem neuen Worker.
+    """
+    job_id, claim_id = job['id'], job['claim_id']
+    logger.info(f"Job {job_id}: Verarbeitung gestartet ({job['filename']})")
+
+    def progress(pages_done, pages_total):
+        _update_job(job_id, claim_id, pages_done=pages_done, pages_total=pages_total)
+
+    stop_heartbeat = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(job_id, claim_id, stop_heartbeat),
+                                 name=f'job-heartbeat-{job_id[:8]}', daemon=True)
+    heartbeat.start()
+    details = {}
+    owned = False
+    result_path = None
+    try:
+        with open(job['input_path'], 'rb') as f:
+            options = json.loads(job.get('options') or '{}')
+            result = process_file(f, job['filename'], progress=progress, details=details, **options)
+
+        # Ergebnisdatei pro Claim, damit ein abgelöster Worker nicht das Ergebnis des neuen überschreibt
+        if isinstance(result, os.PathLike):
+            result_type = 'pdf'
+            result_path = os.path.join(_job_dir(job_id), f'result-{claim_id}.pdf')
+            shutil.move(result, result_path)
+        else:
+            result_type = 'text'
+            result_path = os.path.join(_job_dir(job_id), f'result-{claim_id}.txt')
+            with open(result_path, 'w', encoding='utf-8') as f:
+                f.write(result or '')
+
+        owned = _update_job(job_id, claim_id, status='done', result_path=result_path, result_type=result_type,
+                            language=details.get('language'), finished_at=time.time())
+        if owned:
+            logger.info(f"Job {job_id}: fertig ({result_type})")
+    except Exception as e:
+        logger.exception(f"Job {job_id}: Fehler: {e}")
+        owned = _update_job(job_id, claim_id, status='failed', error=str(e), finished_at=time.time())
+    finally:
+        stop_heartbeat.set()
+        if owned:
+            if os.path.exists(job['input_path']):
+                os.unlink(job['input_path'])
+        else:
+            logger.warning(f"Job {job_id}: wurde neu vergeben, Ergebnis dieses Workers wird verworfen")
+            if result_path and os.path.exists(result_path):
+                os.unlink(result_path)
+
+
+def _worker_loop(stop_event):
+    while not stop_event.is_set():
+        try:
+            job = claim_next_job()
+            if job is None:
+                _cleanup_expired_jobs()
+                stop_event.wait(JOB_POLL_INTERVAL)
+                continue
+            run_job(job)
+        except Exception as e:
+            logger.exception(f"Job-Worker: Fehler: {e}")
+            stop_event.wait(JOB_POLL_INTERVAL)
+
+
+_workers = []
+_workers_pid = None
+_workers_lock = threading.Lock()
+_stop_event = threading.Event()
+
+
+def start_job_workers(count=None):
+    """Startet die Job-Worker-Threads dieses Prozesses (einmalig, nach fork erneut).
+
+    Ohne `count` gilt `JOB_WORKERS` (Standard 0: Jobs laufen im eigenen Prozess, siehe `main`).
+    """
+    global _workers, _workers_pid
+    if count is None:
+        count = int(os.getenv('JOB_WORKERS', '0'))
+    with _workers_lock:
+        if _workers_pid == os.getpid():
+            return len(_workers)
+        _workers = []
+        _workers_pid = os.getpid()
+        for i in range(count):
+            thread = threading.Thread(target=_worker_loop, args=(_stop_event,), name=f'ocr-job-{i}', daemon=True)
+            thread.start()
+            _workers.append(thread)
+        if count:
+            logger.info(f"{count} Job-Worker gestartet (PID {os.getpid()})")
+        return count
+
+
+def main():
+    """Eigenständiger Job-Prozess: `JOB_PROCESS_WORKERS` Threads (Standard 1) bis SIGTERM/SIGINT.
+
+    Beim Beenden werden keine neuen Jobs mehr übernommen, laufende Jobs werden noch fertig
+    verarbeitet (Docker `stop_grace_period`, Gunicorn `graceful_timeout`).
+    """
+    metrics.configure_logging()
+    signal.signal(signal.SIGTERM, lambda signum, frame: _stop_event.set())
+    count = max(1, int(os.getenv('JOB_PROCESS_WORKERS', '1')))
+    start_job_workers(count)
+    try:
+        while not _stop_event.wait(3600):
+            pass
+    except KeyboardInterrupt:
+        _stop_event.set()
+    logger.info("Job-Prozess wird beendet, laufende Jobs werden abgeschlossen")
+    for thread in _workers:
+        thread.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""Spracherkennung für die OCR: Auswahl der Tesseract-Sprachmodelle pro Dokument.
+
+Tesseract ist mit allen vier Sprachmodellen geladen deutlich langsamer als mit einem oder
+zwei. Deshalb wird die Sprache einmal pro Dokument bestimmt, entweder aus vorhandenem Text
+(eingebetteter PDF-Text) oder über einen Probe-Lauf auf einer verkleinerten ersten Seite,
+und die restlichen Seiten laufen nur mit der engsten passenden Sprachauswahl.
+
+Die Bewertung zählt Stoppwörter und sprachtypische Zeichen in einem Durchgang über den Text;
+Muster und Wortlisten werden beim Import einmalig aufgebaut.
+"""
+
+import logging
+import os
+import re
+from collections import Counter
+
+from . import engine
+
+logger = logging.getLogger(__name__)
+
+# Installierte Sprachmodelle (siehe Dockerfile)
+LANGUAGES = ('deu', 'eng', 'fra', 'ita')
+ALL_LANGUAGES = '+'.join(LANGUAGES)
+
+# Häufige Funktionswörter pro Sprache
+_STOPWORDS = {
+    'deu': 'der die das und oder mit von zu in auf für ist sind haben werden können müssen sollen '
+           'ich du er sie es wir ihr nicht ein eine den dem des im auch sich bei nach wird',
+    'eng': 'the and or with for in on at to of is are have will can must should '
+           'i you he she it we they this that from be not by',
+    'fra': 'le la les de du des et ou avec pour dans sur est sont avoir être pouvoir devoir '
+           'je tu il elle nous vous ils elles une pas par au aux que qui',
+    'ita': 'il la lo gli le di del della e o con per in su è sono avere essere potere dovere '
+           'io tu lui lei noi voi loro non che una al alla',
+}
+
+# Sprachtypische Buchstaben
+_CHARACTERS = {
+    'deu': 'äöüß',
+    'fra': 'àâéèêëïîôùûüÿçœ',
+    'ita': 'àèéìíîòóù',
+}
+
+
+def _weights(indicators, split):
+    """Bildet `{indikator: [(sprache, gewicht), ...]}`. Ein Indikator, der in mehreren Sprachen
+    vorkommt (z. B. "la"), zählt für jede davon nur anteilig."""
+    languages = {}
+    for lang, items in indicators.items():
+        for item in split(items):
+            languages.setdefault(item, []).append(lang)
+    return {item: [(lang, 1 / len(langs)) for lang in langs] for item, langs in languages.items()}
+
+
+_WORD_WEIGHTS = _weights(_STOPWORDS, str.split)
+_CHAR_WEIGHTS = _weights(_CHARACTERS, list)
+
+_TOKEN_RE = re.compile(r"[^\W\d_]+")
+
+# Mindestpunktzahl, ab der eine Sprache als erkannt gilt
+MIN_SCORE = 3
+
+# Die zweitstärkste Sprache wird nur dazugenommen, wenn sie mindestens diesen Anteil der stärksten erreicht
+SECONDARY_SHARE = 0.4
+
+
+def score_languages(text):
+    """Punktzahl pro Sprache aus Stoppwörtern und sprachtypischen Zeichen."""
+    text_lower = text.lower()
+    scores = dict.fromkeys(LANGUAGES, 0.0)
+    for token, count in Counter(_TOKEN_RE.findall(text_lower)).items():
+        for lang, weight in _WORD_WEIGHTS.get(token, ()):
+            scores[lang] += weight * count
+        if not token.isascii():
+            for char in token:
+                for lang, weight in _CHAR_WEIGHTS.get(char, ()):
+                    scores[lang] += weight * count
+    return scores
+
+
+def detect_language_from_text(text):
+    """Erkennt die Sprache des Textes und liefert die engste passende Tesseract-Sprachauswahl.
+
+    Bei zu wenig Indizien werden alle Sprachen verwendet, bei gemischten Texten die zwei stärksten.
+    """
+    if not text or len(text.strip()) < 10:
+        return 'deu+eng'  # Standard-Fallback
+
+    scores = score_languages(text)
+    ranked = sorted(LANGUAGES, key=scores.get, reverse=True)
+    best, second = ranked[0], ranked[1]
+
+    # Wenn die Erkennung zu unsicher ist, verwende Mehrsprachen-Modus
+    if scores[best] < MIN_SCORE:
+        return ALL_LANGUAGES
+
+    if scores[second] >= scores[best] * SECONDARY_SHARE:
+        return f"{best}+{second}"
+    return best
+
+
+def language_probe_enabled():
+    """Der Probe-Lauf ist aktiv, solange `OCR_LANGUAGE_PROBE` nicht auf 0/false gesetzt ist."""
+    return os.getenv('OCR_LANGUAGE_PROBE', '1').lower() not in ('0', 'false', 'no')
+
+
+def _probe_image(image):
+    """Verkleinert die Seite für den Probe-Lauf auf `OCR_LANGUAGE_PROBE_WIDTH` Pixel Breite."""
+    max_width = int(os.getenv('OCR_LANGUAGE_PROBE_WIDTH', '1000'))
+    if image.size[0] <= max_width:
+        return image
+    height = max(1, round(image.size[1] * max_width / image.size[0]))
+    return image.convert('L').resize((max_width, height))
+
+
+def probe_language(image):
+    """Bestimmt die Sprachauswahl für ein Dokument aus einem schnellen OCR-Lauf auf der ersten Seite.
+
+    Die Seite wird verkleinert und einmal mit allen Sprachen erkannt. Liefert der Lauf zu wenig
+    Text für eine sichere Entscheidung, bleibt es bei allen Sprachen.
+    """
+    if not language_probe_enabled():
+        return ALL_LANGUAGES
+    try:
+        text = engine.image_to_string(_probe_image(image), lang=ALL_LANGUAGES)
+    except Exception as e:
+        logger.warning(f"Sprach-Probe fehlgeschlagen: {e}")
+        return ALL_LANGUAGES
+    if len(text.strip()) < 10:
+        return ALL_LANGUAGES
+    lang = detect_language_from_text(text)
+    logger.debug(f"Sprach-Probe: {lang}")
+    return lang
@@ -0,0 +1,295 @@
+"""Strukturierte Zeitmessung, Logging und Prometheus-Metriken.
+
+`span(stage, **tags)` misst eine Verarbeitungsstufe (Upload, PyPDF2-Extraktion, Rasterung, OCR,
+Seitenbild kodieren, Text-Layer, PDF speichern), schreibt die Dauer samt Tags (Seitenzahl, DPI,
+Sprache, ...) als `key=value`-Zeile in das Log (`DEBUG`) und zählt sie im Histogramm
+`pdf2ocr_stage_seconds`.
+
+Die Metriken werden pro Prozess gesammelt und höchstens alle `METRICS_FLUSH_INTERVAL` Sekunden
+als JSON in `METRICS_DIR/<pid>-<token>.json` geschrieben (der Token unterscheidet Prozesse mit
+wiederverwendeter PID). `render` fasst die Dateien aller Gunicorn-Worker im Prometheus-Textformat
+zusammen, damit `/metrics` unabhängig davon, welcher Worker die Anfrage beantwortet, die Zahlen
+des ganzen Dienstes liefert.
+
+Beendete Worker faltet der Gunicorn-Master (`child_exit`, siehe gunicorn_config.py) mit `retire`
+in die Summe `retired.json` ein, damit das Verzeichnis beim Recycling nicht wächst und die Zähler
+monoton bleiben. Beim Start des Dienstes leert `reset` das Verzeichnis.
+"""
+
+import contextlib
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'pdf2ocr-metrics'))
+
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))
+
+# Histogramm-Grenzen: Dauer in Sekunden, Seiten pro Sekunde bzw. Bytes
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+RATE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100)
+BYTE_BUCKETS = (1e3, 5e3, 1e4, 2.5e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6)
+
+_HELP = {
+    'pdf2ocr_stage_seconds': ('histogram', 'Dauer der Verarbeitungsstufen'),
+    'pdf2ocr_document_seconds': ('histogram', 'Gesamtdauer pro Dokument'),
+    'pdf2ocr_document_pages_per_second': ('histogram', 'Durchsatz pro Dokument in Seiten pro Sekunde'),
+    'pdf2ocr_documents_total': ('counter', 'Verarbeitete Dokumente'),
+    'pdf2ocr_pages_total': ('counter', 'Verarbeitete Seiten nach Quelle'),
+    'pdf2ocr_admission_total': ('counter', 'Entscheidungen der Zulassungskontrolle'),
+    'pdf2ocr_cache_errors_total': ('counter', 'Cache-Zugriffe, die wegen eines Fehlers als Fehlschlag gelten'),
+    'pdf2ocr_page_image_bytes': ('histogram', 'Größe der eingebetteten Seitenbilder nach Kodierung'),
+}
+
+_lock = threading.Lock()
+_state = {'pid': None, 'token': None, 'counters': {}, 'histograms': {}, 'flushed': 0.0}
+
+# Summe der beendeten Worker und Namen der bereits eingefalteten Dateien
+_RETIRED = 'retired.json'
+
+
+def configure_logging():
+    """Richtet einen Log-Handler für das Paket ein (Level über `LOG_LEVEL`, Standard `INFO`).
+
+    Läuft die Anwendung unter Gunicorn, landen die Meldungen wie dessen eigene auf stderr.
+    Ein bereits konfigurierter Handler (z. B. von der Anwendung, die das Paket einbindet)
+    bleibt unangetastet.
+    """
+    package_logger = logging.getLogger('src')
+    package_logger.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+    if not package_logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(asctime)s [%(process)d] %(levelname)s %(name)s: %(message)s'))
+        package_logger.addHandler(handler)
+        package_logger.propagate = False
+
+
+def _local():
+    """Zähler dieses Prozesses; nach einem fork beginnt der Kindprozess mit leeren Zählern."""
+    if _state['pid'] != os.getpid():
+        _state.update(pid=os.getpid(), token=uuid.uuid4().hex[:8], counters={}, histograms={}, flushed=time.time())
+    return _state
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    """Erhöht einen Zähler."""
+    with _lock:
+        counters = _local()['counters']
+        key = _key(name, labels)
+        counters[key] = counters.get(key, 0) + amount
+    _maybe_flush()
+
+
+def observe(name, value, buckets=DURATION_BUCKETS, **labels):
+    """Trägt einen Messwert in ein Histogramm ein."""
+    with _lock:
+        histograms = _local()['histograms']
+        key = _key(name, labels)
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = {'buckets': list(buckets), 'counts': [0] * len(buckets),
+                                           'sum': 0.0, 'count': 0}
+        for i, bound in enumerate(histogram['buckets']):
+            if value <= bound:
+                histogram['counts'][i] += 1
+        histogram['sum'] += value
+        histogram['count'] += 1
+    _maybe_flush()
+
+
+@contextlib.contextmanager
+def span(stage, **tags):
+    """Misst die Dauer des Blocks als Stufe `stage` und loggt sie zusammen mit `tags`.
+
+    Liefert das Tag-Dict, damit erst im Block bekannte Werte (z. B. die Seitenzahl) ergänzt
+    werden können. Tags mit `None` werden nicht geloggt.
+    """
+    start = time.perf_counter()
+    status = 'ok'
+    try:
+        yield tags
+    except BaseException:
+        status = 'error'
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        observe('pdf2ocr_stage_seconds', duration, stage=stage)
+        if logger.isEnabledFor(logging.DEBUG):
+            fields = ' '.join(f'{key}={value}' for key, value in tags.items() if value is not None)
+            logger.debug(f"span stage={stage} duration_ms={duration * 1000:.1f} status={status} {fields}".rstrip())
+
+
+def _snapshot():
+    state = _local()
+    return _as_snapshot(state['counters'], state['histograms'])
+
+
+def _write_json(name, data):
+    """Schreibt `METRICS_DIR/name` atomar über eine temporäre Datei."""
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=METRICS_DIR, prefix='.tmp-')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, os.path.join(METRICS_DIR, name))
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def flush():
+    """Schreibt die Zähler dieses Prozesses nach `METRICS_DIR`."""
+    with _lock:
+        snapshot = _snapshot()
+        _state['flushed'] = time.time()
+        name = f"{_state['pid']}-{_state['token']}.json"
+    _write_json(name, snapshot)
+
+
+def _maybe_flush():
+    if time.time() - _state['flushed'] < METRICS_FLUSH_INTERVAL:
+        return
+    try:
+        flush()
+    except OSError as e:
+        logger.warning(f"Metriken konnten nicht geschrieben werden: {e}")
+
+
+def _merge(counters, histograms, snapshot):
+    """Addiert einen Snapshot (Format von `_snapshot`) zu den Summen."""
+    for name, labels, value in snapshot.get('counters', []):
+        key = (name, tuple(map(tuple, labels)))
+        counters[key] = counters.get(key, 0) + value
+    for name, labels, h in snapshot.get('histograms', []):
+        key = (name, tuple(map(tuple, labels)))
+        total = histograms.setdefault(key, {'buckets': h['buckets'], 'counts': [0] * len(h['buckets']),
+                                            'sum': 0.0, 'count': 0})
+        total['counts'] = [a + b for a, b in zip(total['counts'], h['counts'])]
+        total['sum'] += h['sum']
+        total['count'] += h['count']
+
+
+def _as_snapshot(counters, histograms):
+    return {
+        'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+        'histograms': [[name, list(labels), h] for (name, labels), h in histograms.items()],
+    }
+
+
+def _collect():
+    """Summiert die Zähler und Histogramme aller laufenden Prozesse und der beendeten Worker.
+
+    Die Worker-Dateien werden vor `retired.json` gelesen: eine Datei, die `retire` inzwischen
+    eingefaltet hat, steht dort in `folded` und wird übersprungen, so zählt jeder Prozess genau
+    einmal, auch während ein Worker eingefaltet wird.
+    """
+    snapshots = {}
+    for path in glob.glob(os.path.join(METRICS_DIR, '*-*.json')):
+        snapshot = _read_json(path)
+        if snapshot is not None:
+            snapshots[os.path.basename(path)] = snapshot
+    retired = _read_json(os.path.join(METRICS_DIR, _RETIRED)) or {}
+    folded = set(retired.get('folded', []))
+    counters, histograms = {}, {}
+    _merge(counters, histograms, retired)
+    for name, snapshot in snapshots.items():
+        if name not in folded:
+            _merge(counters, histograms, snapshot)
+    return counters, histograms
+
+
+def retire(pid):
+    """Faltet die Dateien des beendeten Prozesses `pid` in `retired.json` ein und löscht sie.
+
+    Nur aus einem Prozess aufrufen (Gunicorn-Master, `child_exit`). Eine später gestartete
+    Datei mit derselben PID hat einen anderen Token und wird nicht berührt.
+    """
+    paths = glob.glob(os.path.join(METRICS_DIR, f'{pid}-*.json'))
+    if not paths:
+        return
+    retired_path = os.path.join(METRICS_DIR, _RETIRED)
+    retired = _read_json(retired_path) or {}
+    counters, histograms = {}, {}
+    _merge(counters, histograms, retired)
+    # Namen gelöschter Dateien werden nicht mehr gebraucht, die Liste bleibt klein
+    folded = [name for name in retired.get('folded', []) if os.path.exists(os.path.join(METRICS_DIR, name))]
+    for path in paths:
+        snapshot = _read_json(path)
+        if snapshot is not None:
+            _merge(counters, histograms, snapshot)
+        folded.append(os.path.basename(path))
+    _write_json(_RETIRED, dict(_as_snapshot(counters, histograms), folded=folded))
+    for path in paths:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def reset():
+    """Leert `METRICS_DIR` (beim Start des Dienstes, Zähler beginnen wie bei Prometheus üblich bei 0)."""
+    for path in glob.glob(os.path.join(METRICS_DIR, '*.json')) + glob.glob(os.path.join(METRICS_DIR, '.tmp-*')):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(extra=()):
+    """Alle Metriken im Prometheus-Textformat (Version 0.0.4).
+
+    `extra` sind zusätzliche, beim Abruf ermittelte Werte als Tupel
+    `(name, typ, hilfetext, labels-dict, wert)`, z. B. die Länge der Job-Warteschlange.
+    """
+    flush()
+    counters, histograms = _collect()
+    families = {}
+    for (name, labels), value in counters.items():
+        families.setdefault(name, []).append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+    for (name, labels), h in histograms.items():
+        lines = families.setdefault(name, [])
+        for bound, count in zip(h['buckets'], h['counts']):
+            lines.append(f'{name}_bucket{_format_labels(labels, [("le", _format_value(float(bound)))])} {count}')
+        lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {h["count"]}')
+        lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(float(h["sum"]))}')
+        lines.append(f'{name}_count{_format_labels(labels)} {h["count"]}')
+    help_texts = dict(_HELP)
+    for name, kind, help_text, labels, value in extra:
+        help_texts.setdefault(name, (kind, help_text))
+        families.setdefault(name, []).append(
+            f'{name}{_format_labels(sorted(labels.items()))} {_format_value(value)}')
+
+    output = []
+    for name in sorted(families):
+        kind, help_text = help_texts.get(name, ('untyped', name))
+        output.append(f'# HELP {name} {help_text}')
+        output.append(f'# TYPE {name} {kind}')
+        output.extend(families[name])
+    return '\n'.join(output) + '\n'
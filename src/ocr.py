@@ -1,465 +1,1646 @@
 from PIL import Image
-import pytesseract
 import PyPDF2
-from pdf2image import convert_from_path
-import io
+from pdf2image import convert_from_path, pdfinfo_from_path
+import logging
 import os
 import tempfile
-import re
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
-def detect_language_from_text(text):
-    """Erkennt die Sprache des Textes basierend auf charakteristischen Zeichen und Wörtern."""
-    if not text or len(text.strip()) < 10:
-        return 'deu+eng'  # Standard-Fallback
-    
-    text_lower = text.lower()
-    
-    # Deutsche Indikatoren
-    german_indicators = [
-        r'\b(der|die|das|und|oder|mit|von|zu|in|auf|für|ist|sind|haben|werden|können|müssen|sollen)\b',
-        r'[äöüß]',  # Deutsche Umlaute
-        r'\b(ich|du|er|sie|es|wir|ihr|sie)\b'
-    ]
-    
-    # Französische Indikatoren
-    french_indicators = [
-        r'\b(le|la|les|de|du|des|et|ou|avec|pour|dans|sur|est|sont|avoir|être|pouvoir|devoir)\b',
-        r'[àâäéèêëïîôöùûüÿç]',  # Französische Akzente
-        r'\b(je|tu|il|elle|nous|vous|ils|elles)\b'
-    ]
-    
-    # Italienische Indikatoren
-    italian_indicators = [
-        r'\b(il|la|lo|gli|le|di|del|della|e|o|con|per|in|su|è|sono|avere|essere|potere|dovere)\b',
-        r'[àèéìíîòóù]',  # Italienische Akzente
-        r'\b(io|tu|lui|lei|noi|voi|loro)\b'
-    ]
-    
-    # Englische Indikatoren
-    english_indicators = [
-        r'\b(the|and|or|with|for|in|on|at|to|of|is|are|have|will|can|must|should)\b',
-        r'\b(i|you|he|she|it|we|they)\b'
-    ]
-    
-    # Zähle Indikatoren für jede Sprache
-    languages = {
-        'deu': sum(len(re.findall(pattern, text_lower)) for pattern in german_indicators),
-        'fra': sum(len(re.findall(pattern, text_lower)) for pattern in french_indicators),
-        'ita': sum(len(re.findall(pattern, text_lower)) for pattern in italian_indicators),
-        'eng': sum(len(re.findall(pattern, text_lower)) for pattern in english_indicators)
+from .cache import (
+    cache_enabled, cache_key, get_cached_result, store_result,
+    page_cache_key, get_cached_pages, store_pages,
+)
+from . import engine, metrics
+from .compression import default_compression, encode_page_image, draw_encoded_image
+from .language import ALL_LANGUAGES, detect_language_from_text, probe_language
+from .utils import (
+    preprocess_image, preprocess_steps, map_words_to_original, estimate_x_height, TARGET_X_HEIGHT, BINARIZE,
+)
+
+logger = logging.getLogger(__name__)
+
+# Auflösung für die Rasterung von PDF-Seiten (200 statt 300 DPI für schnellere Verarbeitung),
+# im Modus `OCR_DPI=auto` nur noch für Seiten ohne erkennbare Textzeilen
+PDF_DPI = 200
+
+# Adaptive Auflösung: Probe-Rasterung, Grenzen und angestrebte x-Höhe der Schrift beim Rastern
+PROBE_DPI = int(os.getenv('OCR_PROBE_DPI', '72'))
+MIN_DPI = int(os.getenv('OCR_MIN_DPI', '100'))
+MAX_DPI = int(os.getenv('OCR_MAX_DPI', '400'))
+RENDER_X_HEIGHT = int(os.getenv('OCR_RENDER_X_HEIGHT', '14'))
+
+def render_dpi():
+    """Rasterauflösung für PDF-Seiten aus `OCR_DPI`: feste DPI-Zahl oder `auto` (Standard, pro Seite)."""
+    configured = os.getenv('OCR_DPI', 'auto').strip().lower()
+    return 'auto' if configured == 'auto' else int(configured)
+
+def _parse_confidence(value):
+    """Wandelt den Konfidenzwert aus der Tesseract-TSV-Ausgabe in eine Zahl um."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return -1.0
+
+def _words_from_ocr_data(ocr_data):
+    """Wandelt die Ausgabe von `image_to_data` in eine Liste von Wörtern mit Boxen um."""
+    words = []
+    for j in range(len(ocr_data.get('text', []))):
+        text = str(ocr_data['text'][j]).strip()
+        if not text:
+            continue
+        words.append({
+            'text': text,
+            'left': int(ocr_data['left'][j]),
+            'top': int(ocr_data['top'][j]),
+            'width': int(ocr_data['width'][j]),
+            'height': int(ocr_data['height'][j]),
+            'conf': _parse_confidence(ocr_data['conf'][j]),
+            'block': int(ocr_data['block_num'][j]),
+            'par': int(ocr_data['par_num'][j]),
+            'line': int(ocr_data['line_num'][j]),
+        })
+    return words
+
+def _text_from_words(words):
+    """Setzt den Seitentext aus den Wörtern zusammen (Zeilen und Absätze wie bei `image_to_string`)."""
+    parts = []
+    previous = None
+    for word in words:
+        key = (word['block'], word['par'], word['line'])
+        if previous is not None:
+            if key[:2] != previous[:2]:
+                parts.append('\n\n')
+            elif key != previous:
+                parts.append('\n')
+            else:
+                parts.append(' ')
+        parts.append(word['text'])
+        previous = key
+    return ''.join(parts)
+
+def _run_page_ocr(image, lang, config=''):
+    """Ein einzelner Tesseract-Lauf, der Text und Wortboxen gemeinsam liefert."""
+    ocr_data = engine.image_to_data(image, lang=lang, config=config)
+    words = _words_from_ocr_data(ocr_data)
+    return words, _text_from_words(words)
+
+# Anteil dunkler Pixel, unter dem eine Seite ohne Zeilenprüfung als leer gilt
+BLANK_MIN_INK = float(os.getenv('OCR_BLANK_MIN_INK', '0.0002'))
+
+# Breite, auf die eine Seite für die Leerseiten-Erkennung verkleinert wird
+_BLANK_ANALYSIS_WIDTH = 500
+
+def blank_detection_enabled():
+    """Leere Seiten werden übersprungen, solange `OCR_SKIP_BLANK_PAGES` nicht auf 0/false gesetzt ist."""
+    return os.getenv('OCR_SKIP_BLANK_PAGES', '1').lower() not in ('0', 'false', 'no')
+
+def _ink_mask(image):
+    """Verkleinerte Maske der Seite: 255 für Tinte, 0 für Hintergrund.
+
+    Der Hintergrund ist der Median der Helligkeit, als Tinte zählt, was sich deutlich davon
+    abhebt. Dunkle Seiten mit heller Schrift werden vorher invertiert.
+    """
+    gray = image.convert('L')
+    factor = gray.size[0] // _BLANK_ANALYSIS_WIDTH
+    if factor > 1:
+        gray = gray.reduce(factor)
+    histogram = gray.histogram()
+    half, seen, background = gray.size[0] * gray.size[1] / 2, 0, 255
+    for value, count in enumerate(histogram):
+        seen += count
+        if seen >= half:
+            background = value
+            break
+    if background < 128:
+        gray = gray.point(lambda v: 255 - v)
+        background = 255 - background
+    threshold = background - 64
+    return gray.point(lambda v: 255 if v < threshold else 0)
+
+def is_blank_page(image):
+    """Erkennt leere oder nahezu leere Seiten (Leerseiten, Trennblätter) ohne OCR.
+
+    Eine Seite gilt als leer, wenn kaum Tinte vorhanden ist oder das Zeilenprofil (Anteil Tinte
+    pro Pixelzeile) keine zusammenhängende Textzeile enthält, sondern nur vereinzelte Punkte
+    wie Staub oder Lochungen.
+    """
+    mask = _ink_mask(image)
+    width, height = mask.size
+    ink = mask.histogram()[255]
+    if ink < width * height * BLANK_MIN_INK:
+        return True
+
+    # Zeilenprofil: mittlere Tinte pro Pixelzeile, eine Textzeile belegt mehrere Zeilen am Stück
+    profile = mask.resize((1, height), Image.BOX).tobytes()
+    row_threshold = 255 * 0.01
+    run = longest = 0
+    for value in profile:
+        run = run + 1 if value >= row_threshold else 0
+        longest = max(longest, run)
+    return longest < 2
+
+# Zeilen mit einer mittleren Wortkonfidenz darunter werden gezielt neu erkannt
+MIN_LINE_CONFIDENCE = float(os.getenv('OCR_MIN_LINE_CONFIDENCE', '60'))
+
+# Höchstens so viele Zeilen pro Seite werden neu erkannt (die unsichersten zuerst)
+REOCR_MAX_LINES = int(os.getenv('OCR_REOCR_MAX_LINES', '20'))
+
+# Ist mehr als dieser Anteil der Zeilen unsicher (Foto, Rauschen), lohnt sich keine Nacherkennung
+REOCR_MAX_SHARE = 0.5
+
+_REOCR_PADDING = 8
+
+def _line_confidence(words):
+    confidences = [word['conf'] for word in words if word['conf'] >= 0]
+    return sum(confidences) / len(confidences) if confidences else -1.0
+
+def _group_lines(words):
+    """Gruppiert Wörter nach (Block, Absatz, Zeile) in Lesereihenfolge."""
+    lines = {}
+    for word in words:
+        lines.setdefault((word['block'], word['par'], word['line']), []).append(word)
+    return lines
+
+def _reocr_low_confidence_lines(image, words, lang=None):
+    """Erkennt nur die Zeilen mit niedriger Konfidenz erneut und übernimmt bessere Ergebnisse.
+
+    Die Ausschnitte aller unsicheren Zeilen werden untereinander in ein Hilfsbild kopiert und in
+    einem einzigen Tesseract-Lauf als einzelne Textzeilen erkannt, mit der Sprachauswahl `lang`
+    der Seite (ohne erkannte Sprache mit allen Sprachen). Pro Zeile wird das Ergebnis nur
+    übernommen, wenn seine Konfidenz höher ist. Liefert die (ggf. geänderte) Wortliste und die
+    Anzahl verbesserter Zeilen.
+    """
+    lines = _group_lines(words)
+    low = [key for key, line_words in lines.items() if _line_confidence(line_words) < MIN_LINE_CONFIDENCE]
+    if not low or len(low) > len(lines) * REOCR_MAX_SHARE:
+        return words, 0
+    low = sorted(low, key=lambda key: _line_confidence(lines[key]))[:REOCR_MAX_LINES]
+
+    # Ausschnitte untereinander anordnen
+    crops = []
+    for key in low:
+        line_words = lines[key]
+        left = max(0, min(w['left'] for w in line_words) - _REOCR_PADDING)
+        top = max(0, min(w['top'] for w in line_words) - _REOCR_PADDING)
+        right = min(image.size[0], max(w['left'] + w['width'] for w in line_words) + _REOCR_PADDING)
+        bottom = min(image.size[1], max(w['top'] + w['height'] for w in line_words) + _REOCR_PADDING)
+        crops.append((key, (left, top, right, bottom)))
+    strip_width = max(box[2] - box[0] for _, box in crops) + 2 * _REOCR_PADDING
+    strip_height = sum(box[3] - box[1] + 2 * _REOCR_PADDING for _, box in crops)
+    strip = Image.new('L', (strip_width, strip_height), 255)
+    slots = []
+    y = 0
+    for key, box in crops:
+        strip.paste(image.crop(box).convert('L'), (_REOCR_PADDING, y + _REOCR_PADDING))
+        slot_height = box[3] - box[1] + 2 * _REOCR_PADDING
+        slots.append((key, box, y, y + slot_height))
+        y += slot_height
+
+    new_words, _ = _run_page_ocr(strip, lang or ALL_LANGUAGES, config='--psm 6')
+
+    improved = {}
+    for key, box, slot_top, slot_bottom in slots:
+        candidates = [w for w in new_words if slot_top <= w['top'] + w['height'] / 2 < slot_bottom]
+        if not candidates or _line_confidence(candidates) <= _line_confidence(lines[key]):
+            continue
+        improved[key] = [dict(w, left=box[0] + w['left'] - _REOCR_PADDING,
+                              top=box[1] + w['top'] - slot_top - _REOCR_PADDING,
+                              block=key[0], par=key[1], line=key[2]) for w in candidates]
+    if not improved:
+        return words, 0
+
+    result = []
+    for key, line_words in lines.items():
+        result.extend(improved.get(key, line_words))
+    return result, len(improved)
+
+def ocr_page(image, initial_text="", lang=None):
+    """Führt OCR für eine Seite durch und liefert ein strukturiertes Seitenergebnis.
+
+    Das Ergebnis ist ein Dict mit `text`, `words` (Wortboxen in Bildpixeln inkl. Block-,
+    Absatz- und Zeilennummer sowie Konfidenz), `width`, `height` und `lang`. Es wird sowohl
+    für die Textausgabe als auch für den durchsuchbaren Text-Layer verwendet, sodass jede
+    Seite nur einmal durch Tesseract läuft. Leere Seiten werden ohne OCR übersprungen
+    (`blank` im Ergebnis), die übrigen vor der OCR vorverarbeitet (siehe
+    `utils.preprocess_image`, die Wortboxen beziehen sich trotzdem auf das Originalbild) und
+    unsichere Zeilen gezielt nacherkannt (siehe `_reocr_low_confidence_lines`).
+
+    `lang` ist die für das Dokument gewählte Sprachauswahl (siehe `document_language`). Ohne
+    `lang` wird sie aus `initial_text` erkannt, sonst werden alle Sprachen verwendet.
+    """
+    if lang is None:
+        # Wenn bereits Text vorhanden ist, verwende ihn für Spracherkennung
+        if initial_text:
+            lang = detect_language_from_text(initial_text)
+            logger.debug(f"Sprache erkannt: {lang}")
+        else:
+            lang = ALL_LANGUAGES
+
+    if blank_detection_enabled() and is_blank_page(image):
+        logger.debug("Leere Seite erkannt, OCR übersprungen")
+        page_result = _empty_page_result(image, lang)
+        page_result['blank'] = True
+        return page_result
+
+    processed, transform = preprocess_image(image)
+    if transform['timings']:
+        steps = ', '.join(f"{step} {ms:.0f} ms" for step, ms in transform['timings'].items())
+        logger.debug(f"Vorverarbeitung {image.size[0]}x{image.size[1]} -> {processed.size[0]}x{processed.size[1]}: {steps}")
+
+    words, text = _run_page_ocr(processed, lang)
+
+    # Statt die ganze Seite mit allen Sprachen zu wiederholen nur unsichere Zeilen nacherkennen
+    words, improved = _reocr_low_confidence_lines(processed, words, lang)
+    if improved:
+        logger.debug(f"{improved} unsichere Zeilen nacherkannt")
+        text = _text_from_words(words)
+    words = map_words_to_original(words, transform)
+
+    return {
+        'text': text.strip(),
+        'words': words,
+        'width': image.size[0],
+        'height': image.size[1],
+        'lang': lang,
     }
-    
-    # Finde die Sprache mit den meisten Indikatoren
-    detected_lang = max(languages, key=languages.get)
-    
-    # Wenn die Erkennung zu unsicher ist, verwende Mehrsprachen-Modus
-    if languages[detected_lang] < 3:
-        return 'deu+eng+fra+ita'  # Alle verfügbaren Sprachen
-    
-    # Kombiniere die zwei häufigsten Sprachen
-    sorted_langs = sorted(languages.items(), key=lambda x: x[1], reverse=True)
-    if len(sorted_langs) >= 2 and sorted_langs[1][1] > 0:
-        return f"{sorted_langs[0][0]}+{sorted_langs[1][0]}"
-    
-    return detected_lang
 
-def create_pdf_with_text(original_pdf_path, extracted_texts, output_path, images_cache=None):
+def _default_ocr_workers():
+    """Anzahl paralleler OCR-Läufe pro Gunicorn-Worker.
+
+    `OCR_WORKERS` überschreibt den Wert. Sonst werden die CPU-Kerne auf die Gunicorn-Worker
+    (`WEB_CONCURRENCY`, siehe gunicorn_config.py) aufgeteilt, damit die Maschine nicht
+    überbucht wird.
+    """
+    configured = os.getenv('OCR_WORKERS')
+    if configured:
+        return max(1, int(configured))
+    web_workers = max(1, int(os.getenv('WEB_CONCURRENCY', '1') or 1))
+    return max(1, (os.cpu_count() or 1) // web_workers)
+
+_ocr_executor = None
+_ocr_executor_pid = None
+_ocr_executor_lock = threading.Lock()
+
+def _get_ocr_executor():
+    """Liefert den Thread-Pool für Seiten-OCR (einer pro Prozess, nach fork neu erstellt).
+
+    Tesseract läuft als eigener Prozess, die Threads warten nur auf dessen Ergebnis. Damit
+    rechnen bis zu `OCR_WORKERS` Tesseract-Prozesse gleichzeitig.
+    """
+    global _ocr_executor, _ocr_executor_pid
+    with _ocr_executor_lock:
+        if _ocr_executor is None or _ocr_executor_pid != os.getpid():
+            workers = _default_ocr_workers()
+            if workers > 1:
+                # Jeder Tesseract-Prozess soll nur einen Kern belegen, parallelisiert wird über Seiten
+                os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+            _ocr_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ocr')
+            _ocr_executor_pid = os.getpid()
+            logger.info(f"OCR-Pool gestartet mit {workers} parallelen Seiten")
+        return _ocr_executor
+
+def _empty_page_result(image, lang=None):
+    """Seitenergebnis für Seiten ohne (verwertbares) OCR-Ergebnis."""
+    return {'text': '', 'words': [], 'width': image.size[0], 'height': image.size[1], 'lang': lang}
+
+def _ocr_page_safe(index, image, initial_text="", lang=None):
+    """Wie `ocr_page`, liefert bei Fehlern aber ein leeres Seitenergebnis statt einer Exception."""
+    dpi = image.info.get('dpi')
+    try:
+        with metrics.span('ocr', page=index + 1, dpi=round(dpi[0]) if dpi else None, lang=lang,
+                          size=f'{image.size[0]}x{image.size[1]}'):
+            page_result = ocr_page(image, initial_text, lang=lang)
+        metrics.inc('pdf2ocr_pages_total', source='blank' if page_result.get('blank') else 'ocr')
+        return page_result
+    except Exception as e:
+        logger.warning(f"Fehler bei OCR von Seite {index+1}: {e}")
+        metrics.inc('pdf2ocr_pages_total', source='error')
+        page_result = _empty_page_result(image)
+        page_result['error'] = str(e)
+        return page_result
+
+def _page_cache_params(initial_text, lang=None):
+    """OCR-Parameter, die zusammen mit den Pixeldaten den Schlüssel im Seiten-Cache bilden."""
+    if lang is None:
+        lang = detect_language_from_text(initial_text) if initial_text else ALL_LANGUAGES
+    return {'lang': lang, 'preprocess': _preprocess_params()}
+
+def _dpi_params():
+    """Wirksame Rasterauflösung, gehört zum Cache-Schlüssel des Ergebnisses."""
+    dpi = render_dpi()
+    if dpi == 'auto':
+        return {'probe': PROBE_DPI, 'min': MIN_DPI, 'max': MAX_DPI, 'x_height': RENDER_X_HEIGHT, 'fallback': PDF_DPI}
+    return dpi
+
+def _preprocess_params():
+    """Wirksame Vorverarbeitung, gehört zu den Cache-Schlüsseln."""
+    return {'steps': list(preprocess_steps()), 'x_height': TARGET_X_HEIGHT, 'binarize': BINARIZE}
+
+def document_language(initial_text="", image=None):
+    """Wählt die Sprachauswahl für ein ganzes Dokument.
+
+    Vorhandener Text (z. B. eingebetteter PDF-Text) wird direkt ausgewertet, sonst entscheidet
+    ein Probe-Lauf auf dem Bild der ersten Seite (siehe `language.probe_language`).
+    """
+    if initial_text and initial_text.strip():
+        lang = detect_language_from_text(initial_text)
+        logger.info(f"Sprache erkannt: {lang}")
+        return lang
+    if image is not None:
+        return probe_language(image)
+    return ALL_LANGUAGES
+
+def ocr_pages(images, initial_text="", lang=None):
+    """Führt OCR für mehrere Seiten parallel aus und liefert die Ergebnisse in Seitenreihenfolge.
+
+    Mit `lang` laufen alle Seiten mit dieser Sprachauswahl, sonst wird `initial_text` nur für die
+    Spracherkennung der ersten Seite verwendet. Seiten, deren Raster bereits im Seiten-Cache
+    liegt, werden nicht erneut durch Tesseract geschickt.
+    """
+    images = list(images)
+    initial_texts = [initial_text if i == 0 else "" for i in range(len(images))]
+    results = [None] * len(images)
+
+    keys = [None] * len(images)
+    if cache_enabled():
+        try:
+            keys = [page_cache_key(image, _page_cache_params(t, lang)) for image, t in zip(images, initial_texts)]
+            cached = get_cached_pages(keys)
+            for i, key in enumerate(keys):
+                if key in cached:
+                    results[i] = cached[key]
+            if cached:
+                logger.debug(f"Seiten-Cache: {len(cached)} von {len(images)} Seiten bereits erkannt")
+                metrics.inc('pdf2ocr_pages_total', len(cached), source='page_cache')
+        except Exception as e:
+            logger.warning(f"Seiten-Cache nicht verfügbar: {e}")
+            keys = [None] * len(images)
+
+    missing = [i for i, result in enumerate(results) if result is None]
+    if len(missing) <= 1 or _default_ocr_workers() <= 1:
+        recognized = [_ocr_page_safe(i, images[i], initial_texts[i], lang) for i in missing]
+    else:
+        executor = _get_ocr_executor()
+        recognized = list(executor.map(_ocr_page_safe, missing, [images[i] for i in missing],
+                                       [initial_texts[i] for i in missing], [lang] * len(missing)))
+
+    new_entries = {}
+    for i, page_result in zip(missing, recognized):
+        results[i] = page_result
+        if keys[i] and 'error' not in page_result:
+            new_entries[keys[i]] = page_result
+    if new_entries:
+        try:
+            store_pages(new_entries)
+        except Exception as e:
+            logger.warning(f"Seiten-Cache: Ergebnisse konnten nicht gespeichert werden: {e}")
+
+    return results
+
+def _page_count(pdf_path):
+    """Ermittelt die Seitenzahl einer PDF ohne sie zu rastern."""
+    return int(pdfinfo_from_path(pdf_path)['Pages'])
+
+def _render_window_size():
+    """Anzahl Seiten, die gleichzeitig gerastert im Speicher gehalten werden (`OCR_RENDER_WINDOW`)."""
+    configured = os.getenv('OCR_RENDER_WINDOW')
+    if configured:
+        return max(1, int(configured))
+    # Ein Fenster sollte den OCR-Pool auslasten, aber nicht mehr Seiten als nötig halten
+    return max(2, _default_ocr_workers())
+
+def _consecutive_runs(indices, key=None):
+    """Zerlegt sortierte Seitenindizes in zusammenhängende Bereiche `(erster, letzter)`.
+
+    Mit `key` (Dict Seitenindex -> Wert) beginnt zusätzlich ein neuer Bereich, sobald sich der
+    Wert ändert.
+    """
+    runs = []
+    for index in indices:
+        if runs and runs[-1][1] == index - 1 and (key is None or key[index] == key[runs[-1][1]]):
+            runs[-1][1] = index
+        else:
+            runs.append([index, index])
+    return [tuple(run) for run in runs]
+
+def choose_page_dpi(probe_image, probe_dpi=PROBE_DPI):
+    """Bestimmt aus einer niedrig aufgelösten Rasterung die Auflösung, die die Seite für die OCR braucht.
+
+    Die x-Höhe der kleineren Schrift der Seite soll nach dem Rastern etwa `OCR_RENDER_X_HEIGHT`
+    Pixel betragen: große Schrift wird gröber, Kleingedrucktes feiner gerastert, begrenzt durch
+    `OCR_MIN_DPI`/`OCR_MAX_DPI` und auf 25 DPI gerundet. Leere Seiten kommen mit der
+    Mindestauflösung aus, Seiten ohne erkennbare Textzeilen (z. B. Fotos) erhalten `PDF_DPI`.
+    """
+    if is_blank_page(probe_image):
+        return MIN_DPI
+    x_height = estimate_x_height(probe_image, percentile=0.2)
+    if not x_height:
+        return PDF_DPI
+    dpi = round(probe_dpi * RENDER_X_HEIGHT / x_height / 25) * 25
+    return max(MIN_DPI, min(MAX_DPI, dpi))
+
+def _probe_page_dpis(pdf_path, indices):
+    """Rastert die Seiten eines Fensters mit `OCR_PROBE_DPI` in Graustufen und wählt die DPI pro Seite."""
+    dpis = {}
+    for first, last in _consecutive_runs(indices):
+        with metrics.span('rasterize', pages=f'{first+1}-{last+1}', dpi=PROBE_DPI, probe=True):
+            probes = convert_from_path(pdf_path, dpi=PROBE_DPI, first_page=first + 1, last_page=last + 1,
+                                       grayscale=True)
+        for index, probe in zip(range(first, last + 1), probes):
+            dpis[index] = choose_page_dpi(probe)
+        del probes
+    return dpis
+
+def iter_pdf_page_windows(pdf_path, page_count=None, dpi=None, window=None, pages=None, **convert_kwargs):
+    """Rastert eine PDF fensterweise über `first_page`/`last_page` statt das ganze Dokument.
+
+    Liefert Tupel `([seitenindizes], [Bilder])`. Mit `pages` (0-basierte Indizes) werden nur diese
+    Seiten gerastert. Sobald der Aufrufer ein Fenster verarbeitet hat und die Referenzen freigibt,
+    wird der Speicher der Bilder wieder frei, der Speicherbedarf bleibt also unabhängig von der
+    Seitenzahl durch die Fenstergröße begrenzt.
+
+    `dpi` ist eine feste Auflösung oder `'auto'` (Standard: `OCR_DPI`): dann wird jedes Fenster
+    zuerst grob gerastert und jede Seite mit der Auflösung aus `choose_page_dpi` gerastert. Die
+    gewählte Auflösung steht in `image.info['dpi']`.
+    """
+    if pages is None:
+        if page_count is None:
+            page_count = _page_count(pdf_path)
+        pages = range(page_count)
+    pages = sorted(pages)
+    window = window or _render_window_size()
+    dpi = dpi or render_dpi()
+    for start in range(0, len(pages), window):
+        indices = pages[start:start + window]
+        page_dpis = _probe_page_dpis(pdf_path, indices) if dpi == 'auto' else dict.fromkeys(indices, dpi)
+        images = []
+        for first, last in _consecutive_runs(indices, page_dpis):
+            run_dpi = page_dpis[first]
+            with metrics.span('rasterize', pages=f'{first+1}-{last+1}', dpi=run_dpi):
+                rendered = convert_from_path(pdf_path, dpi=run_dpi, first_page=first + 1, last_page=last + 1,
+                                             **convert_kwargs)
+            for image in rendered:
+                image.info['dpi'] = (run_dpi, run_dpi)
+            images.extend(rendered)
+        yield indices, images
+        del images
+
+# Höchste wählbare Seitennummer; begrenzt die Indexliste, die aus einer Auswahl wie `1-2000000000` entstünde
+MAX_PAGE_NUMBER = 100000
+
+def parse_page_ranges(spec):
+    """Wandelt eine Seitenauswahl wie `1-3,7` (1-basiert) in sortierte 0-basierte Seitenindizes um.
+
+    Wirft ValueError bei ungültiger Angabe oder Seitennummern über `MAX_PAGE_NUMBER`.
+    """
+    pages = set()
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, separator, last = part.partition('-')
+        try:
+            first = int(first)
+            last = int(last) if separator else first
+        except ValueError:
+            raise ValueError(f"Invalid page range '{part}'")
+        if first < 1 or last < first:
+            raise ValueError(f"Invalid page range '{part}'")
+        if last > MAX_PAGE_NUMBER:
+            raise ValueError(f"Invalid page range '{part}', pages above {MAX_PAGE_NUMBER} are not supported")
+        pages.update(range(first - 1, last))
+    if not pages:
+        raise ValueError('Empty page selection')
+    return sorted(pages)
+
+def parse_regions(spec):
+    """Wandelt Bereichsangaben in eine Liste `{'page': index oder None, 'box': [x0, y0, x1, y1]}` um.
+
+    Ein Bereich ist `links,oben,rechts,unten` als Anteil (0-1) der Seitenbreite bzw. -höhe, mehrere
+    Bereiche werden mit `;` getrennt. Ein vorangestelltes `N:` beschränkt den Bereich auf Seite N
+    (1-basiert), sonst gilt er für alle Seiten. Wirft ValueError bei ungültiger Angabe.
+    """
+    regions = []
+    for part in spec.split(';'):
+        part = part.strip()
+        if not part:
+            continue
+        page = None
+        if ':' in part:
+            page_spec, part = part.split(':', 1)
+            try:
+                page = int(page_spec) - 1
+            except ValueError:
+                raise ValueError(f"Invalid region page '{page_spec}'")
+            if page < 0:
+                raise ValueError(f"Invalid region page '{page_spec}'")
+        try:
+            box = [float(value) for value in part.split(',')]
+        except ValueError:
+            raise ValueError(f"Invalid region '{part}'")
+        if len(box) != 4 or not (0 <= box[0] < box[2] <= 1 and 0 <= box[1] < box[3] <= 1):
+            raise ValueError(f"Invalid region '{part}', expected left,top,right,bottom between 0 and 1")
+        regions.append({'page': page, 'box': box})
+    if not regions:
+        raise ValueError('Empty region selection')
+    return regions
+
+def regions_for_page(regions, index):
+    """Normierte Bereiche, die für die Seite `index` gelten."""
+    return [region['box'] for region in regions if region['page'] is None or region['page'] == index]
+
+def _pages_with_regions(pages, regions):
+    """Seiten aus `pages`, für die ein Bereich gilt; die übrigen müssen nicht gerastert werden."""
+    if not regions:
+        return pages
+    return [index for index in pages if regions_for_page(regions, index)]
+
+def _region_pixels(image, box):
+    """Rechnet einen normierten Bereich in eine Pixelbox des Bildes um (mindestens 1 Pixel groß)."""
+    width, height = image.size
+    left, top = int(box[0] * width), int(box[1] * height)
+    right, bottom = max(left + 1, round(box[2] * width)), max(top + 1, round(box[3] * height))
+    return left, top, min(right, width), min(bottom, height)
+
+def _merge_region_results(image, pixel_boxes, region_results, lang):
+    """Setzt die OCR-Ergebnisse der Ausschnitte einer Seite zu einem Seitenergebnis zusammen.
+
+    Wortboxen werden in Koordinaten der ganzen Seite verschoben, jeder Bereich bekommt eigene
+    Blocknummern, damit Absätze verschiedener Bereiche nicht verschmelzen.
+    """
+    words = []
+    texts = []
+    errors = []
+    for n, (box, region_result) in enumerate(zip(pixel_boxes, region_results), start=1):
+        words.extend(dict(word, left=word['left'] + box[0], top=word['top'] + box[1], block=n * 1000 + word['block'])
+                     for word in region_result['words'])
+        if region_result['text']:
+            texts.append(region_result['text'])
+        if 'error' in region_result:
+            errors.append(region_result['error'])
+    page_result = {
+        'text': '\n\n'.join(texts),
+        'words': words,
+        'width': image.size[0],
+        'height': image.size[1],
+        'lang': lang,
+        'regions': [list(box) for box in pixel_boxes],
+    }
+    if errors:
+        page_result['error'] = '; '.join(errors)
+    return page_result
+
+def _iter_ocr_windows(windows, initial_text="", lang=None, details=None, regions=None):
+    """Erkennt fensterweise gelieferte Seitenbilder und liefert `(seitenindex, Bild, Seitenergebnis)`.
+
+    `windows` liefert `(seitenindizes, bilder)`. Die Seiten eines Fensters werden parallel per
+    OCR verarbeitet (siehe `ocr_pages`), die Ergebnisse kommen in Seitenreihenfolge. Ohne `lang`
+    wird die Sprachauswahl einmal mit dem ersten Fenster bestimmt (siehe `document_language`)
+    und in `details['language']` vermerkt. Seiten, deren OCR fehlschlug, werden (1-basiert) in
+    `details['page_errors']` gesammelt.
+
+    Mit `regions` (siehe `parse_regions`) werden statt ganzer Seiten nur deren Ausschnitte
+    erkannt, alle Ausschnitte eines Fensters parallel. Die Wortboxen beziehen sich trotzdem auf
+    die ganze Seite, Seiten ohne passenden Bereich bleiben leer.
+    """
+    for indices, images in windows:
+        targets = images
+        if regions:
+            page_boxes = [[_region_pixels(image, box) for box in regions_for_page(regions, index)]
+                          for index, image in zip(indices, images)]
+            targets = [image.crop(box) for image, boxes in zip(images, page_boxes) for box in boxes]
+        if lang is None:
+            # Probe auf der ersten Seite mit Inhalt, ein leeres Deckblatt sagt nichts über die Sprache
+            probe_image = next((image for image in targets if not is_blank_page(image)), None)
+            lang = document_language(initial_text, probe_image)
+            if details is not None:
+                details['language'] = lang
+        results = ocr_pages(targets, lang=lang)
+        if regions:
+            region_results = iter(results)
+            results = [_merge_region_results(image, boxes, [next(region_results) for _ in boxes], lang)
+                       for image, boxes in zip(images, page_boxes)]
+        for index, image, page_result in zip(indices, images, results):
+            if 'error' in page_result and details is not None:
+                details.setdefault('page_errors', []).append(index + 1)
+            if page_result['text']:
+                logger.debug(f"Seite {index+1}: {len(page_result['text'])} Zeichen durch OCR extrahiert")
+            else:
+                logger.debug(f"Seite {index+1}: Kein Text durch OCR gefunden")
+            yield index, image, page_result
+        del results, targets
+
+def iter_ocr_pages(pdf_path, page_count=None, initial_text="", dpi=None, pages=None, lang=None, details=None,
+                   regions=None):
+    """Rastert und erkennt eine PDF fensterweise und liefert `(seitenindex, Bild, Seitenergebnis)`.
+
+    Mit `pages` werden nur diese Seiten gerastert und erkannt, mit `regions` nur deren Ausschnitte
+    (siehe `_iter_ocr_windows`).
+    """
+    windows = iter_pdf_page_windows(pdf_path, page_count, dpi=dpi, pages=pages)
+    yield from _iter_ocr_windows(windows, initial_text, lang=lang, details=details, regions=regions)
+
+def _load_frame(image, index):
+    """Dekodiert ein einzelnes Frame eines (mehrseitigen) Bildes als eigenständiges Bild."""
+    image.seek(index)
+    frame = image.copy()
+    if frame.mode not in ('1', 'L', 'RGB'):
+        # Palettenbilder (GIF), Transparenz und CMYK für Tesseract und die PDF-Ausgabe vereinheitlichen
+        frame = frame.convert('RGB')
+    return frame
+
+def _selected_frames(image, pages=None, regions=None):
+    """Indizes der zu verarbeitenden Frames (alle oder die vorhandenen aus `pages`, nur mit Bereich)."""
+    frame_count = getattr(image, 'n_frames', 1)
+    if pages is None:
+        return _pages_with_regions(list(range(frame_count)), regions)
+    return _pages_with_regions([index for index in pages if index < frame_count], regions)
+
+def iter_image_frame_windows(image, window=None, pages=None, regions=None):
+    """Liefert die Frames eines mehrseitigen Bildes (TIFF, GIF) fensterweise als `(frame_indizes, bilder)`.
+
+    Frames werden erst dekodiert, wenn ihr Fenster an der Reihe ist; es liegen nie mehr Frames
+    im Speicher als ein Fenster umfasst (`OCR_RENDER_WINDOW`). Einzelbilder liefern ein Fenster
+    mit einem Frame. Mit `pages` (0-basiert) werden nur diese Frames dekodiert, mit `regions` nur
+    Frames, für die ein Bereich gilt.
+    """
+    frames_to_load = _selected_frames(image, pages, regions)
+    window = window or _render_window_size()
+    for start in range(0, len(frames_to_load), window):
+        indices = frames_to_load[start:start + window]
+        frames = [_load_frame(image, i) for i in indices]
+        yield indices, frames
+        del frames
+
+def iter_ocr_frames(image, initial_text="", lang=None, details=None, pages=None, regions=None):
+    """Erkennt die Frames eines Bildes fensterweise und liefert `(frameindex, Bild, Seitenergebnis)`."""
+    windows = iter_image_frame_windows(image, pages=pages, regions=regions)
+    yield from _iter_ocr_windows(windows, initial_text, lang=lang, details=details, regions=regions)
+
+def _display_to_user_space(u, v, box_width, box_height, rotation):
+    """Rechnet einen Punkt der angezeigten (gedrehten) Seite in den ungedrehten PDF-Nutzerraum um.
+
+    `u`/`v` sind Koordinaten relativ zur unteren linken Ecke der angezeigten Seite, `rotation`
+    ist der `/Rotate`-Wert der Seite (Drehung im Uhrzeigersinn).
+    """
+    if rotation == 90:
+        return box_width - v, u
+    if rotation == 180:
+        return box_width - u, box_height - v
+    if rotation == 270:
+        return v, box_height - u
+    return u, v
+
+# Schriftgrößen des Text-Layers werden gerundet, damit aufeinanderfolgende Zeilen den Font-Zustand teilen
+_FONT_SIZE_STEP = 0.5
+
+def _draw_text_layer(c, words, source_width, source_height, box, rotation=0):
+    """Zeichnet unsichtbaren Text an die Wortpositionen eines Seitenbildes.
+
+    `box` ist `(links, unten, rechts, oben)` des Bereichs, den das Bild auf der PDF-Seite abdeckt
+    (z. B. die MediaBox), `rotation` der `/Rotate`-Wert der Seite. Die Wortboxen beziehen sich auf
+    das Bild in Anzeigeorientierung und werden in den Nutzerraum der Seite umgerechnet.
+
+    Die Wörter werden über Block-, Absatz- und Zeilennummer der OCR zu Zeilen gruppiert, jede
+    Zeile wird als ein Textobjekt im Render-Modus 3 (unsichtbar) geschrieben: ein Textursprung
+    pro Zeile, jedes Wort per horizontaler Skalierung (`Tz`) auf die Breite seiner Box gestreckt,
+    dazwischen ein Leerzeichen auf die Breite der Lücke. Schriftgröße und Render-Modus werden nur
+    bei einer Änderung gesetzt. Gibt die Anzahl gezeichneter Wörter zurück.
+    """
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    left, bottom, right, top = box
+    box_width, box_height = right - left, top - bottom
+    rotation = rotation % 360
+    display_width, display_height = (box_height, box_width) if rotation in (90, 270) else (box_width, box_height)
+
+    # Skalierungsfaktor berechnen (Bild zu PDF)
+    scale_x = display_width / source_width
+    scale_y = display_height / source_height
+    cos_r, sin_r = {0: (1, 0), 90: (0, 1), 180: (-1, 0), 270: (0, -1)}.get(rotation, (1, 0))
+
+    words_added = 0
+    font_size = None
+    # Render-Modus und Font gelten über die Textobjekte hinweg, q/Q begrenzt sie auf den Text-Layer
+    c.saveState()
+    for line_words in _group_lines(words).values():
+        line_words = sorted((w for w in line_words if w['text'].strip()), key=lambda w: w['left'])
+        if not line_words:
+            continue
+        # Grundlinie links unten in Anzeige-Koordinaten (PDF-Y ist von unten)
+        line_bottom = max(w['top'] + w['height'] for w in line_words)
+        line_height = max(w['height'] for w in line_words)
+        u = line_words[0]['left'] * scale_x
+        v = display_height - line_bottom * scale_y
+        x, y = _display_to_user_space(u, v, box_width, box_height, rotation)
+
+        text = c.beginText(left + x, bottom + y)
+        if rotation:
+            text.setTextTransform(cos_r, sin_r, -sin_r, cos_r, left + x, bottom + y)
+        if font_size is None:
+            text.setTextRenderMode(3)
+        # Schriftgröße aus der Zeilenhöhe (80%, wie bisher pro Wort)
+        size = max(1.0, round(line_height * scale_y * 0.8 / _FONT_SIZE_STEP) * _FONT_SIZE_STEP)
+        if size != font_size:
+            text.setFont('Helvetica', size)
+            font_size = size
+        space_width = stringWidth(' ', 'Helvetica', size)
+
+        for n, word in enumerate(line_words):
+            natural = stringWidth(word['text'], 'Helvetica', size)
+            if natural > 0:
+                text.setHorizScale(100 * word['width'] * scale_x / natural)
+            text.textOut(word['text'])
+            words_added += 1
+            if n + 1 < len(line_words):
+                gap = (line_words[n + 1]['left'] - word['left'] - word['width']) * scale_x
+                text.setHorizScale(100 * max(gap, 0.01) / space_width)
+                text.textOut(' ')
+        c.drawText(text)
+    c.restoreState()
+    return words_added
+
+def _draw_page_with_text(c, image, page_entry, i, compression=None):
+    """Zeichnet eine Seite (Bild als Hintergrund und unsichtbarer Text-Layer) auf den Canvas.
+
+    Das Seitenbild wird je nach Inhalt kodiert (siehe `compression.encode_page_image`,
+    `compression` ist das Preset). Gibt das kodierte Bild zurück (None, falls es fehlte).
+    """
+    compression = compression or default_compression()
+    from reportlab.lib.pagesizes import A4
+
+    # Text für diese Seite hinzufügen (falls vorhanden). Einträge sind entweder
+    # Seitenergebnisse aus `ocr_page` (mit Wortboxen) oder reiner Text.
+    page_text = ""
+    page_result = None
+    if page_entry:
+        if isinstance(page_entry, dict):
+            page_result = page_entry
+            page_text = page_result.get('text') or ""
+        else:
+            page_text = page_entry
+        logger.debug(f"Integriere Text für Seite {i+1}: {len(page_text)} Zeichen")
+
+    # Bild als Hintergrund hinzufügen (Schwarz-Weiß, Graustufen oder Farbe passend kodiert,
+    # die kodierten Daten werden unverändert eingebettet)
+    encoded = None
+    try:
+        dpi = max(image.size[0] / (A4[0] / 72), image.size[1] / (A4[1] / 72))
+        with metrics.span('compress', page=i + 1, preset=compression) as tags:
+            encoded = encode_page_image(image, compression, dpi)
+            tags.update(encoding=encoded['encoding'], bytes=len(encoded['data']))
+        draw_encoded_image(c, encoded, 0, 0, A4[0], A4[1])
+        metrics.observe('pdf2ocr_page_image_bytes', len(encoded['data']), buckets=metrics.BYTE_BUCKETS,
+                        encoding=encoded['encoding'])
+        logger.debug(f"Bild erfolgreich zur PDF hinzugefügt ({encoded['encoding']}, {len(encoded['data'])} Bytes)")
+
+    except Exception as e:
+        logger.exception(f"FEHLER beim Hinzufügen des Bildes zu Seite {i+1}: {e}")
+
+    # Text als durchsuchbaren Layer hinzufügen mit OCR-Positionsdaten
+    if page_text.strip():
+        try:
+            if page_result is not None:
+                # Wortboxen stammen aus dem OCR-Lauf der Extraktion
+                words = page_result.get('words') or []
+                source_width = page_result.get('width') or image.size[0]
+                source_height = page_result.get('height') or image.size[1]
+                logger.debug(f"Verwende {len(words)} Wortboxen aus der Extraktion für Seite {i+1}")
+            else:
+                # Nur reiner Text übergeben: Positionsdaten per OCR ermitteln
+                logger.debug(f"Extrahiere Positionsdaten für Seite {i+1}...")
+                start_time = time.time()
+                ocr_data = engine.image_to_data(image, lang=ALL_LANGUAGES)
+                logger.debug(f"OCR für Seite {i+1} abgeschlossen in {time.time() - start_time:.2f}s")
+                words = _words_from_ocr_data(ocr_data)
+                source_width, source_height = image.size
+
+            logger.debug(f"Bild: {source_width}x{source_height}, PDF: {A4[0]}x{A4[1]}")
+            words_added = _draw_text_layer(c, words, source_width, source_height, (0, 0, A4[0], A4[1]))
+
+            logger.debug(f"Text für Seite {i+1}: {words_added} Wörter an exakten Positionen hinzugefügt")
+
+        except Exception as e:
+            logger.exception(f"Fehler beim Hinzufügen von Text mit Positionsdaten zu Seite {i+1}: {e}")
+
+            # Fallback: Text ohne Positionsdaten hinzufügen
+            logger.debug(f"Fallback: Füge Text ohne Positionsdaten hinzu...")
+            try:
+                text = c.beginText(0, A4[1] - 10)
+                text.setTextRenderMode(3)
+                text.setFont("Helvetica", 1, leading=2)
+                for line in page_text.split('\n'):
+                    line = line.strip()
+                    if line:
+                        text.textLine(line)
+                c.drawText(text)
+                logger.debug(f"Fallback erfolgreich für Seite {i+1}")
+            except Exception as e2:
+                logger.error(f"Auch Fallback fehlgeschlagen: {e2}")
+    return encoded
+
+def _write_searchable_pdf(pages, output_path, compression=None):
+    """Schreibt Seiten fortlaufend in eine neue durchsuchbare PDF.
+
+    `pages` liefert Tupel `(Bild, Seitenergebnis oder Text)` und darf ein Generator sein: jede
+    Seite wird direkt nach dem Zeichnen freigegeben, es liegen nie alle Seitenbilder gleichzeitig
+    im Speicher. `compression` ist das Preset für die Seitenbilder (siehe `default_compression`).
+    """
+    compression = compression or default_compression()
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import A4
+
+    # Erstelle eine neue PDF mit ReportLab
+    logger.debug("Erstelle neue PDF mit ReportLab...")
+    try:
+        c = canvas.Canvas(output_path, pagesize=A4)
+    except Exception as e:
+        logger.error(f"FEHLER beim Erstellen des Canvas: {e}")
+        return False
+
+    # Für jede Seite
+    page_total = 0
+    image_bytes = {}
+    for i, (image, page_entry) in enumerate(pages):
+        logger.debug(f"Verarbeite Seite {i+1} für Textintegration...")
+
+        # Neue Seite starten
+        if i > 0:
+            c.showPage()
+
+        with metrics.span('draw', page=i + 1):
+            encoded = _draw_page_with_text(c, image, page_entry, i, compression)
+        if encoded:
+            count, size = image_bytes.get(encoded['encoding'], (0, 0))
+            image_bytes[encoded['encoding']] = (count + 1, size + len(encoded['data']))
+        page_total += 1
+        del image
+
+    if page_total == 0:
+        logger.error("FEHLER: Keine Seiten für die PDF vorhanden")
+        return False
+
+    # PDF speichern
+    try:
+        with metrics.span('save', pages=page_total, output='rebuild'):
+            c.save()
+        logger.debug(f"PDF erfolgreich gespeichert: {output_path}")
+
+        # Prüfe ob PDF erstellt wurde
+        if not os.path.exists(output_path):
+            logger.error(f"FEHLER: PDF wurde nicht erstellt: {output_path}")
+            return False
+
+        # Prüfe PDF-Größe
+        file_size = os.path.getsize(output_path)
+        logger.debug(f"PDF-Größe: {file_size} Bytes")
+
+        if file_size == 0:
+            logger.error("FEHLER: PDF ist leer (0 Bytes)")
+            return False
+
+        if image_bytes:
+            summary = ', '.join(f"{encoding} {count}x {size / 1024:.0f} KiB"
+                                for encoding, (count, size) in sorted(image_bytes.items()))
+            logger.info(f"Seitenbilder ({compression}): {summary}, PDF {file_size / 1024:.0f} KiB")
+        logger.info(f"PDF mit integriertem Text erfolgreich erstellt: {output_path}")
+        return True
+
+    except Exception as e:
+        logger.exception(f"FEHLER beim Speichern der PDF: {e}")
+        return False
+
+
+OUTPUT_MODES = ('rebuild', 'overlay')
+
+def default_output_mode():
+    """Ausgabemodus für OCR-Seiten aus `OCR_OUTPUT_MODE` (Standard: `rebuild`).
+
+    - `rebuild`: Seite wird als Bild auf A4 neu aufgebaut, darüber der unsichtbare Text.
+    - `overlay`: Nur der unsichtbare Text-Layer wird auf die Originalseite gelegt, Vektorinhalte,
+      Auflösung und Seitengröße bleiben erhalten.
+    """
+    mode = os.getenv('OCR_OUTPUT_MODE', 'rebuild').lower()
+    return mode if mode in OUTPUT_MODES else 'rebuild'
+
+def _write_text_layer_pdf(pages, original_pdf_path, output_path):
+    """Schreibt für jede OCR-Seite eine Seite, die nur den unsichtbaren Text-Layer enthält.
+
+    `pages` liefert `(seitenindex, Bild, Seitenergebnis)`. Die Wortboxen werden über MediaBox und
+    Drehung der Originalseite in deren Nutzerraum umgerechnet, sodass die Text-Layer-Seite
+    deckungsgleich auf die Originalseite gelegt werden kann.
+    """
+    from reportlab.pdfgen import canvas
+
+    reader = PyPDF2.PdfReader(original_pdf_path)
+    c = canvas.Canvas(output_path)
+    page_total = 0
+    for index, image, page_result in pages:
+        page = reader.pages[index]
+        mediabox = page.mediabox
+        c.setPageSize((float(mediabox.right), float(mediabox.top)))
+        # pdftoppm rastert ohne `use_cropbox` die MediaBox, die Wortboxen beziehen sich also auf sie
+        box = (float(mediabox.left), float(mediabox.bottom), float(mediabox.right), float(mediabox.top))
+        words = page_result.get('words') or []
+        with metrics.span('draw', page=index + 1, words=len(words)):
+            words_added = _draw_text_layer(
+                c, words,
+                page_result.get('width') or image.size[0],
+                page_result.get('height') or image.size[1],
+                box, page.rotation,
+            )
+        logger.debug(f"Text-Layer für Seite {index+1}: {words_added} Wörter")
+        c.showPage()
+        page_total += 1
+        del image
+
+    if page_total == 0:
+        logger.error("FEHLER: Keine Seiten für den Text-Layer vorhanden")
+        return False
+    with metrics.span('save', pages=page_total, output='text_layer'):
+        c.save()
+    return True
+
+def _overlay_text_layer(original_pdf_path, text_layer_path, ocr_indices, output_path, pages=None):
+    """Legt die Text-Layer-Seiten auf die OCR-Seiten des Originals, alle anderen Seiten bleiben unverändert.
+
+    Mit `pages` enthält die Ausgabe nur diese Seiten des Originals.
+    """
+    original = PyPDF2.PdfReader(original_pdf_path)
+    text_layer = PyPDF2.PdfReader(text_layer_path)
+    layer_pages = iter(text_layer.pages)
+    ocr_set = set(ocr_indices)
+
+    writer = PyPDF2.PdfWriter()
+    with metrics.span('save', pages=len(ocr_set), output='overlay'):
+        for i in (range(len(original.pages)) if pages is None else pages):
+            page = original.pages[i]
+            if i in ocr_set:
+                page.merge_page(next(layer_pages))
+            writer.add_page(page)
+        with open(output_path, 'wb') as f:
+            writer.write(f)
+    return True
+
+def create_pdf_with_text(original_pdf_path, extracted_texts, output_path, images_cache=None, compression=None):
     """Erstellt eine neue PDF mit dem extrahierten Text als durchsuchbaren Text."""
     try:
-        print(f"Erstelle PDF mit integriertem Text: {output_path}")
-        print(f"Original PDF: {original_pdf_path}")
-        print(f"Extracted texts: {len(extracted_texts)} Seiten")
+        logger.info(f"Erstelle PDF mit integriertem Text: {output_path}")
+        logger.debug(f"Original PDF: {original_pdf_path}")
+        logger.debug(f"Extracted texts: {len(extracted_texts)} Seiten")
         
         # Prüfe ob Original-PDF existiert
         if not os.path.exists(original_pdf_path):
-            print(f"FEHLER: Original PDF existiert nicht: {original_pdf_path}")
+            logger.error(f"FEHLER: Original PDF existiert nicht: {original_pdf_path}")
             return False
 
-        from reportlab.pdfgen import canvas
-        from reportlab.lib.pagesizes import letter, A4
-        from reportlab.lib.colors import Color
-        from reportlab.lib import colors
-        from reportlab.pdfbase import pdfmetrics
-        from reportlab.pdfbase.ttfonts import TTFont
-        import tempfile
-        import pdf2image
-
         # Konvertiere PDF zu Bildern (oder verwende Cache)
         if images_cache:
-            print(f"Verwende gecachte Bilder: {len(images_cache)} Seiten")
+            logger.debug(f"Verwende gecachte Bilder: {len(images_cache)} Seiten")
             images = images_cache
         else:
-            print("Konvertiere PDF zu Bildern...")
+            logger.debug("Konvertiere PDF zu Bildern (fensterweise)...")
             try:
-                # Reduziere DPI für schnellere Verarbeitung (200 statt 300)
-                images = pdf2image.convert_from_path(
-                    original_pdf_path,
-                    dpi=200,
-                    fmt='jpeg',
-                    thread_count=2
-                )
-                print(f"Anzahl Bilder: {len(images)}")
-                
-                if not images:
-                    print("FEHLER: Keine Bilder aus PDF konvertiert")
-                    return False
-                    
+                page_count = _page_count(original_pdf_path)
+                logger.debug(f"Anzahl Seiten: {page_count}")
             except Exception as e:
-                print(f"FEHLER beim Konvertieren der PDF zu Bildern: {e}")
-                import traceback
-                traceback.print_exc()
+                logger.exception(f"FEHLER beim Lesen der PDF-Informationen: {e}")
                 return False
+            images = (
+                image
+                for _, window in iter_pdf_page_windows(original_pdf_path, page_count, fmt='jpeg', thread_count=2)
+                for image in window
+            )
 
-        # Erstelle eine neue PDF mit ReportLab
-        print("Erstelle neue PDF mit ReportLab...")
-        try:
-            c = canvas.Canvas(output_path, pagesize=A4)
-        except Exception as e:
-            print(f"FEHLER beim Erstellen des Canvas: {e}")
-            return False
+        pages = (
+            (image, extracted_texts[i] if i < len(extracted_texts) else None)
+            for i, image in enumerate(images)
+        )
+        return _write_searchable_pdf(pages, output_path, compression)
 
-        # Für jede Seite
-        for i, image in enumerate(images):
-            print(f"Verarbeite Seite {i+1} für Textintegration...")
+    except Exception as e:
+        logger.exception(f"Fehler beim Erstellen der PDF mit Text: {e}")
+        return False
 
-            # Text für diese Seite hinzufügen (falls vorhanden)
-            page_text = ""
-            if i < len(extracted_texts) and extracted_texts[i]:
-                page_text = extracted_texts[i]
-                print(f"Integriere Text für Seite {i+1}: {len(page_text)} Zeichen")
+IMAGE_OUTPUTS = ('text', 'pdf')
 
-            # Neue Seite starten
-            if i > 0:
-                c.showPage()
+def default_image_output():
+    """Ergebnis für Bilddateien aus `OCR_IMAGE_OUTPUT`: `text` (Standard) oder `pdf` (durchsuchbare PDF)."""
+    output = os.getenv('OCR_IMAGE_OUTPUT', 'text').lower()
+    return output if output in IMAGE_OUTPUTS else 'text'
 
-            # Bild als Hintergrund hinzufügen
-            temp_image_path = None
-            try:
-                # Speichere das PIL-Bild temporär
-                temp_image_path = tempfile.mktemp(suffix='.jpg')
-                print(f"Speichere Bild temporär: {temp_image_path}")
-                image.save(temp_image_path, 'JPEG', quality=95)
-                
-                # Prüfe ob Bild gespeichert wurde
-                if not os.path.exists(temp_image_path):
-                    print(f"FEHLER: Temporäres Bild wurde nicht gespeichert: {temp_image_path}")
-                    continue
+def extract_text_with_language_detection(image_stream, initial_text="", details=None, progress=None, image_output=None,
+                                         pages=None, regions=None, compression=None):
+    """Extrahiert Text mit automatischer Spracherkennung.
 
-                # Bild zur PDF hinzufügen
-                print(f"Füge Bild zur PDF hinzu: {temp_image_path}")
-                c.drawImage(temp_image_path, 0, 0, width=A4[0], height=A4[1])
-                print(f"Bild erfolgreich zur PDF hinzugefügt")
+    Mehrseitige Bilder (z. B. Fax-TIFFs, animierte GIFs) werden Frame für Frame durch dieselbe
+    Pipeline wie PDF-Seiten geschickt (siehe `iter_ocr_frames`), mehrere Frames werden parallel
+    erkannt. Mit `image_output='pdf'` wird eine durchsuchbare PDF mit einer Seite pro Frame
+    erstellt und ihr Pfad (`pathlib.Path`, vom Aufrufer zu löschen) zurückgegeben, `compression`
+    wählt dann das Preset für die Seitenbilder (siehe `default_compression`).
 
-            except Exception as e:
-                print(f"FEHLER beim Hinzufügen des Bildes zu Seite {i+1}: {e}")
-                import traceback
-                traceback.print_exc()
-                temp_image_path = None
-
-            # Text als durchsuchbaren Layer hinzufügen mit OCR-Positionsdaten
-            if page_text.strip():
-                try:
-                    # Führe OCR mit Positionsdaten durch
-                    print(f"Extrahiere Positionsdaten für Seite {i+1}...")
-                    import time
-                    start_time = time.time()
-                    
-                    # Verwende pytesseract um Wort-Positionen zu erhalten
-                    import pytesseract
-                    from PIL import Image
-                    
-                    # Lade das Bild für OCR mit Positionsdaten
-                    print(f"Starte OCR für Seite {i+1}...")
-                    ocr_data = pytesseract.image_to_data(image, lang='deu+eng+fra+ita', output_type=pytesseract.Output.DICT)
-                    print(f"OCR für Seite {i+1} abgeschlossen in {time.time() - start_time:.2f}s")
-                    
-                    # Skalierungsfaktor berechnen (Bild zu PDF)
-                    image_width, image_height = image.size
-                    scale_x = A4[0] / image_width
-                    scale_y = A4[1] / image_height
-                    
-                    print(f"Bild: {image_width}x{image_height}, PDF: {A4[0]}x{A4[1]}, Scale: {scale_x:.3f}x{scale_y:.3f}")
-                    
-                    # Text unsichtbar machen (transparent) aber durchsuchbar
-                    c.setFillColorRGB(0, 0, 0, 0)  # Vollständig transparent
-                    c.setStrokeColorRGB(0, 0, 0, 0)  # Keine Umrandung
-                    
-                    # Gehe durch alle erkannten Wörter und platziere sie an der richtigen Position
-                    n_boxes = len(ocr_data['text'])
-                    words_added = 0
-                    
-                    for j in range(n_boxes):
-                        text = ocr_data['text'][j].strip()
-                        if text:  # Nur nicht-leere Wörter
-                            # Position und Größe aus OCR-Daten
-                            x = ocr_data['left'][j]
-                            y = ocr_data['top'][j]
-                            w = ocr_data['width'][j]
-                            h = ocr_data['height'][j]
-                            
-                            # Skaliere auf PDF-Koordinaten
-                            pdf_x = x * scale_x
-                            pdf_y = A4[1] - (y * scale_y) - (h * scale_y)  # PDF-Y ist von unten
-                            pdf_h = h * scale_y
-                            
-                            # Berechne Schriftgröße basierend auf Höhe
-                            font_size = max(1, pdf_h * 0.8)  # 80% der Höhe
-                            
-                            # Setze Schrift
-                            c.setFont("Helvetica", font_size)
-                            
-                            # Zeichne Text an der exakten Position
-                            c.drawString(pdf_x, pdf_y, text)
-                            words_added += 1
-                    
-                    print(f"Text für Seite {i+1}: {words_added} Wörter an exakten Positionen hinzugefügt")
-
-                except Exception as e:
-                    print(f"Fehler beim Hinzufügen von Text mit Positionsdaten zu Seite {i+1}: {e}")
-                    import traceback
-                    traceback.print_exc()
-                    
-                    # Fallback: Text ohne Positionsdaten hinzufügen
-                    print(f"Fallback: Füge Text ohne Positionsdaten hinzu...")
-                    try:
-                        c.setFillColor(Color(0, 0, 0, 0))
-                        c.setFont("Helvetica", 1)
-                        lines = page_text.split('\n')
-                        y_position = A4[1] - 10
-                        for line in lines:
-                            line = line.strip()
-                            if line:
-                                c.drawString(0, y_position, line)
-                                y_position -= 2
-                        print(f"Fallback erfolgreich für Seite {i+1}")
-                    except Exception as e2:
-                        print(f"Auch Fallback fehlgeschlagen: {e2}")
-
-            # Temporäre Bild-Datei aufräumen
-            if temp_image_path and os.path.exists(temp_image_path):
-                try:
-                    os.unlink(temp_image_path)
-                except:
-                    pass
-
-        # PDF speichern
-        print("Speichere PDF...")
-        try:
-            c.save()
-            print(f"PDF erfolgreich gespeichert: {output_path}")
-            
-            # Prüfe ob PDF erstellt wurde
-            if not os.path.exists(output_path):
-                print(f"FEHLER: PDF wurde nicht erstellt: {output_path}")
-                return False
-                
-            # Prüfe PDF-Größe
-            file_size = os.path.getsize(output_path)
-            print(f"PDF-Größe: {file_size} Bytes")
-            
-            if file_size == 0:
-                print("FEHLER: PDF ist leer (0 Bytes)")
-                return False
-                
-            print(f"PDF mit integriertem Text erfolgreich erstellt: {output_path}")
-            return True
-            
-        except Exception as e:
-            print(f"FEHLER beim Speichern der PDF: {e}")
-            import traceback
-            traceback.print_exc()
-            return False
+    Mit `pages` (0-basierte Frame-Indizes) werden nur diese Frames erkannt, mit `regions` (siehe
+    `parse_regions`) nur deren Ausschnitte; dann wird immer Text geliefert.
 
-    except Exception as e:
-        print(f"Fehler beim Erstellen der PDF mit Text: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
-
-def extract_text_with_language_detection(image_stream, initial_text=""):
-    """Extrahiert Text mit automatischer Spracherkennung."""
+    `progress` wird optional nach jedem Frame mit `(fertige_frames, frames_gesamt)` aufgerufen,
+    die gewählte Sprachauswahl wird in `details['language']` vermerkt.
+    """
+    image_output = 'text' if regions else (image_output or default_image_output())
     try:
-        print(f"OCR-Verarbeitung gestartet...")
+        logger.debug(f"OCR-Verarbeitung gestartet...")
         
-        # Bild aus Stream öffnen
+        # Bild aus Stream öffnen (liest nur den Kopf, Frames werden erst bei Bedarf dekodiert)
         image = Image.open(image_stream)
-        print(f"Bild geladen: {image.size[0]}x{image.size[1]} Pixel")
+        frame_count = getattr(image, 'n_frames', 1)
+        logger.debug(f"Bild geladen: {image.size[0]}x{image.size[1]} Pixel, {frame_count} Frame(s)")
+        selected = _selected_frames(image, pages, regions)
         
-        # Wenn bereits Text vorhanden ist, verwende ihn für Spracherkennung
-        if initial_text:
-            detected_lang = detect_language_from_text(initial_text)
-            print(f"Sprache erkannt: {detected_lang}")
+        page_texts = [""] * frame_count
+        frames_done = 0
+
+        def frames_with_text():
+            nonlocal frames_done
+            for index, frame, page_result in iter_ocr_frames(image, initial_text, details=details,
+                                                             pages=pages, regions=regions):
+                page_texts[index] = page_result['text']
+                frames_done += 1
+                if progress:
+                    progress(frames_done, len(selected))
+                yield frame, page_result
+
+        if image_output == 'pdf':
+            work_dir = tempfile.mkdtemp(prefix='pdf2ocr-')
+            output_pdf_path = os.path.join(work_dir, 'with_text.pdf')
+            try:
+                success = _write_searchable_pdf(frames_with_text(), output_pdf_path, compression)
+                if success and any(page_texts):
+                    result_path = _detach_result(output_pdf_path)
+                    logger.info(f"PDF mit integriertem Text erstellt: {result_path}")
+                    return result_path
+            finally:
+                shutil.rmtree(work_dir, ignore_errors=True)
         else:
-            # Erst mit Standard-Sprachen versuchen
-            detected_lang = 'deu+eng+fra+ita'
-            print(f"Verwende Standard-Sprachen: {detected_lang}")
-        
-        # OCR mit erkannten Sprachen
-        print(f"Führe OCR durch mit Sprachen: {detected_lang}")
-        text = pytesseract.image_to_string(image, lang=detected_lang)
-        print(f"OCR-Ergebnis: {len(text)} Zeichen")
+            for _ in frames_with_text():
+                pass
         
-        # Falls wenig Text gefunden wurde, mit allen Sprachen erneut versuchen
-        if not text.strip() or len(text.strip()) < 10:
-            print("Wenig Text gefunden, versuche mit allen Sprachen...")
-            text = pytesseract.image_to_string(image, lang='deu+eng+fra+ita')
-            print(f"OCR mit allen Sprachen: {len(text)} Zeichen")
-        
-        result = text.strip() if text.strip() else None
+        if frame_count == 1:
+            result = page_texts[0] or None
+        else:
+            result = "".join(f"--- Seite {i+1} ---\n{page_text}\n\n"
+                             for i, page_text in enumerate(page_texts) if page_text).strip() or None
         if result:
-            print(f"OCR erfolgreich: {len(result)} Zeichen extrahiert")
+            logger.info(f"OCR erfolgreich: {len(result)} Zeichen extrahiert")
         else:
-            print("OCR: Kein Text gefunden")
+            logger.info("OCR: Kein Text gefunden")
         
         return result
         
     except Exception as e:
-        print(f"Fehler beim Verarbeiten des Bildes: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Fehler beim Verarbeiten des Bildes: {e}")
         return None
 
-def extract_text_from_pdf(file_stream):
-    """Extrahiert Text aus einer PDF-Datei."""
+def _pdf_path_for_stream(file_stream, work_dir):
+    """Liefert einen Dateipfad des Uploads für den Rasterizer, ohne ihn unnötig zu kopieren.
+
+    Dateien auf der Platte (z. B. Job-Uploads) werden direkt verwendet, alles andere wird
+    blockweise nach `work_dir` gespoolt, ohne den ganzen Inhalt in den Speicher zu lesen.
+    """
+    name = getattr(file_stream, 'name', None)
+    if isinstance(name, str) and os.path.isfile(name):
+        return name
+    path = os.path.join(work_dir, 'input.pdf')
+    file_stream.seek(0)
+    with metrics.span('upload', target='rasterizer') as tags, open(path, 'wb') as f:
+        shutil.copyfileobj(file_stream, f, 1024 * 1024)
+        tags['bytes'] = f.tell()
+    return path
+
+def _detach_result(path):
+    """Verschiebt eine Ergebnis-PDF in eine eigenständige temporäre Datei und gibt deren Pfad zurück.
+
+    Der Aufrufer besitzt die Datei und muss sie nach Gebrauch löschen.
+    """
+    fd, result_path = tempfile.mkstemp(prefix='pdf2ocr-', suffix='_with_text.pdf')
+    os.close(fd)
+    os.replace(path, result_path)
+    return Path(result_path)
+
+# Mindestanzahl eingebetteter Zeichen, ab der eine PDF-Seite nicht per OCR verarbeitet wird
+MIN_PAGE_TEXT_CHARS = int(os.getenv('OCR_MIN_PAGE_TEXT_CHARS', '20'))
+
+def _resources_have_fonts(resources, depth=0):
+    """Prüft, ob Seiten-Ressourcen (inkl. Form-XObjects) Schriften enthalten."""
+    if resources is None or depth > 5:
+        return False
+    resources = resources.get_object()
+    if resources.get('/Font'):
+        return True
+    xobjects = resources.get('/XObject')
+    if xobjects:
+        for xobject in xobjects.get_object().values():
+            xobject = xobject.get_object()
+            if xobject.get('/Subtype') == '/Form' and _resources_have_fonts(xobject.get('/Resources'), depth + 1):
+                return True
+    return False
+
+def classify_pdf_page(page):
+    """Entscheidet pro PDF-Seite zwischen eingebettetem Text und OCR.
+
+    Liefert `('text', seitentext)` oder `('ocr', '')`. Seiten ohne Schriften (reine Scans) werden
+    ohne Textextraktion direkt der OCR zugeordnet, Seiten mit zu wenig eingebettetem Text
+    (z. B. gescannte Seite mit aufgestempelter Seitenzahl) ebenfalls.
+    """
+    try:
+        if not _resources_have_fonts(page.get('/Resources')):
+            return 'ocr', ''
+    except Exception:
+        pass  # Im Zweifel Text extrahieren
+    page_text = (page.extract_text() or '').strip()
+    if len(page_text) >= MIN_PAGE_TEXT_CHARS:
+        return 'text', page_text
+    return 'ocr', ''
+
+def _classify_pdf_pages(pdf_reader, pages=None):
+    """Klassifiziert alle Seiten bzw. die Seiten in `pages` (siehe `classify_pdf_page`).
+
+    Liefert `(seitentexte, ocr_indizes)`: eingebetteter Text pro Seite (leer für OCR-Seiten und
+    nicht ausgewählte Seiten) und die Indizes der Seiten, die gerastert und erkannt werden müssen.
+    """
+    page_texts = [""] * len(pdf_reader.pages)
+    ocr_indices = []
+    selected = range(len(pdf_reader.pages)) if pages is None else pages
+    with metrics.span('extract', pages=len(selected)) as tags:
+        for i in selected:
+            page = pdf_reader.pages[i]
+            try:
+                kind, page_text = classify_pdf_page(page)
+            except Exception as e:
+                logger.warning(f"Fehler bei Seite {i+1}: {e}")
+                kind, page_text = 'ocr', ''
+            if kind == 'text':
+                page_texts[i] = page_text
+                logger.debug(f"Seite {i+1}: {len(page_text)} Zeichen extrahiert")
+            else:
+                ocr_indices.append(i)
+                logger.debug(f"Seite {i+1}: Kein Text gefunden, OCR erforderlich")
+        tags['ocr_pages'] = len(ocr_indices)
+    metrics.inc('pdf2ocr_pages_total', len(selected) - len(ocr_indices), source='embedded')
+    return page_texts, ocr_indices
+
+def _merge_hybrid_pdf(original_pdf_path, ocr_pdf_path, ocr_indices, output_path, pages=None):
+    """Setzt die Ausgabe aus Originalseiten (eingebetteter Text) und OCR-Seiten zusammen.
+
+    Mit `pages` enthält die Ausgabe nur diese Seiten des Originals.
+    """
+    original = PyPDF2.PdfReader(original_pdf_path)
+    ocr_reader = PyPDF2.PdfReader(ocr_pdf_path)
+    ocr_pages_iter = iter(ocr_reader.pages)
+    ocr_set = set(ocr_indices)
+
+    writer = PyPDF2.PdfWriter()
+    with metrics.span('save', pages=len(ocr_set), output='hybrid'):
+        for i in (range(len(original.pages)) if pages is None else pages):
+            writer.add_page(next(ocr_pages_iter) if i in ocr_set else original.pages[i])
+        with open(output_path, 'wb') as f:
+            writer.write(f)
+    return True
+
+def extract_text_from_pdf(file_stream, progress=None, output_mode=None, details=None, pages=None, regions=None,
+                          compression=None):
+    """Extrahiert Text aus einer PDF-Datei.
+
+    Jede Seite wird einzeln klassifiziert (siehe `classify_pdf_page`): Seiten mit eingebettetem
+    Text werden übernommen, nur die übrigen Seiten werden gerastert und per OCR erkannt. Enthält
+    das Dokument OCR-Seiten, wird eine durchsuchbare PDF aus beiden Seitenarten erstellt und ihr
+    Pfad (`pathlib.Path`, vom Aufrufer zu löschen) zurückgegeben, sonst der eingebettete Text.
+    `output_mode` wählt, wie OCR-Seiten ausgegeben werden (siehe `default_output_mode`), `compression`
+    das Preset für die Seitenbilder im Modus `rebuild` (siehe `default_compression`).
+
+    Mit `pages` (0-basierte Indizes) werden nur diese Seiten klassifiziert, gerastert und
+    ausgegeben. Mit `regions` (siehe `parse_regions`) werden die ausgewählten Seiten gerastert und
+    nur die angegebenen Ausschnitte erkannt; das Ergebnis ist dann immer Text.
+
+    `progress` wird optional nach jeder erkannten Seite mit `(fertige_seiten, seiten_gesamt)` aufgerufen,
+    in `details['language']` wird die erkannte Sprachauswahl des Dokuments vermerkt.
+    """
+    output_mode = output_mode or default_output_mode()
     try:
-        print(f"PDF-Verarbeitung gestartet...")
+        logger.info(f"PDF-Verarbeitung gestartet (Ausgabemodus: {output_mode})...")
         
-        # Zuerst versuchen, Text direkt aus der PDF zu extrahieren
         file_stream.seek(0)  # Stream zurücksetzen
         pdf_reader = PyPDF2.PdfReader(file_stream)
-        text = ""
+        page_count = len(pdf_reader.pages)
+        logger.debug(f"PDF hat {page_count} Seiten")
         
-        print(f"PDF hat {len(pdf_reader.pages)} Seiten")
+        selected = list(range(page_count)) if pages is None else [i for i in pages if i < page_count]
+        selected = _pages_with_regions(selected, regions)
+        if not selected:
+            logger.warning("Keine der ausgewählten Seiten ist im Dokument vorhanden")
+            return None
+        if len(selected) < page_count:
+            logger.debug(f"Verarbeite {len(selected)} ausgewählte Seiten")
         
-        for i, page in enumerate(pdf_reader.pages):
-            try:
-                page_text = page.extract_text()
-                if page_text and page_text.strip():
-                    text += page_text + "\n"
-                    print(f"Seite {i+1}: {len(page_text)} Zeichen extrahiert")
-                else:
-                    print(f"Seite {i+1}: Kein Text gefunden")
-            except Exception as e:
-                print(f"Fehler bei Seite {i+1}: {e}")
+        if regions:
+            # Eingebetteter Text hat keine verlässlichen Positionen: Ausschnitte immer per OCR
+            page_texts, ocr_indices = [""] * page_count, selected
+        else:
+            # Pro Seite entscheiden: eingebetteten Text verwenden oder rastern + OCR
+            page_texts, ocr_indices = _classify_pdf_pages(pdf_reader, selected)
         
-        # Wenn Text gefunden wurde, zurückgeben
-        if text.strip():
-            print(f"Direkte PDF-Extraktion erfolgreich: {len(text)} Zeichen")
-            return text.strip()
+        text = "\n".join(page_text for page_text in page_texts if page_text)
         
-        print("Kein Text durch direkte Extraktion gefunden, versuche OCR...")
+        # Wenn alle Seiten Text enthalten, direkt zurückgeben
+        if not ocr_indices:
+            if progress:
+                progress(len(selected), len(selected))
+            if text.strip():
+                logger.info(f"Direkte PDF-Extraktion erfolgreich: {len(text)} Zeichen")
+                if details is not None:
+                    details['language'] = detect_language_from_text(text)
+                return text.strip()
+            return None
         
-        # Falls kein Text gefunden wurde, PDF zu Bildern konvertieren und OCR anwenden
-        file_stream.seek(0)  # Stream zurücksetzen
+        logger.info(f"{len(ocr_indices)} von {len(selected)} Seiten benötigen OCR...")
+        pages_done = len(selected) - len(ocr_indices)
+        if progress:
+            progress(pages_done, len(selected))
         
-        # Temporäre Datei erstellen
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-            temp_file.write(file_stream.read())
-            temp_file_path = temp_file.name
+        # Für OCR wird die PDF gerastert. Der Rasterizer braucht einen Dateipfad: liegt der Upload
+        # bereits auf der Platte, wird er direkt verwendet, sonst einmal in ein Arbeitsverzeichnis gespoolt.
+        work_dir = tempfile.mkdtemp(prefix='pdf2ocr-')
         
-        print(f"Temporäre PDF-Datei erstellt: {temp_file_path}")
+        hybrid = len(ocr_indices) < len(selected)
+        partial = len(selected) < page_count
+        output_pdf_path = os.path.join(work_dir, 'with_text.pdf')
+        # Im Overlay-Modus und bei gemischten Dokumenten werden die OCR-Seiten erst separat
+        # geschrieben und dann mit den Originalseiten zusammengeführt
+        separate = hybrid or output_mode == 'overlay'
+        ocr_pdf_path = os.path.join(work_dir, 'ocr_pages.pdf') if separate else output_pdf_path
         
         try:
-            # PDF zu Bildern konvertieren
-            print("Konvertiere PDF zu Bildern...")
-            images = convert_from_path(temp_file_path, dpi=200)  # Optimiert für Performance (200 DPI)
-            print(f"PDF zu {len(images)} Bildern konvertiert")
+            pdf_path = _pdf_path_for_stream(file_stream, work_dir)
+            logger.debug(f"PDF für Rasterung: {pdf_path}")
             
-            # OCR auf jedes Bild anwenden und Text pro Seite sammeln
-            ocr_texts = []  # Liste für Text pro Seite
-            ocr_text_combined = ""  # Kombinierter Text für Rückgabe
+            # OCR-Seiten fensterweise rastern, erkennen und direkt in die neue PDF schreiben.
+            # Es liegen nie mehr Seitenbilder im Speicher als ein Fenster umfasst.
+            def pages_with_text():
+                nonlocal pages_done
+                for index, image, page_result in iter_ocr_pages(pdf_path, page_count, initial_text=text,
+                                                                pages=ocr_indices, details=details,
+                                                                regions=regions):
+                    page_texts[index] = page_result['text']
+                    pages_done += 1
+                    if progress:
+                        progress(pages_done, len(selected))
+                    yield index, image, page_result
             
-            for i, image in enumerate(images):
-                print(f"Verarbeite Bild {i+1}/{len(images)}...")
-                # Verwende bereits extrahierten Text für Spracherkennung
-                initial_text = text if i == 0 else ""
-                
-                # Konvertiere PIL Image zu Bytes für OCR
-                img_bytes = io.BytesIO()
-                image.save(img_bytes, format='PNG')
-                img_bytes.seek(0)
-                
-                page_text = extract_text_with_language_detection(img_bytes, initial_text)
-                
-                if page_text and page_text.strip():
-                    ocr_texts.append(page_text.strip())
-                    ocr_text_combined += f"--- Seite {i+1} ---\n{page_text.strip()}\n\n"
-                    print(f"Seite {i+1}: {len(page_text)} Zeichen durch OCR extrahiert")
+            logger.debug(f"Starte OCR für {len(ocr_indices)} Seiten ({_default_ocr_workers()} parallel)...")
+            try:
+                if regions:
+                    # Nur Ausschnitte erkannt: keine durchsuchbare PDF, Ergebnis ist der Text
+                    for _ in pages_with_text():
+                        pass
+                    success = False
+                elif output_mode == 'overlay':
+                    success = _write_text_layer_pdf(pages_with_text(), pdf_path, ocr_pdf_path)
+                    if success:
+                        logger.debug("Lege Text-Layer auf die Originalseiten...")
+                        success = _overlay_text_layer(pdf_path, ocr_pdf_path, ocr_indices, output_pdf_path,
+                                                      pages=selected if partial else None)
                 else:
-                    ocr_texts.append("")
-                    print(f"Seite {i+1}: Kein Text durch OCR gefunden")
+                    pages = ((image, page_result) for _, image, page_result in pages_with_text())
+                    success = _write_searchable_pdf(pages, ocr_pdf_path, compression)
+                if success and hybrid and output_mode != 'overlay':
+                    logger.debug("Füge OCR-Seiten und Seiten mit eingebettetem Text zusammen...")
+                    success = _merge_hybrid_pdf(pdf_path, ocr_pdf_path, ocr_indices, output_pdf_path,
+                                                pages=selected if partial else None)
+            except Exception as e:
+                logger.exception(f"FEHLER beim Erstellen der PDF mit Text: {e}")
+                success = False
             
-            # Erstelle PDF mit integriertem Text
-            print(f"DEBUG: OCR-Texte vorhanden: {any(ocr_texts)}")
-            print(f"DEBUG: Anzahl OCR-Texte: {len(ocr_texts)}")
-            if any(ocr_texts):  # Falls mindestens eine Seite Text hat
-                output_pdf_path = temp_file_path.replace('.pdf', '_with_text.pdf')
-                print(f"DEBUG: Erstelle PDF mit Text: {output_pdf_path}")
-                # Verwende die bereits konvertierten Bilder (Cache)
-                success = create_pdf_with_text(temp_file_path, ocr_texts, output_pdf_path, images_cache=images)
-                print(f"DEBUG: PDF-Erstellung erfolgreich: {success}")
-                
-                if success:
-                    print(f"PDF mit integriertem Text erstellt: {output_pdf_path}")
-                    # Lese die neue PDF und gib sie zurück
-                    with open(output_pdf_path, 'rb') as f:
-                        pdf_data = f.read()
-                    
-                    # Temporäre Dateien löschen
-                    if os.path.exists(output_pdf_path):
-                        os.unlink(output_pdf_path)
-                    
-                    return pdf_data  # Gib PDF-Daten zurück statt Text
+            ocr_found = any(page_texts[i] for i in ocr_indices)
+            ocr_text_combined = ""  # Kombinierter Text für Rückgabe
+            for i, page_text in enumerate(page_texts):
+                if page_text:
+                    ocr_text_combined += f"--- Seite {i+1} ---\n{page_text}\n\n"
+            
+            logger.debug(f"OCR-Texte vorhanden: {ocr_found}")
+            logger.debug(f"Anzahl OCR-Seiten: {len(ocr_indices)}")
+            logger.debug(f"PDF-Erstellung erfolgreich: {success}")
+            if success and ocr_found:  # Falls mindestens eine OCR-Seite Text hat
+                # PDF aus dem Arbeitsverzeichnis lösen und als Pfad zurückgeben statt sie einzulesen
+                result_path = _detach_result(output_pdf_path)
+                logger.info(f"PDF mit integriertem Text erstellt: {result_path}")
+                return result_path
             
             # Fallback: Wenn keine PDF erstellt werden konnte, gib Text zurück
             result = ocr_text_combined.strip() if ocr_text_combined.strip() else None
             if result:
-                print(f"OCR erfolgreich: {len(result)} Zeichen insgesamt")
+                logger.info(f"OCR erfolgreich: {len(result)} Zeichen insgesamt")
             else:
-                print("OCR: Kein Text gefunden")
+                logger.info("OCR: Kein Text gefunden")
             
             return result
             
         finally:
-            # Temporäre Datei löschen
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
-                print(f"Temporäre Datei gelöscht: {temp_file_path}")
+            # Temporäre Dateien löschen
+            shutil.rmtree(work_dir, ignore_errors=True)
+            logger.debug(f"Temporäre Dateien gelöscht: {work_dir}")
                 
     except Exception as e:
-        print(f"Fehler beim Verarbeiten der PDF: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Fehler beim Verarbeiten der PDF: {e}")
         return None
 
-def extract_text_from_image(image_stream):
-    """Extrahiert Text aus einem Bild mit automatischer Spracherkennung."""
-    return extract_text_with_language_detection(image_stream)
+def extract_text_from_image(image_stream, details=None, progress=None, image_output=None, pages=None, regions=None,
+                            compression=None):
+    """Extrahiert Text aus einem (auch mehrseitigen) Bild mit automatischer Spracherkennung."""
+    return extract_text_with_language_detection(image_stream, details=details, progress=progress,
+                                                image_output=image_output, pages=pages, regions=regions,
+                                                compression=compression)
+
+SUPPORTED_EXTENSIONS = ['pdf', 'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff', 'tif']
+
+def _with_scan_info(page_result, image):
+    """Seitenergebnis mit Herkunft und Auflösung des erkannten Bildes (für strukturierte Ausgaben)."""
+    dpi = image.info.get('dpi')
+    return dict(page_result, source='ocr', dpi=round(dpi[0]) if dpi else None)
+
+def check_document(file_stream, filename):
+    """Prüft, ob sich eine Datei öffnen lässt (Dateityp, PDF-Struktur bzw. Bildkopf).
 
-def process_file(file_stream, filename):
-    """Verarbeitet eine Datei (Bild oder PDF) und gibt den extrahierten Text zurück."""
-    print(f"Verarbeite Datei: {filename}")
+    Strukturierte Ausgaben senden den Status 200, bevor die erste Seite erkannt ist; defekte
+    Uploads müssen deshalb vorher abgewiesen werden. Wirft ValueError mit einer Beschreibung.
+    """
+    file_extension = filename.lower().split('.')[-1] if '.' in filename else ''
+    if file_extension not in SUPPORTED_EXTENSIONS:
+        raise ValueError(f"Unsupported file type '{file_extension}'")
+    try:
+        file_stream.seek(0)
+        if file_extension == 'pdf':
+            len(PyPDF2.PdfReader(file_stream).pages)
+        else:
+            with Image.open(file_stream):
+                pass
+    except Exception as e:
+        kind = 'PDF' if file_extension == 'pdf' else 'image'
+        raise ValueError(f"Invalid {kind} file: {e}") from e
+    finally:
+        file_stream.seek(0)
+
+def _iter_pages_isolated(run, indices, details):
+    """Liefert `(index, Bild, Seitenergebnis)` aus `run(indizes, lang)`, ein Fehler betrifft nur eine Seite.
+
+    Fehler der Seiten-OCR fängt bereits `_ocr_page_safe` ab. Scheitert dagegen das Rastern oder
+    Dekodieren eines Fensters, bricht der Generator ab: die nächste Seite wird dann einzeln
+    versucht, scheitert auch sie, wird sie mit `error` (und ohne Bild) geliefert. Danach geht es
+    mit den übrigen Seiten weiter.
+    """
+    remaining = list(indices)
+    lang = None
+    failed = False
+    while remaining:
+        single = failed
+        results = run(remaining[:1] if single else remaining, lang)
+        failed = False
+        try:
+            for index, image, page_result in results:
+                remaining = remaining[remaining.index(index) + 1:]
+                yield index, image, page_result
+        except Exception as e:
+            if single:
+                logger.warning(f"Fehler bei Seite {remaining[0]+1}, übrige Seiten werden weiter verarbeitet: {e}")
+                metrics.inc('pdf2ocr_pages_total', source='error')
+                details.setdefault('page_errors', []).append(remaining[0] + 1)
+                yield remaining[0], None, {'text': '', 'words': [], 'width': None, 'height': None, 'lang': None,
+                                           'error': str(e)}
+                remaining = remaining[1:]
+            else:
+                failed = True
+        finally:
+            results.close()
+        # Die Sprachauswahl beim Neustart übernehmen statt erneut zu proben
+        lang = details.get('language')
+
+def iter_document_pages(file_stream, filename, progress=None, details=None, pages=None, regions=None):
+    """Liefert `(seitenindex, Seitenergebnis)` für alle Seiten einer Datei in Seitenreihenfolge.
+
+    Grundlage der strukturierten Ausgabeformate (siehe `formats`): jede Seite läuft genau einmal
+    durch die OCR, es wird keine Ausgabe-PDF erstellt. OCR-Seiten enthalten Wortboxen in Pixeln
+    des erkannten Bildes (`dpi`), PDF-Seiten mit eingebettetem Text werden ohne OCR übernommen
+    (`source: 'embedded'`, nur Text, Maße in Punkt). Seiten, die nicht gerastert oder erkannt
+    werden konnten, enthalten `error`, die übrigen Seiten werden weiter geliefert. `pages` und
+    `regions` beschränken die Verarbeitung wie bei `extract_text_from_pdf`. Wirft ValueError für
+    nicht unterstützte Dateitypen; defekte Dateien fallen erst beim ersten Abruf auf (vorher mit
+    `check_document` prüfen).
+
+    Anders als `process_file` nutzt der Generator nicht den Ergebnis-Cache (nur den Seiten-Cache),
+    da das Ergebnis gestreamt und nicht als Ganzes abgelegt wird. Dokumentmetriken werden erfasst,
+    sobald alle Seiten geliefert sind.
+    """
+    if details is None:
+        details = {}
+    file_extension = filename.lower().split('.')[-1] if '.' in filename else ''
+    kind = 'pdf' if file_extension == 'pdf' else 'image'
+    start = time.perf_counter()
+    page_results = _iter_document_pages(file_stream, file_extension, progress, details, pages, regions)
+    page_count = 0
+    has_text = False
+    try:
+        for index, page_result in page_results:
+            page_count += 1
+            has_text = has_text or bool(page_result['text'])
+            yield index, page_result
+    finally:
+        page_results.close()
+
+    seconds = time.perf_counter() - start
+    metrics.inc('pdf2ocr_documents_total', type=kind, status='ok' if has_text else 'empty')
+    metrics.observe('pdf2ocr_document_seconds', seconds, type=kind)
+    if page_count:
+        metrics.observe('pdf2ocr_document_pages_per_second', page_count / max(seconds, 1e-6),
+                        buckets=metrics.RATE_BUCKETS, type=kind)
+    logger.info(f"{filename}: {page_count} Seiten in {seconds:.2f}s ({kind}, strukturiert, "
+                f"Sprache {details.get('language')})")
+
+def _iter_document_pages(file_stream, file_extension, progress, details, pages, regions):
+    if file_extension not in SUPPORTED_EXTENSIONS:
+        raise ValueError(f"Unsupported file type '{file_extension}'")
+
+    if file_extension != 'pdf':
+        image = Image.open(file_stream)
+        frame_indices = _selected_frames(image, pages, regions)
+        frames = _iter_pages_isolated(
+            lambda indices, lang: iter_ocr_frames(image, lang=lang, details=details, pages=indices, regions=regions),
+            frame_indices, details)
+        try:
+            for done, (index, frame, page_result) in enumerate(frames, start=1):
+                if progress:
+                    progress(done, len(frame_indices))
+                yield index, (_with_scan_info(page_result, frame) if frame is not None else page_result)
+        finally:
+            frames.close()
+        return
+
+    file_stream.seek(0)
+    pdf_reader = PyPDF2.PdfReader(file_stream)
+    page_count = len(pdf_reader.pages)
+    selected = list(range(page_count)) if pages is None else [i for i in pages if i < page_count]
+    selected = _pages_with_regions(selected, regions)
+    if regions:
+        page_texts, ocr_indices = [""] * page_count, selected
+    else:
+        page_texts, ocr_indices = _classify_pdf_pages(pdf_reader, selected)
+    text = "\n".join(page_text for page_text in page_texts if page_text)
+    if text.strip():
+        details['language'] = detect_language_from_text(text)
+
+    work_dir = tempfile.mkdtemp(prefix='pdf2ocr-')
+    ocr_results = None
+    try:
+        if ocr_indices:
+            pdf_path = _pdf_path_for_stream(file_stream, work_dir)
+            ocr_results = _iter_pages_isolated(
+                lambda indices, lang: iter_ocr_pages(pdf_path, page_count, initial_text=text, pages=indices, lang=lang,
+                                                     details=details, regions=regions),
+                ocr_indices, details)
+        ocr_set = set(ocr_indices)
+        for done, i in enumerate(selected, start=1):
+            box = pdf_reader.pages[i].mediabox
+            if i in ocr_set:
+                _, image, page_result = next(ocr_results)
+                if image is None:
+                    page_result = dict(page_result, width=float(box.width), height=float(box.height), dpi=72)
+                else:
+                    page_result = _with_scan_info(page_result, image)
+                del image
+            else:
+                page_result = {'text': page_texts[i], 'words': [], 'width': float(box.width),
+                               'height': float(box.height), 'lang': None, 'source': 'embedded', 'dpi': 72}
+            if progress:
+                progress(done, len(selected))
+            yield i, page_result
+    finally:
+        if ocr_results is not None:
+            ocr_results.close()  # Rasterung abbrechen, falls der Client die Verbindung trennt
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def _cache_params(file_extension, output_mode, image_output='text', pages=None, regions=None, compression=None):
+    """Wirksame OCR-Parameter, die zusammen mit dem Dateiinhalt den Cache-Schlüssel bilden."""
+    output = output_mode if file_extension == 'pdf' else image_output
+    params = {
+        'type': file_extension,
+        'lang': 'auto',
+        'dpi': _dpi_params(),
+        'preprocess': _preprocess_params(),
+        'output': output,
+    }
+    # Das Kompressions-Preset wirkt nur auf neu aufgebaute Seiten
+    if output in ('rebuild', 'pdf'):
+        params['compression'] = compression or default_compression()
+    # Nur bei Teilauswahl aufnehmen, damit bestehende Cache-Einträge gültig bleiben
+    if pages is not None:
+        params['pages'] = list(pages)
+    if regions:
+        params['regions'] = regions
+    return params
+
+def process_file(file_stream, filename, progress=None, output_mode=None, details=None, image_output=None,
+                 pages=None, regions=None, compression=None):
+    """Verarbeitet eine Datei (Bild oder PDF) und gibt den extrahierten Text zurück.
+
+    Für durchsuchbare PDFs wird statt Text der Pfad (`pathlib.Path`) einer temporären Datei
+    zurückgegeben, die der Aufrufer nach dem Versand löscht.
+
+    `progress` wird optional mit `(fertige_seiten, seiten_gesamt)` aufgerufen, `output_mode`
+    wählt für PDFs zwischen `rebuild` und `overlay` (siehe `default_output_mode`),
+    `image_output` für Bilder zwischen Text und durchsuchbarer PDF (siehe `default_image_output`),
+    `compression` das Preset für die Seitenbilder neu aufgebauter PDFs (siehe `default_compression`).
+    `pages` (0-basierte Seiten- bzw. Frame-Indizes, siehe `parse_page_ranges`) und `regions`
+    (normierte Ausschnitte, siehe `parse_regions`) beschränken die OCR auf diese Seiten bzw.
+    Bereiche. Ein als `details` übergebenes Dict wird mit Angaben zum Ergebnis gefüllt
+    (`language`: gewählte Tesseract-Sprachauswahl, `page_errors`: Seiten mit OCR-Fehler).
+    Ergebnisse mit Seitenfehlern werden nicht im Ergebnis-Cache abgelegt.
+    """
+    if details is None:
+        details = {}
+    output_mode = output_mode or default_output_mode()
+    image_output = image_output or default_image_output()
+    compression = compression or default_compression()
+    logger.info(f"Verarbeite Datei: {filename}")
     
     # Dateierweiterung ermitteln
     file_extension = filename.lower().split('.')[-1] if '.' in filename else ''
-    print(f"Dateierweiterung erkannt: {file_extension}")
+    logger.debug(f"Dateierweiterung erkannt: {file_extension}")
+    kind = 'pdf' if file_extension == 'pdf' else 'image'
+    start = time.perf_counter()
+    
+    # Identische Uploads mit denselben OCR-Parametern direkt aus dem Cache beantworten
+    key = None
+    if file_extension in SUPPORTED_EXTENSIONS and cache_enabled():
+        # Der Cache ist nur eine Optimierung: ist er nicht nutzbar, wird normal verarbeitet
+        try:
+            key = cache_key(file_stream, _cache_params(file_extension, output_mode, image_output, pages, regions,
+                                                       compression))
+            cached = get_cached_result(key, details)
+        except Exception as e:
+            logger.warning(f"Cache nicht verfügbar, verarbeite ohne Cache: {e}")
+            metrics.inc('pdf2ocr_cache_errors_total', operation='lookup')
+            key, cached = None, None
+            file_stream.seek(0)
+        if cached is not None:
+            metrics.inc('pdf2ocr_documents_total', type=kind, status='cached')
+            return cached
+
+    # Seitenzahl für die Durchsatz-Metrik aus den Fortschrittsmeldungen mitlesen
+    page_total = [0]
+
+    def track_progress(pages_done, pages_total):
+        page_total[0] = pages_total
+        if progress:
+            progress(pages_done, pages_total)
     
     if file_extension == 'pdf':
-        print("Verarbeite als PDF...")
+        logger.debug("Verarbeite als PDF...")
         # PDF verarbeiten
-        text = extract_text_from_pdf(file_stream)
-    elif file_extension in ['png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff']:
-        print("Verarbeite als Bild...")
+        text = extract_text_from_pdf(file_stream, progress=track_progress, output_mode=output_mode,
+                                     details=details, pages=pages, regions=regions, compression=compression)
+    elif file_extension in SUPPORTED_EXTENSIONS:
+        logger.debug("Verarbeite als Bild...")
         # Bild verarbeiten
-        text = extract_text_from_image(file_stream)
+        text = extract_text_from_image(file_stream, details=details, progress=track_progress,
+                                       image_output=image_output, pages=pages, regions=regions,
+                                       compression=compression)
     else:
-        error_msg = f"Unterstütztes Dateiformat nicht erkannt. Unterstützte Formate: PDF, PNG, JPG, JPEG, GIF, BMP, TIFF"
-        print(error_msg)
+        error_msg = f"Unterstütztes Dateiformat nicht erkannt. Unterstützte Formate: PDF, PNG, JPG, JPEG, GIF, BMP, TIFF, TIF"
+        logger.warning(error_msg)
         return error_msg
     
+    seconds = time.perf_counter() - start
+    metrics.inc('pdf2ocr_documents_total', type=kind, status='ok' if text else 'empty')
+    metrics.observe('pdf2ocr_document_seconds', seconds, type=kind)
+    if page_total[0]:
+        metrics.observe('pdf2ocr_document_pages_per_second', page_total[0] / max(seconds, 1e-6),
+                        buckets=metrics.RATE_BUCKETS, type=kind)
+    logger.info(f"{filename}: {page_total[0]} Seiten in {seconds:.2f}s ({kind}, Sprache {details.get('language')})")
+
+    if isinstance(text, Path):
+        logger.info(f"PDF mit integriertem Text erstellt: {text.stat().st_size} Bytes")
+    elif text:
+        logger.info(f"Text erfolgreich extrahiert: {len(text)} Zeichen")
     if text:
-        print(f"Text erfolgreich extrahiert: {len(text)} Zeichen")
+        if key and details.get('page_errors'):
+            # Unvollständiges Ergebnis (z. B. vorübergehender Tesseract-Fehler) nicht dauerhaft ausliefern
+            logger.info(f"{filename}: nicht im Cache abgelegt, Fehler auf Seite(n) {details['page_errors']}")
+        elif key:
+            try:
+                store_result(key, text, details)
+            except Exception as e:
+                logger.warning(f"Cache: Ergebnis konnte nicht gespeichert werden: {e}")
         return text
     
-    print("Kein Text gefunden.")
+    logger.info("Kein Text gefunden.")
     return "Kein Text gefunden."
\ No newline at end of file
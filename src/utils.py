@@ -1,11 +1,258 @@
+import hashlib
+import math
 import os
+import time
 from functools import wraps
 from flask import request, jsonify
+from PIL import Image, ImageChops, ImageFilter
 
 
-def preprocess_image(image_path):
-    # Hier können Funktionen zur Bildvorverarbeitung hinzugefügt werden
-    pass
+# Reihenfolge der Vorverarbeitungsschritte, per `OCR_PREPROCESS` (kommagetrennt) einschränkbar
+PREPROCESS_STEPS = ('grayscale', 'crop', 'deskew', 'scale', 'binarize')
+
+# Ziel-x-Höhe in Pixeln: größere Schrift wird herunterskaliert, Tesseract erkennt ab ~20 px zuverlässig
+TARGET_X_HEIGHT = int(os.getenv('OCR_TARGET_X_HEIGHT', '24'))
+
+# Stärker wird nie verkleinert
+_MIN_SCALE = 0.25
+
+# Gesuchter Schräglagen-Bereich in Grad
+_MAX_SKEW = 5.0
+
+# Breite der verkleinerten Tintenmaske für Rand-, Schräglagen- und Schriftgrößen-Analyse
+_ANALYSIS_WIDTH = 600
+
+# Schwellwert für Tinte: `local` vergleicht jedes Pixel mit seiner Umgebung (hält Text in Schatten
+# und bei ungleichmäßiger Ausleuchtung), `otsu` ist ein globaler Schwellwert für die ganze Seite
+BINARIZE = os.getenv('OCR_BINARIZE', 'local')
+
+# Tinte ist beim lokalen Schwellwert, was um diesen Anteil dunkler ist als der Mittelwert der Umgebung
+_LOCAL_CONTRAST = 0.15
+
+
+def preprocess_steps():
+    """Aktive Vorverarbeitungsschritte aus `OCR_PREPROCESS` (Standard: alle, `0`/`none` schaltet ab)."""
+    configured = os.getenv('OCR_PREPROCESS')
+    if configured is None:
+        return PREPROCESS_STEPS
+    if configured.strip().lower() in ('', '0', 'false', 'no', 'none'):
+        return ()
+    requested = {step.strip().lower() for step in configured.split(',')}
+    return tuple(step for step in PREPROCESS_STEPS if step in requested)
+
+
+def _otsu_threshold(histogram):
+    """Schwellwert nach Otsu aus einem 256er-Helligkeitshistogramm."""
+    total = sum(histogram)
+    sum_all = sum(value * count for value, count in enumerate(histogram))
+    sum_background = weight_background = 0
+    best_threshold, best_variance = 127, -1.0
+    for value, count in enumerate(histogram):
+        weight_background += count
+        if weight_background == 0:
+            continue
+        weight_foreground = total - weight_background
+        if weight_foreground == 0:
+            break
+        sum_background += value * count
+        mean_background = sum_background / weight_background
+        mean_foreground = (sum_all - sum_background) / weight_foreground
+        variance = weight_background * weight_foreground * (mean_background - mean_foreground) ** 2
+        if variance > best_variance:
+            best_threshold, best_variance = value, variance
+    return best_threshold
+
+
+def _ink_mask(image):
+    """Tintenmaske eines Graustufenbildes (255 = Tinte) nach `OCR_BINARIZE`.
+
+    Der lokale Schwellwert (nach Bradley/Roth) vergleicht jedes Pixel mit dem Mittelwert eines
+    Fensters von etwa 1/8 der Bildbreite. Ein globaler Schwellwert nach Otsu färbt bei einem
+    Kamerafoto mit Helligkeitsverlauf den ganzen Schattenbereich schwarz, samt Text darin.
+    """
+    if BINARIZE == 'otsu':
+        threshold = _otsu_threshold(image.histogram())
+        return image.point(lambda v: 255 if v <= threshold else 0)
+    mean = image.filter(ImageFilter.BoxBlur(max(1, image.size[0] // 16)))
+    limit = mean.point(lambda v: int(v * (1 - _LOCAL_CONTRAST)))
+    return ImageChops.subtract(limit, image).point(lambda v: 255 if v else 0)
+
+
+def _analysis_mask(image):
+    """Verkleinertes Graustufenbild, Tintenmaske dazu (255 = Tinte) und der Verkleinerungsfaktor."""
+    small = image.convert('L')
+    factor = max(1, small.size[0] // _ANALYSIS_WIDTH)
+    if factor > 1:
+        small = small.reduce(factor)
+    return small, _ink_mask(small), factor
+
+
+def _row_profile(mask):
+    """Mittlere Tinte pro Pixelzeile (0-255)."""
+    return mask.resize((1, mask.size[1]), Image.BOX).tobytes()
+
+
+def _ink_runs(profile, min_value):
+    """Längen zusammenhängender Zeilenbereiche mit Tinte (entspricht Textzeilen)."""
+    runs, run = [], 0
+    for value in profile:
+        if value >= min_value:
+            run += 1
+        elif run:
+            runs.append(run)
+            run = 0
+    if run:
+        runs.append(run)
+    return runs
+
+
+def _content_box(image):
+    """Inhaltsbereich ohne dunkle Scannerränder und leere Ränder, mit etwas Abstand."""
+    small, mask, factor = _analysis_mask(image)
+    width, height = mask.size
+    columns = small.resize((width, 1), Image.BOX).tobytes()
+    rows = _row_profile(small)
+
+    # Dunkle Ränder (Scannerdeckel, Buchfalz) von außen nach innen abschneiden
+    left, right, top, bottom = 0, width, 0, height
+    while left < right and columns[left] < 100:
+        left += 1
+    while right > left and columns[right - 1] < 100:
+        right -= 1
+    while top < bottom and rows[top] < 100:
+        top += 1
+    while bottom > top and rows[bottom - 1] < 100:
+        bottom -= 1
+    # Die Kante eines Randes ist durch das Verkleinern nur halbdunkel, sie gehört noch dazu
+    edge = 2
+    left, top = left + edge if left else 0, top + edge if top else 0
+    right, bottom = right - edge if right < width else width, bottom - edge if bottom < height else height
+    if right - left < width // 4 or bottom - top < height // 4:
+        return None  # Kein heller Seitenbereich gefunden, nichts abschneiden
+
+    bbox = mask.crop((left, top, right, bottom)).getbbox()
+    if bbox is None:
+        return None
+    margin = 4
+    box = (max(0, left + bbox[0] - margin), max(0, top + bbox[1] - margin),
+           min(width, left + bbox[2] + margin), min(height, top + bbox[3] + margin))
+    return tuple(min(value * factor, limit) for value, limit in zip(box, image.size * 2))
+
+
+def _skew_angle(image):
+    """Schätzt die Schräglage über die Varianz des Zeilenprofils der gedrehten Tintenmaske.
+
+    Liefert den Winkel (Grad, gegen den Uhrzeigersinn), um den das Bild gedreht werden muss.
+    """
+    _, mask, _ = _analysis_mask(image)
+
+    def score(angle):
+        profile = _row_profile(mask.rotate(angle, resample=Image.NEAREST, fillcolor=0))
+        mean = sum(profile) / len(profile)
+        return sum((value - mean) ** 2 for value in profile)
+
+    coarse = max((step * 0.5 for step in range(int(-_MAX_SKEW * 2), int(_MAX_SKEW * 2) + 1)), key=score)
+    return max((coarse + step * 0.1 for step in range(-4, 5)), key=score)
+
+
+def estimate_x_height(image, percentile=0.5):
+    """Schätzt die x-Höhe der Schrift in Pixeln aus der Höhe der Textzeilen (Zeilenhöhe ≈ 2 x-Höhen).
+
+    Mit `percentile` < 0.5 zählt eher die kleinere Schrift einer Seite (z. B. Fußnoten). Liefert
+    None, wenn keine Textzeilen erkennbar sind.
+    """
+    _, mask, factor = _analysis_mask(image)
+    # Einzelne Pixelzeilen (Linien, Unterstreichungen, Rauschen) sind keine Textzeilen
+    runs = sorted(run for run in _ink_runs(_row_profile(mask), 255 * 0.01) if run >= 3)
+    if len(runs) < 3:
+        return None
+    return runs[int((len(runs) - 1) * percentile)] * factor / 2
+
+
+def preprocess_image(image, steps=None):
+    """Bereitet ein Seitenbild für Tesseract vor: kleiner und sauberer, bei gleichem Inhalt.
+
+    Schritte (in dieser Reihenfolge, Auswahl über `steps` bzw. `OCR_PREPROCESS`):
+    `grayscale` (Graustufen), `crop` (dunkle Scannerränder und leere Ränder entfernen),
+    `deskew` (Schräglage bis ±5° korrigieren), `scale` (auf `OCR_TARGET_X_HEIGHT` verkleinern)
+    und `binarize` (Schwarz/Weiß, Schwellwert nach `OCR_BINARIZE`, Standard lokal).
+
+    Liefert das vorverarbeitete Bild und ein Dict `transform` mit den angewendeten Schritten und
+    deren Laufzeit in ms (`timings`). Mit `map_words_to_original` lassen sich die Wortboxen der
+    OCR wieder in Koordinaten des Originalbildes umrechnen.
+    """
+    if isinstance(image, (str, os.PathLike)):
+        image = Image.open(image)
+    steps = preprocess_steps() if steps is None else steps
+    transform = {'size': image.size, 'offset': (0, 0), 'angle': 0.0, 'center': None, 'scale': 1.0, 'timings': {}}
+
+    def timed(step, func):
+        start = time.perf_counter()
+        result = func()
+        transform['timings'][step] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    # Binarisierung setzt Graustufen voraus
+    if image.mode != 'L' and ('grayscale' in steps or 'binarize' in steps):
+        image = timed('grayscale', lambda: image.convert('L'))
+
+    if 'crop' in steps:
+        box = timed('crop', lambda: _content_box(image))
+        if box and box != (0, 0) + image.size:
+            image = image.crop(box)
+            transform['offset'] = box[:2]
+
+    if 'deskew' in steps:
+        angle = timed('deskew', lambda: _skew_angle(image))
+        if abs(angle) >= 0.2:
+            transform['angle'] = angle
+            transform['center'] = (image.size[0] / 2, image.size[1] / 2)
+            image = image.rotate(angle, resample=Image.BICUBIC, fillcolor='white')
+
+    if 'scale' in steps:
+        x_height = timed('scale', lambda: estimate_x_height(image))
+        if x_height and x_height > TARGET_X_HEIGHT:
+            scale = max(_MIN_SCALE, TARGET_X_HEIGHT / x_height)
+            size = (max(1, round(image.size[0] * scale)), max(1, round(image.size[1] * scale)))
+            image = image.resize(size, Image.BILINEAR, reducing_gap=2.0)
+            transform['scale'] = scale
+
+    if 'binarize' in steps:
+        image = timed('binarize', lambda: ImageChops.invert(_ink_mask(image)))
+
+    return image, transform
+
+
+def _to_original(x, y, transform):
+    """Rechnet einen Punkt des vorverarbeiteten Bildes in das Originalbild um."""
+    x, y = x / transform['scale'], y / transform['scale']
+    if transform['angle']:
+        # `Image.rotate` dreht um die Bildmitte gegen den Uhrzeigersinn, hier die Umkehrung
+        cx, cy = transform['center']
+        theta = math.radians(transform['angle'])
+        u, v = x - cx, y - cy
+        x = cx + u * math.cos(theta) - v * math.sin(theta)
+        y = cy + u * math.sin(theta) + v * math.cos(theta)
+    return x + transform['offset'][0], y + transform['offset'][1]
+
+
+def map_words_to_original(words, transform):
+    """Rechnet die Wortboxen der OCR (siehe `preprocess_image`) in Originalkoordinaten um."""
+    if transform['offset'] == (0, 0) and not transform['angle'] and transform['scale'] == 1.0:
+        return words
+    width, height = transform['size']
+    mapped = []
+    for word in words:
+        corners = [_to_original(x, y, transform)
+                   for x in (word['left'], word['left'] + word['width'])
+                   for y in (word['top'], word['top'] + word['height'])]
+        left = max(0, min(x for x, _ in corners))
+        top = max(0, min(y for _, y in corners))
+        right = min(width, max(x for x, _ in corners))
+        bottom = min(height, max(y for _, y in corners))
+        mapped.append(dict(word, left=round(left), top=round(top),
+                           width=max(1, round(right - left)), height=max(1, round(bottom - top))))
+    return mapped
 
 
 def save_file(file, upload_folder):
@@ -36,23 +283,41 @@ def _get_api_key_from_request():
     return None
 
 
+def _configured_api_keys():
+    """Gültige Keys aus `API_KEY`, mehrere Clients mit eigenen Keys kommagetrennt."""
+    return [key.strip() for key in os.getenv('API_KEY', '').split(',') if key.strip()]
+
+
+def request_identity():
+    """Kennung des Aufrufers für Kontingente: Hash des API-Keys, ohne Key die Client-Adresse.
+
+    Ohne konfigurierte Keys (`API_KEY` leer) wird ein mitgeschickter Header ignoriert, sonst
+    könnte jeder Client mit wechselnden Phantasie-Keys das Limit pro Client umgehen.
+    """
+    key = _get_api_key_from_request() if _configured_api_keys() else None
+    if key:
+        return 'key:' + hashlib.sha256(key.encode()).hexdigest()[:16]
+    return f'addr:{request.remote_addr}'
+
+
 def require_api_key(func):
     """Decorator, der einen API-Key prüft, wenn die Umgebungsvariable API_KEY gesetzt ist.
 
     Verhalten:
     - Wenn API_KEY nicht gesetzt ist: erlaubt alle Anfragen (abwärtskompatibel).
     - Wenn API_KEY gesetzt ist: fordert Header `X-API-Key: <key>` oder `Authorization: Bearer <key>`.
+      Mehrere Keys (kommagetrennt) erlauben eigene Kontingente pro Client (siehe `admission`).
     """
 
     @wraps(func)
     def wrapper(*args, **kwargs):
-        configured = os.getenv('API_KEY')
+        configured = _configured_api_keys()
         if not configured:
             # Kein API-Key konfiguriert -> erlauben
             return func(*args, **kwargs)
 
         provided = _get_api_key_from_request()
-        if not provided or provided != configured:
+        if not provided or provided not in configured:
             return jsonify({'error': 'Unauthorized'}), 401
 
         return func(*args, **kwargs)
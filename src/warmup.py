@@ -0,0 +1,124 @@
+"""Vorladen und Vorwärmen der Worker.
+
+Mit `preload_app` (siehe gunicorn_config.py) lädt der Gunicorn-Master die Anwendung (samt
+pdf2image, PyPDF2 und pytesseract) und über `preload` auch die erst bei Bedarf importierten
+Module (ReportLab samt Schriftmetriken, Pillow-Plugins und Bild-Encoder). Die danach geforkten
+Worker teilen sich diese Python-Objekte copy-on-write und zahlen die Importe nicht beim ersten
+Request, auch nicht nach dem Recycling durch `max_requests`.
+
+Die Tesseract-Modelle werden dagegen nicht geteilt: Engines lassen sich nicht über einen fork
+vererben, jeder Worker lädt seine eigenen (`engine.warm_up` in `start_worker_warm_up`) und
+belegt dafür eigenen Speicher. Der einmalige Tesseract-Lauf im Master sorgt nur dafür, dass die
+Modelldateien im Seiten-Cache des Betriebssystems liegen und die Worker sie nicht von der Platte
+lesen müssen.
+"""
+
+import io
+import logging
+import os
+import resource
+import threading
+import time
+
+import PyPDF2
+import pytesseract
+from PIL import Image
+
+from . import engine
+from .compression import encode_page_image, draw_encoded_image
+from .language import ALL_LANGUAGES
+from .ocr import _get_ocr_executor
+
+logger = logging.getLogger(__name__)
+
+_preloaded = False
+_lock = threading.Lock()
+_state = {'pid': None, 'ready': False, 'seconds': None, 'engines': 0, 'error': None, 'thread': None}
+
+
+def warm_languages():
+    """Sprachauswahlen, für die jeder Worker eine Engine vorlädt (`OCR_WARM_LANGUAGES`, kommagetrennt).
+
+    Standard ist die Auswahl mit allen Sprachen, die Sprach-Probe und unbestimmte Dokumente
+    verwenden; `none` lädt keine Engine vor.
+    """
+    configured = os.getenv('OCR_WARM_LANGUAGES', ALL_LANGUAGES).strip()
+    if configured.lower() == 'none':
+        return []
+    return [lang.strip() for lang in configured.split(',') if lang.strip()]
+
+
+def _prime_tesseract():
+    """Ein kurzer Tesseract-Lauf mit allen Sprachen lädt Programm und Modelle in den Seiten-Cache."""
+    try:
+        pytesseract.image_to_string(Image.new('L', (200, 50), 255), lang=ALL_LANGUAGES)
+        return True
+    except Exception as e:
+        logger.warning(f"Tesseract konnte nicht vorgewärmt werden: {e}")
+        return False
+
+
+def preload():
+    """Lädt die schweren Module und initialisiert Schriften, Encoder und Tesseract-Modelle.
+
+    Gedacht für den Gunicorn-Master vor dem Forken der Worker, ohne `preload_app` läuft es im
+    Worker selbst. Startet keine Threads (die einen fork nicht überleben).
+    """
+    global _preloaded
+    start = time.perf_counter()
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    Image.init()
+    # Eine Seite mit Bildern und Text erzeugen und wieder lesen: initialisiert Schriftmetriken,
+    # G4- und JPEG-Encoder und die PyPDF2-Textextraktion
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    for image in (Image.new('L', (64, 64), 255), Image.linear_gradient('L')):
+        draw_encoded_image(c, encode_page_image(image), 0, 0, width=64, height=64)
+    c.setFont('Helvetica', 10)
+    c.drawString(72, 72, 'pdf2ocr')
+    c.save()
+    PyPDF2.PdfReader(io.BytesIO(buffer.getvalue())).pages[0].extract_text()
+
+    _prime_tesseract()
+    _preloaded = True
+    logger.info(f"Module vorgeladen in {time.perf_counter() - start:.2f}s (PID {os.getpid()})")
+
+
+def _warm_worker():
+    start = time.perf_counter()
+    engines, error = 0, None
+    try:
+        if not _preloaded:
+            preload()
+        engines = engine.warm_up(warm_languages())
+        _get_ocr_executor()
+    except Exception as e:
+        # Vorwärmen ist eine Optimierung: der Worker bedient Requests trotzdem
+        error = str(e)
+        logger.warning(f"Vorwärmen fehlgeschlagen: {e}")
+    seconds = time.perf_counter() - start
+    with _lock:
+        _state.update(ready=True, seconds=round(seconds, 3), engines=engines, error=error)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    logger.info(f"Worker {os.getpid()} bereit nach {seconds:.2f}s ({engines} Engines, max. RSS {rss:.0f} MiB)")
+
+
+def start_worker_warm_up():
+    """Startet das Vorwärmen dieses Prozesses im Hintergrund (einmalig, nach fork erneut)."""
+    with _lock:
+        if _state['pid'] == os.getpid():
+            return _state['thread']
+        thread = threading.Thread(target=_warm_worker, name='warm-up', daemon=True)
+        _state.update(pid=os.getpid(), ready=False, seconds=None, engines=0, error=None, thread=thread)
+    thread.start()
+    return thread
+
+
+def readiness():
+    """Bereitschaft dieses Workers: `ready`, Dauer des Vorwärmens und ggf. Fehler."""
+    with _lock:
+        if _state['pid'] != os.getpid():
+            return {'ready': False, 'seconds': None, 'engines': 0, 'error': None}
+        return {key: _state[key] for key in ('ready', 'seconds', 'engines', 'error')}
@@ -0,0 +1,119 @@
+import io
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from PIL import Image
+
+from src import admission
+from src.api import app
+from src.utils import request_identity
+from benchmarks.corpus import build_corpus
+
+
+def _png(width, height):
+    stream = io.BytesIO()
+    Image.new('L', (width, height), 255).save(stream, 'PNG')
+    stream.seek(0)
+    return stream
+
+
+class TestAdmission(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        for patcher in (mock.patch.object(admission, 'ADMISSION_DIR', self.tmp.name),
+                        mock.patch.object(admission, 'ADMISSION_BUDGET', 100.0),
+                        mock.patch.object(admission, 'ADMISSION_SMALL_COST', 8.0),
+                        mock.patch.object(admission, 'ADMISSION_MAX_LARGE', 2),
+                        mock.patch.object(admission, 'MAX_CONCURRENT_PER_KEY', 2)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_estimate_cost(self):
+        corpus = {d['name']: d for d in build_corpus(quick=True)}
+        with mock.patch.dict(os.environ, {'OCR_DPI': '200'}):
+            scan = admission.estimate_cost(io.BytesIO(corpus['scan-200dpi-1p']['data']), 'scan.pdf')
+            text = admission.estimate_cost(io.BytesIO(corpus['text-1p']['data']), 'text.pdf')
+        self.assertAlmostEqual(scan, 3.87, places=2)  # A4 bei 200 DPI
+        self.assertEqual(text, admission.TEXT_PAGE_COST)
+        self.assertEqual(admission.estimate_cost(_png(2000, 1000), 'foto.png'), 2.0)
+        self.assertEqual(admission.estimate_cost(io.BytesIO(b'kaputt'), 'kaputt.pdf'), 0.0)
+
+    def test_per_key_limit_and_global_budget(self):
+        first = admission.admit('key:a', 60)
+        admission.admit('key:a', 20)
+        with self.assertRaises(admission.AdmissionRejected) as rejected:
+            admission.admit('key:a', 10)
+        self.assertEqual(rejected.exception.status, 429)
+        admission.admit('key:a', 1)  # kleine Requests zählen nicht gegen das Limit des Keys
+
+        with self.assertRaises(admission.AdmissionRejected) as rejected:
+            admission.admit('key:b', 50)
+        self.assertEqual(rejected.exception.status, 503)
+        admission.admit('key:b', 2)  # kleine Requests laufen trotz Auslastung
+
+        admission.release(first)
+        admission.admit('key:b', 50)
+        self.assertEqual(admission.usage()['large'], {'requests': 2, 'cost': 70.0})
+
+    def test_single_shared_key_does_not_limit_small_requests(self):
+        with mock.patch.object(admission, 'MAX_CONCURRENT_PER_KEY', 0):
+            for _ in range(5):
+                admission.admit('key:gemeinsam', 2)
+            admission.admit('key:gemeinsam', 40)
+            admission.admit('key:gemeinsam', 40)
+        self.assertEqual(admission.usage()['small']['requests'], 5)
+        self.assertEqual(admission.usage()['large']['requests'], 2)
+
+    def test_client_address_is_taken_from_the_proxy_header(self):
+        identities = []
+
+        def capture(identity, cost):
+            identities.append(identity)
+            raise admission.AdmissionRejected(429, 'Test')
+
+        with mock.patch.dict(os.environ, {'API_KEY': ''}), mock.patch('src.api.admit', side_effect=capture):
+            app.test_client().post('/api/ocr', data={'file': (_png(10, 10), 'a.png')},
+                                   headers={'X-Forwarded-For': '203.0.113.9'},
+                                   environ_base={'REMOTE_ADDR': '10.0.0.1'})
+        self.assertEqual(identities, ['addr:203.0.113.9'])
+
+    def test_oversized_request_runs_alone_and_dead_workers_are_pruned(self):
+        admission.admit('key:a', 500)
+        conn = admission._connect()
+        conn.execute('UPDATE leases SET pid = 2147483646')  # Worker existiert nicht mehr
+        conn.close()
+        admission.admit('key:b', 500)
+        self.assertEqual(admission.usage()['large']['requests'], 1)
+
+    def test_endpoint_returns_503_with_retry_after(self):
+        for _ in range(2):
+            admission.admit('key:other', 40)
+        corpus = {d['name']: d for d in build_corpus(quick=True)}
+        with mock.patch.object(admission, 'ADMISSION_SMALL_COST', 1.0):
+            response = app.test_client().post('/api/ocr', data={
+                'file': (io.BytesIO(corpus['scan-200dpi-1p']['data']), 'scan.pdf')})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], str(admission.RETRY_AFTER))
+        self.assertEqual(admission.usage()['large']['requests'], 2)
+
+    def test_database_errors_admit_without_lease(self):
+        with mock.patch.object(admission, '_connect', side_effect=sqlite3.OperationalError('database is locked')):
+            self.assertIsNone(admission.admit('key:a', 500))
+            admission.release('lease')  # nur geloggt
+
+    def test_identity_ignores_key_header_when_no_keys_are_configured(self):
+        headers = {'X-API-Key': 'ausgedacht'}
+        with mock.patch.dict(os.environ, {'API_KEY': ''}), \
+                app.test_request_context(headers=headers, environ_base={'REMOTE_ADDR': '10.0.0.7'}):
+            self.assertEqual(request_identity(), 'addr:10.0.0.7')
+        with mock.patch.dict(os.environ, {'API_KEY': 'key-a,ausgedacht'}), app.test_request_context(headers=headers):
+            self.assertTrue(request_identity().startswith('key:'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+import base64
+import io
+import json
+import os
+import tempfile
+import threading
+import unittest
+import zipfile
+from pathlib import Path
+from unittest import mock
+
+from PIL import Image
+
+from src import admission, batch
+from src.api import app
+
+
+def _fake_process_file(file_stream, filename, details=None, **options):
+    """Text für Bilder, PDF-Datei für PDFs; `kaputt.*` schlägt fehl."""
+    content = file_stream.read()
+    if filename.startswith('kaputt'):
+        raise RuntimeError('Datei beschädigt')
+    details['language'] = 'deu'
+    if filename.endswith('.pdf'):
+        fd, path = tempfile.mkstemp(prefix='pdf2ocr-', suffix='_with_text.pdf')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(b'%PDF-' + content)
+        return Path(path)
+    return f"Text aus {filename}"
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(batch, 'process_file', side_effect=_fake_process_file)
+        self.process_file = patcher.start()
+        self.addCleanup(patcher.stop)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch.object(admission, 'ADMISSION_DIR', tmp.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = app.test_client()
+
+    def _post(self, files, **form):
+        data = dict(form)
+        data['files'] = [(io.BytesIO(content), name) for name, content in files]
+        return self.client.post('/api/ocr/batch', data=data, content_type='multipart/form-data')
+
+    def test_ndjson_isolates_errors_per_file(self):
+        response = self._post([('a.png', b'1'), ('kaputt.png', b'2'), ('b.pdf', b'3'), ('notiz.doc', b'4')])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+
+        lines = [json.loads(line) for line in response.data.decode().splitlines()]
+        results = {line['index']: line for line in lines}
+        self.assertEqual(sorted(results), [0, 1, 2, 3])
+        self.assertEqual((results[0]['status'], results[0]['text']), ('ok', 'Text aus a.png'))
+        self.assertEqual((results[1]['status'], results[1]['error']), ('error', 'Datei beschädigt'))
+        self.assertEqual(base64.b64decode(results[2]['pdf_base64']), b'%PDF-3')
+        self.assertEqual(results[2]['language'], 'deu')
+        self.assertEqual(results[3]['status'], 'error')
+        self.assertEqual(self.process_file.call_count, 3)  # nicht unterstützte Datei wird nicht verarbeitet
+        response.close()
+        self.assertEqual(admission.usage()['small']['requests'], 0)  # Lease nach der Antwort freigegeben
+
+    def test_zip_upload_and_zip_output(self):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as z:
+            z.writestr('scans/a.pdf', b'1')
+            z.writestr('scans/b.jpg', b'2')
+            z.writestr('__MACOSX/scans/._a.pdf', b'x')
+        response = self._post([('stapel.zip', archive.getvalue())], output='zip')
+        self.assertEqual(response.status_code, 200)
+
+        with zipfile.ZipFile(io.BytesIO(response.data)) as result:
+            manifest = json.loads(result.read('results.json'))
+            self.assertEqual(len(manifest), 2)
+            outputs = {item['filename']: item['output'] for item in manifest}
+            self.assertEqual(result.read(outputs['scans/a.pdf']), b'%PDF-1')
+            self.assertEqual(result.read(outputs['scans/b.jpg']), b'Text aus scans/b.jpg')
+        response.close()
+
+    def test_files_are_processed_concurrently(self):
+        barrier = threading.Barrier(2, timeout=5)
+
+        def waiting_process_file(file_stream, filename, details=None, **options):
+            barrier.wait()  # kommt nur weiter, wenn beide Dateien gleichzeitig laufen
+            return filename
+
+        self.process_file.side_effect = waiting_process_file
+        with mock.patch.dict(os.environ, {'OCR_BATCH_WORKERS': '2'}), \
+                mock.patch.object(batch, '_batch_executor', None):
+            response = self._post([('a.png', b'1'), ('b.png', b'2')])
+            lines = [json.loads(line) for line in response.data.decode().splitlines()]
+            response.close()
+        self.assertEqual({line['status'] for line in lines}, {'ok'})
+
+    def test_disconnect_discards_results_of_unread_files(self):
+        started, finish = threading.Event(), threading.Event()
+        paths = []
+
+        def slow_process_file(file_stream, filename, details=None, **options):
+            if filename == 'b.pdf':
+                started.set()
+                finish.wait(5)
+            result = _fake_process_file(file_stream, filename, details)
+            paths.append(result)
+            return result
+
+        self.process_file.side_effect = slow_process_file
+        work_dir = batch.new_work_dir()
+        entries = []
+        for name in ('a.pdf', 'b.pdf'):
+            entries.append((name, os.path.join(work_dir, name)))
+            Path(entries[-1][1]).write_bytes(b'1')
+        with mock.patch.dict(os.environ, {'OCR_BATCH_WORKERS': '2'}), \
+                mock.patch.object(batch, '_batch_executor', None):
+            stream = batch.stream_batch(entries, work_dir)
+            first = next(stream)  # a.pdf, b.pdf läuft noch
+            self.assertTrue(started.wait(5))
+            stream.close()  # Client trennt die Verbindung
+            finish.set()
+            batch._get_batch_executor().shutdown(wait=True)
+
+        self.assertIn('pdf_base64', first)
+        self.assertEqual(len(paths), 2)
+        self.assertFalse(any(path.exists() for path in paths))
+        self.assertFalse(os.path.exists(work_dir))
+
+    def test_pdf_results_are_base64_encoded_in_chunks(self):
+        fd, path = tempfile.mkstemp(suffix='.pdf')
+        content = os.urandom(100)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        with mock.patch.object(batch, '_BASE64_CHUNK', 30):
+            chunks = list(batch.ndjson_lines([{'index': 0, 'filename': 'a.pdf', 'status': 'ok', 'result_path': path}]))
+        self.assertGreater(len(chunks), 4)
+        line = json.loads(''.join(chunks))
+        self.assertEqual(base64.b64decode(line['pdf_base64']), content)
+        self.assertFalse(os.path.exists(path))
+
+    def test_batch_is_charged_against_the_admission_budget(self):
+        with mock.patch.object(admission, 'ADMISSION_BUDGET', 1.0), \
+                mock.patch.object(admission, 'ADMISSION_SMALL_COST', 0.5), \
+                mock.patch.object(admission, 'ADMISSION_MAX_LARGE', 1), \
+                mock.patch('src.api.new_work_dir', return_value=tempfile.mkdtemp()) as work_dir:
+            running = admission.admit('addr:andere', 5.0)
+            image = io.BytesIO()
+            Image.new('L', (1000, 1000), 255).save(image, 'PNG')
+            response = self._post([('a.png', image.getvalue()), ('b.png', image.getvalue())])
+            admission.release(running)
+
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response.headers)
+        self.assertFalse(os.path.exists(work_dir.return_value))
+        self.process_file.assert_not_called()
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.post('/api/ocr/batch', data={}).status_code, 400)
+        self.assertEqual(self._post([('a.png', b'1')], output='xml').status_code, 400)
+        self.assertEqual(self._post([('stapel.zip', b'kein zip')]).status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
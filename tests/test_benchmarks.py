@@ -0,0 +1,31 @@
+import unittest
+
+from benchmarks import suite
+from benchmarks.corpus import build_corpus
+
+
+def _report(seconds, accuracy, rss=100.0):
+    return {'results': [{'document': 'scan-200dpi-1p', 'function': 'process_file', 'seconds': seconds,
+                         'accuracy': accuracy, 'peak_rss_mb': rss}]}
+
+
+class TestBenchmarkSuite(unittest.TestCase):
+
+    def test_corpus_is_deterministic(self):
+        first, second = build_corpus(quick=True), build_corpus(quick=True)
+        self.assertEqual([d['name'] for d in first], ['text-1p', 'scan-200dpi-1p', 'noisy-png', 'shadow-jpg'])
+        self.assertEqual([d['data'] for d in first], [d['data'] for d in second])
+
+    def test_compare_flags_regressions(self):
+        baseline = _report(2.0, 0.95)
+        self.assertEqual(suite.compare(baseline, _report(2.2, 0.94)), [])
+        regressions = suite.compare(baseline, _report(3.0, 0.80, rss=200.0))
+        self.assertEqual(len(regressions), 3)
+        self.assertEqual(suite.compare(_report(0.01, 1.0), _report(0.03, 1.0)), [])  # Messrauschen
+
+    def test_accuracy_ignores_page_markers_and_whitespace(self):
+        self.assertEqual(suite.char_accuracy('Rechnung Nr. 4711', '--- Seite 1 ---\nRechnung  Nr.\n4711'), 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
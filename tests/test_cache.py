@@ -0,0 +1,128 @@
+import io
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from PIL import Image
+
+from src import cache, ocr
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(cache, 'CACHE_DIR', self.tmp.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+
+    def _pdf(self, content):
+        """Legt eine Ergebnis-PDF als Datei an, wie sie `extract_text_from_pdf` liefert."""
+        path = Path(tempfile.mkstemp(dir=self.tmp.name, suffix='.pdf')[1])
+        path.write_bytes(content)
+        return path
+
+    def test_key_depends_on_content_and_params(self):
+        stream = io.BytesIO(b'dokument')
+        key = cache.cache_key(stream, {'dpi': 200})
+        self.assertEqual(stream.tell(), 0)
+        self.assertEqual(key, cache.cache_key(io.BytesIO(b'dokument'), {'dpi': 200}))
+        self.assertNotEqual(key, cache.cache_key(io.BytesIO(b'dokument'), {'dpi': 300}))
+        self.assertNotEqual(key, cache.cache_key(io.BytesIO(b'anderes'), {'dpi': 200}))
+
+    def test_store_and_get_pdf_and_text(self):
+        self.assertIsNone(cache.get_cached_result('a' * 64))
+        cache.store_result('a' * 64, self._pdf(b'%PDF-1.4'))
+        cache.store_result('b' * 64, 'Text mit Umlauten: äöü')
+
+        cached = cache.get_cached_result('a' * 64)
+        self.assertIsInstance(cached, Path)
+        self.assertEqual(cached.read_bytes(), b'%PDF-1.4')
+        cached.unlink()
+        self.assertEqual(cache.get_cached_result('b' * 64), 'Text mit Umlauten: äöü')
+        stats = cache.cache_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (2, 1, 2))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        with mock.patch.object(cache, 'CACHE_MAX_BYTES', 25):
+            cache.store_result('a' * 64, self._pdf(b'x' * 10))
+            cache.store_result('b' * 64, self._pdf(b'y' * 10))
+            cache.get_cached_result('a' * 64)  # a ist jetzt zuletzt genutzt
+            cache.store_result('c' * 64, self._pdf(b'z' * 10))
+
+        self.assertIsNotNone(cache.get_cached_result('a' * 64))
+        self.assertIsNone(cache.get_cached_result('b' * 64))
+        self.assertIsNotNone(cache.get_cached_result('c' * 64))
+        self.assertEqual(cache.cache_stats()['evictions'], 1)
+
+    def test_process_file_uses_cache_for_repeated_uploads(self):
+        with mock.patch.object(ocr, 'extract_text_from_pdf', return_value=self._pdf(b'%PDF-ergebnis')) as extract:
+            first = ocr.process_file(io.BytesIO(b'%PDF-scan'), 'scan.pdf')
+            second = ocr.process_file(io.BytesIO(b'%PDF-scan'), 'kopie.pdf')
+
+        self.assertNotEqual(first, second)  # jeder Aufrufer erhält eine eigene Datei
+        self.assertEqual(first.read_bytes(), second.read_bytes())
+        second.unlink()
+        self.assertEqual(extract.call_count, 1)
+
+    def test_entry_evicted_during_lookup_is_a_miss(self):
+        cache.store_result('a' * 64, self._pdf(b'%PDF-1.4'))
+        with mock.patch.object(cache, '_link_or_copy', side_effect=FileNotFoundError('verdrängt')):
+            self.assertIsNone(cache.get_cached_result('a' * 64))
+        stats = cache.cache_stats()
+        self.assertEqual((stats['entries'], stats['misses']), (0, 1))
+
+    def test_unusable_cache_dir_does_not_fail_the_request(self):
+        blocker = Path(self.tmp.name) / 'keine-verzeichnis'
+        blocker.write_bytes(b'')
+        with mock.patch.object(cache, 'CACHE_DIR', str(blocker / 'cache')), \
+                mock.patch.object(ocr, 'extract_text_from_pdf', return_value='Text') as extract:
+            self.assertEqual(ocr.process_file(io.BytesIO(b'%PDF-scan'), 'scan.pdf'), 'Text')
+        self.assertEqual(extract.call_count, 1)
+
+    def test_result_with_failed_page_is_not_cached(self):
+        frames = [Image.new('L', (20, 20), 255), Image.new('L', (20, 20), 0)]
+        stream = io.BytesIO()
+        frames[0].save(stream, 'TIFF', save_all=True, append_images=frames[1:])
+
+        def flaky_ocr_page(image, initial_text="", lang=None):
+            if image.getpixel((0, 0)) == 0:
+                raise RuntimeError('tesseract abgestürzt')
+            page_result = ocr._empty_page_result(image)
+            page_result['text'] = 'Seite eins'
+            return page_result
+
+        details = {}
+        with mock.patch.dict(os.environ, {'OCR_WORKERS': '1', 'OCR_LANGUAGE_PROBE': '0'}), \
+                mock.patch.object(ocr, 'ocr_page', side_effect=flaky_ocr_page) as ocr_page:
+            self.assertIn('Seite eins', ocr.process_file(io.BytesIO(stream.getvalue()), 'fax.tif', details=details))
+            ocr.process_file(io.BytesIO(stream.getvalue()), 'fax.tif')
+
+        self.assertEqual(details['page_errors'], [2])
+        self.assertEqual(cache.cache_stats()['entries'], 0)
+        self.assertEqual(ocr_page.call_count, 3)  # Seite 1 aus dem Seiten-Cache, Seite 2 erneut versucht
+
+    def test_only_new_pages_are_recognized(self):
+        first = [Image.new('L', (20, 20), 255), Image.new('L', (20, 20), 0)]
+        second = [first[0], first[1], Image.new('L', (20, 20), 128)]  # angehängte Seite
+
+        def fake_ocr_page(image, initial_text="", lang=None):
+            page_result = ocr._empty_page_result(image)
+            page_result['text'] = f'farbe {image.getpixel((0, 0))}'
+            return page_result
+
+        with mock.patch.dict(os.environ, {'OCR_WORKERS': '1'}), \
+                mock.patch.object(ocr, 'ocr_page', side_effect=fake_ocr_page) as ocr_page:
+            ocr.ocr_pages(first)
+            results = ocr.ocr_pages(second)
+
+        self.assertEqual(ocr_page.call_count, 3)
+        self.assertEqual([r['text'] for r in results], ['farbe 255', 'farbe 0', 'farbe 128'])
+        self.assertEqual(cache.cache_stats()['pages']['hits'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import io
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+import PyPDF2
+from PIL import Image, ImageDraw
+from reportlab.pdfgen import canvas
+
+from src import compression, ocr
+from benchmarks.corpus import render_page_image, page_lines
+
+
+def _text_page(dpi=200):
+    return render_page_image(page_lines(random.Random(1), 'deu'), dpi)
+
+
+class TestCompression(unittest.TestCase):
+
+    def test_pages_are_classified_by_content(self):
+        page = _text_page()
+        self.assertEqual(compression.classify_image(page, 'balanced'), 'bilevel')
+        # Kantenglättung der Schrift ist kein reines Schwarz-Weiß: `quality` bleibt bei Graustufen
+        self.assertEqual(compression.classify_image(page, 'quality'), 'gray')
+        self.assertEqual(compression.classify_image(Image.linear_gradient('L').convert('RGB')), 'gray')
+
+        color = page.convert('RGB')
+        ImageDraw.Draw(color).rectangle((100, 100, 400, 300), fill=(200, 30, 30))
+        self.assertEqual(compression.classify_image(color), 'color')
+
+    def test_color_pages_are_downsampled_for_size(self):
+        image = Image.new('RGB', (2480, 3508), (250, 240, 200))
+        ImageDraw.Draw(image).rectangle((200, 200, 1200, 900), fill=(20, 90, 200))
+        small = compression.encode_page_image(image, 'size', dpi=300)
+        full = compression.encode_page_image(image, 'quality', dpi=300)
+        self.assertEqual((small['encoding'], small['width']), ('color', 1240))
+        self.assertEqual(full['width'], 2480)
+        self.assertLess(len(small['data']), len(full['data']))
+
+    def test_searchable_pdf_embeds_bilevel_pages_as_g4(self):
+        page = _text_page()
+        jpeg = io.BytesIO()
+        page.convert('RGB').save(jpeg, 'JPEG', quality=95)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            output_path = os.path.join(tmp, 'out.pdf')
+            with mock.patch.dict(os.environ, {'OCR_COMPRESSION': 'balanced'}):
+                self.assertTrue(ocr._write_searchable_pdf([(page, None)], output_path))
+            self.assertLess(os.path.getsize(output_path), len(jpeg.getvalue()) / 5)
+            # Prüft auch die Einbettung über ReportLab-Interna (siehe `compression._register_xobject`)
+            reader = PyPDF2.PdfReader(output_path)
+            (name, xobject), = reader.pages[0]['/Resources']['/XObject'].items()
+            xobject = xobject.get_object()
+            self.assertEqual(xobject['/Filter'], ['/CCITTFaxDecode'])
+            self.assertEqual(xobject['/BitsPerComponent'], 1)
+            self.assertEqual(xobject['/DecodeParms'][0]['/Columns'], page.size[0])
+            self.assertEqual(xobject['/DecodeParms'][0]['/K'], -1)
+            self.assertIn(f'{name} Do'.encode(), reader.pages[0].get_contents().get_data())
+
+    def test_gray_and_color_pages_keep_their_jpeg_data(self):
+        color = Image.new('RGB', (600, 800), (250, 240, 200))
+        ImageDraw.Draw(color).rectangle((50, 50, 400, 300), fill=(20, 90, 200))
+        gray = Image.linear_gradient('L').resize((600, 800)).convert('RGB')
+        encoded = [compression.encode_page_image(image, dpi=72) for image in (color, gray)]
+        self.assertEqual([e['encoding'] for e in encoded], ['color', 'gray'])
+
+        buffer = io.BytesIO()
+        c = canvas.Canvas(buffer, pageCompression=0)
+        for e in encoded:
+            compression.draw_encoded_image(c, e, 0, 0, 595, 842)
+            c.showPage()
+        c.save()
+        reader = PyPDF2.PdfReader(io.BytesIO(buffer.getvalue()))
+        for page, e in zip(reader.pages, encoded):
+            (_, xobject), = page['/Resources']['/XObject'].items()
+            xobject = xobject.get_object()
+            self.assertIn('/DCTDecode', xobject['/Filter'])
+            # PyPDF2 entfernt nur die ASCII85-Hülle, DCTDecode bleibt: das sind die JPEG-Bytes
+            self.assertEqual(xobject.get_data(), e['data'])
+
+    def test_reportlab_internals_used_for_g4_still_exist(self):
+        c = canvas.Canvas(io.BytesIO())
+        missing = [attr for attr in ('_doc', '_setXObjects', '_currentPageHasImages') if not hasattr(c, attr)]
+        missing += [f'_doc.{attr}' for attr in ('getXObjectName', 'idToObject', 'Reference', 'addForm')
+                    if not hasattr(getattr(c, '_doc', None), attr)]
+        self.assertEqual(missing, [], 'ReportLab-Interna für compression._register_xobject fehlen; '
+                                      'G4-Einbettung an die neue ReportLab-Version anpassen')
+
+    def test_preset_is_part_of_the_cache_key_for_rebuilt_pages(self):
+        self.assertEqual(ocr._cache_params('pdf', 'rebuild', compression='size')['compression'], 'size')
+        self.assertNotIn('compression', ocr._cache_params('pdf', 'overlay', compression='size'))
+        self.assertNotIn('compression', ocr._cache_params('png', 'rebuild', 'text'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+import os
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from PIL import Image
+
+from src import engine
+
+BLOCK, PARA, TEXTLINE, WORD = range(4)
+
+
+class FakeResult:
+    def __init__(self, text, box, starts):
+        self.text, self.box, self.starts = text, box, starts
+
+    def IsAtBeginningOf(self, level):
+        return level in self.starts
+
+    def BoundingBox(self, level):
+        return self.box
+
+    def GetUTF8Text(self, level):
+        return self.text
+
+    def Confidence(self, level):
+        return 95.0
+
+
+# Zwei Wörter in einer Zeile, ein Wort in einem neuen Block
+RESULTS = [
+    FakeResult('Rechnung', (10, 10, 90, 30), {BLOCK, PARA, TEXTLINE}),
+    FakeResult('Nr.', (100, 10, 130, 30), set()),
+    FakeResult('Total', (10, 90, 60, 110), {BLOCK, PARA, TEXTLINE}),
+]
+
+
+class FakeAPI:
+    instances = []
+
+    def __init__(self, lang, psm):
+        self.lang, self.psm = lang, psm
+        self.variables, self.ended = {}, False
+        FakeAPI.instances.append(self)
+
+    def SetVariable(self, name, value):
+        self.variables[name] = value
+
+    def SetImage(self, image):
+        if image.size == (1, 1):
+            raise RuntimeError('kaputt')
+
+    def Recognize(self):
+        pass
+
+    def GetIterator(self):
+        return iter(RESULTS)
+
+    def GetUTF8Text(self):
+        return 'Rechnung Nr.\n\nTotal\n'
+
+    def Clear(self):
+        pass
+
+    def End(self):
+        self.ended = True
+
+
+FAKE_TESSEROCR = SimpleNamespace(
+    PyTessBaseAPI=FakeAPI,
+    RIL=SimpleNamespace(BLOCK=BLOCK, PARA=PARA, TEXTLINE=TEXTLINE, WORD=WORD),
+    iterate_level=lambda iterator, level: iterator,
+)
+
+
+class TestEnginePool(unittest.TestCase):
+
+    def setUp(self):
+        FakeAPI.instances = []
+        for patcher in (mock.patch.object(engine, 'tesserocr', FAKE_TESSEROCR),
+                        mock.patch.object(engine, '_pools', {}),
+                        mock.patch.object(engine, '_pools_pid', None),
+                        mock.patch.dict(os.environ, {'OCR_ENGINE': 'auto'})):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.image = Image.new('L', (200, 150), 255)
+
+    def test_engines_are_reused_per_language_set(self):
+        for _ in range(3):
+            engine.image_to_data(self.image, 'deu')
+        engine.image_to_string(self.image, 'deu+eng')
+        engine.image_to_data(self.image, 'deu', config='--psm 6 -c preserve_interword_spaces=1')
+
+        self.assertEqual([(api.lang, api.psm) for api in FakeAPI.instances], [('deu', 3), ('deu+eng', 3), ('deu', 6)])
+        self.assertEqual(FakeAPI.instances[2].variables, {'preserve_interword_spaces': '1'})
+
+    def test_concurrent_calls_use_separate_engines(self):
+        barrier = threading.Barrier(2)
+        original = FakeAPI.Recognize
+
+        def slow_recognize(api):
+            barrier.wait(timeout=5)
+            original(api)
+
+        with mock.patch.object(FakeAPI, 'Recognize', slow_recognize):
+            threads = [threading.Thread(target=engine.image_to_data, args=(self.image, 'deu')) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(FakeAPI.instances), 2)
+        engine.image_to_data(self.image, 'deu')
+        self.assertEqual(len(FakeAPI.instances), 2)
+
+    def test_failed_engine_is_discarded(self):
+        with self.assertRaises(RuntimeError):
+            engine.image_to_data(Image.new('L', (1, 1)), 'deu')
+        self.assertTrue(FakeAPI.instances[0].ended)
+        engine.image_to_data(self.image, 'deu')
+        self.assertEqual(len(FakeAPI.instances), 2)
+
+    def test_pool_is_rebuilt_after_fork(self):
+        engine.warm_up(['deu'])
+        with mock.patch.object(engine.os, 'getpid', return_value=-1):
+            engine.image_to_data(self.image, 'deu')
+        self.assertEqual(len(FakeAPI.instances), 2)
+
+    def test_output_matches_image_to_data_format(self):
+        data = engine.image_to_data(self.image, 'deu')
+        self.assertEqual(data['text'], ['Rechnung', 'Nr.', 'Total'])
+        self.assertEqual(list(zip(data['block_num'], data['par_num'], data['line_num'])), [(1, 1, 1), (1, 1, 1), (2, 1, 1)])
+        self.assertEqual((data['left'][1], data['top'][1], data['width'][1], data['height'][1]), (100, 10, 30, 20))
+
+    def test_pytesseract_fallback(self):
+        with mock.patch.dict(os.environ, {'OCR_ENGINE': 'pytesseract'}), \
+                mock.patch('pytesseract.image_to_data', return_value={'text': []}) as image_to_data:
+            engine.image_to_data(self.image, 'deu', config='--psm 6')
+        self.assertEqual(image_to_data.call_args[1]['config'], '--psm 6')
+        self.assertEqual(FakeAPI.instances, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import io
+import json
+import os
+import unittest
+import xml.etree.ElementTree as ET
+from unittest import mock
+
+from PIL import Image, ImageDraw
+
+from src import formats
+from src.api import app
+
+
+def _word(text, block, par, line, left, top, conf=90.0):
+    return {'text': text, 'left': left, 'top': top, 'width': 40, 'height': 20, 'conf': conf,
+            'block': block, 'par': par, 'line': line}
+
+
+PAGE = {
+    'text': 'Rechnung <Nr.>\nTotal\n\nZahlbar',
+    'words': [
+        _word('Rechnung', 1, 1, 1, 10, 10),
+        _word('<Nr.>', 1, 1, 1, 60, 10, conf=-1.0),
+        _word('Total', 1, 1, 2, 10, 40),
+        _word('Zahlbar', 2, 1, 1, 10, 90, conf=50.0),
+    ],
+    'width': 200, 'height': 150, 'lang': 'deu', 'source': 'ocr', 'dpi': 300,
+}
+
+EMBEDDED = {'text': 'Digitales Deckblatt\nSeite zwei', 'words': [], 'width': 595.0, 'height': 842.0,
+            'lang': None, 'source': 'embedded', 'dpi': 72}
+
+
+class TestFormats(unittest.TestCase):
+
+    def test_json_contains_lines_words_boxes_and_confidences(self):
+        document = json.loads(''.join(formats.iter_json([(0, PAGE), (1, EMBEDDED)], {'language': 'deu'})))
+
+        self.assertEqual(document['language'], 'deu')
+        page = document['pages'][0]
+        self.assertEqual((page['page'], page['dpi'], page['source']), (1, 300, 'ocr'))
+        self.assertEqual(len(page['paragraphs']), 2)
+        line = page['paragraphs'][0]['lines'][0]
+        self.assertEqual(line['text'], 'Rechnung <Nr.>')
+        self.assertEqual(line['bbox'], [10, 10, 100, 30])
+        self.assertEqual(line['confidence'], 90.0)  # Wörter ohne Konfidenz zählen nicht
+        self.assertEqual([w['confidence'] for w in line['words']], [90.0, None])
+
+        embedded = document['pages'][1]
+        self.assertEqual(embedded['source'], 'embedded')
+        self.assertEqual([l['text'] for l in embedded['paragraphs'][0]['lines']], ['Digitales Deckblatt', 'Seite zwei'])
+
+    def test_hocr_is_wellformed_with_word_confidences(self):
+        root = ET.fromstring(''.join(formats.iter_hocr([(0, PAGE)])).encode())
+        ns = {'h': 'http://www.w3.org/1999/xhtml'}
+        page = root.find('.//h:div', ns)
+        self.assertEqual(page.get('title'), 'bbox 0 0 200 150; ppageno 0; scan_res 300 300')
+        words = root.findall(".//h:span[@class='ocrx_word']", ns)
+        self.assertEqual([w.text for w in words], ['Rechnung', '<Nr.>', 'Total', 'Zahlbar'])
+        self.assertEqual(words[0].get('title'), 'bbox 10 10 50 30; x_wconf 90')
+        self.assertEqual(len(root.findall(".//h:span[@class='ocr_line']", ns)), 3)
+
+    def test_alto_is_wellformed_with_word_confidences(self):
+        root = ET.fromstring(''.join(formats.iter_alto([(0, PAGE), (1, EMBEDDED)])).encode())
+        ns = {'a': 'http://www.loc.gov/standards/alto/ns-v4#'}
+        pages = root.findall('.//a:Page', ns)
+        self.assertEqual(len(pages), 2)
+        strings = pages[0].findall('.//a:String', ns)
+        self.assertEqual([s.get('CONTENT') for s in strings], ['Rechnung', '<Nr.>', 'Total', 'Zahlbar'])
+        self.assertEqual((strings[0].get('HPOS'), strings[0].get('WIDTH'), strings[0].get('WC')), ('10', '40', '0.90'))
+        self.assertIsNone(strings[1].get('WC'))
+        self.assertEqual(pages[0].find('.//a:TextBlock', ns).get('LANG'), 'deu')
+        self.assertEqual(len(pages[1].findall('.//a:TextLine', ns)), 2)
+
+
+class TestFormatEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ, {'OCR_CACHE_ENABLED': '0', 'OCR_ENGINE': 'pytesseract',
+                                               'OCR_PREPROCESS': 'none', 'OCR_LANGUAGE_PROBE': '0'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = app.test_client()
+
+    def _image_upload(self):
+        image = Image.new('RGB', (200, 150), 'white')
+        ImageDraw.Draw(image).rectangle((10, 10, 150, 22), fill='black')
+        stream = io.BytesIO()
+        image.save(stream, 'PNG')
+        stream.seek(0)
+        return stream
+
+    def test_image_is_returned_as_json_from_single_ocr_pass(self):
+        data = {key: [value] for key, value in (
+            ('level', 5), ('text', 'Rechnung'), ('left', 10), ('top', 10), ('width', 140), ('height', 12),
+            ('conf', '88'), ('block_num', 1), ('par_num', 1), ('line_num', 1))}
+        with mock.patch('pytesseract.image_to_data', return_value=data) as image_to_data:
+            response = self.client.post('/api/ocr', data={'file': (self._image_upload(), 'scan.png'), 'format': 'json'})
+            document = json.loads(response.data)
+
+        self.assertEqual(response.mimetype, 'application/json')
+        self.assertEqual(image_to_data.call_count, 1)
+        word = document['pages'][0]['paragraphs'][0]['lines'][0]['words'][0]
+        self.assertEqual((word['text'], word['bbox'], word['confidence']), ('Rechnung', [10, 10, 150, 22], 88.0))
+
+    def test_corrupt_upload_is_rejected_before_streaming(self):
+        response = self.client.post('/api/ocr', data={'file': (io.BytesIO(b'kein PDF'), 'scan.pdf'), 'format': 'json'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Invalid PDF file', response.get_json()['error'])
+
+    def test_absurd_page_range_is_a_bad_request(self):
+        response = self.client.post('/api/ocr', data={'file': (self._image_upload(), 'scan.png'), 'format': 'json',
+                                                      'pages': '1-2000000000'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_format_is_rejected(self):
+        response = self.client.post('/api/ocr', data={'file': (self._image_upload(), 'scan.png'), 'format': 'docx'})
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
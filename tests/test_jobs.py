@@ -0,0 +1,129 @@
+import io
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from src import jobs
+from src.api import app
+
+
+class TestJobs(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(jobs, 'JOBS_DIR', self.tmp.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+        self.client = app.test_client()
+
+    def _run_next_job(self, result):
+        def fake_process_file(file_stream, filename, progress=None, details=None):
+            details['language'] = 'deu'
+            progress(1, 2)
+            progress(2, 2)
+            return result
+
+        with mock.patch.object(jobs, 'process_file', side_effect=fake_process_file):
+            job = jobs.claim_next_job()
+            self.assertIsNotNone(job)
+            jobs.run_job(job)
+        return job['id']
+
+    def test_submit_poll_and_fetch_pdf(self):
+        response = self.client.post('/api/jobs', data={'file': (io.BytesIO(b'%PDF-1.4'), 'scan.pdf')})
+        self.assertEqual(response.status_code, 202)
+        job_id = response.get_json()['job_id']
+
+        status = self.client.get(f'/api/jobs/{job_id}').get_json()
+        self.assertEqual(status['status'], 'queued')
+        self.assertEqual(self.client.get(f'/api/jobs/{job_id}/result').status_code, 409)
+
+        result_path = Path(self.tmp.name) / 'ergebnis.pdf'
+        result_path.write_bytes(b'%PDF-result')
+        self.assertEqual(self._run_next_job(result_path), job_id)
+        self.assertFalse(result_path.exists())  # in das Job-Verzeichnis verschoben
+
+        status = self.client.get(f'/api/jobs/{job_id}').get_json()
+        self.assertEqual((status['status'], status['pages_done'], status['pages_total']), ('done', 2, 2))
+        result = self.client.get(f'/api/jobs/{job_id}/result')
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(result.mimetype, 'application/pdf')
+        self.assertEqual(result.headers['X-OCR-Language'], 'deu')
+        self.assertEqual(result.data, b'%PDF-result')
+        result.close()
+
+    def test_text_result_and_unknown_job(self):
+        job_id = jobs.submit_job(io.BytesIO(b'img'), 'bild.png')
+        self._run_next_job('Erkannter Text')
+
+        self.assertEqual(self.client.get(f'/api/jobs/{job_id}/result').get_json(), {'text': 'Erkannter Text', 'language': 'deu'})
+        self.assertEqual(self.client.get('/api/jobs/unbekannt').status_code, 404)
+
+    def test_stale_running_job_is_requeued(self):
+        job_id = jobs.submit_job(io.BytesIO(b'img'), 'bild.png')
+        self.assertEqual(jobs.claim_next_job()['id'], job_id)
+        self.assertIsNone(jobs.claim_next_job())
+
+        with mock.patch.object(jobs.time, 'time', return_value=time.time() + jobs.JOB_STALE_SECONDS + 1):
+            self.assertEqual(jobs.claim_next_job()['id'], job_id)
+
+    def test_web_workers_start_no_job_threads_by_default(self):
+        with mock.patch.dict(os.environ, {}, clear=False), mock.patch.object(jobs, '_workers_pid', None), \
+                mock.patch.object(jobs, '_workers', []), mock.patch.object(jobs.threading, 'Thread') as thread:
+            os.environ.pop('JOB_WORKERS', None)
+            self.assertEqual(jobs.start_job_workers(), 0)
+            self.client.post('/api/jobs', data={'file': (io.BytesIO(b'%PDF-1.4'), 'scan.pdf')})
+        thread.assert_not_called()
+
+    def test_job_process_picks_up_queued_jobs_and_stops_on_sigterm(self):
+        job_id = jobs.submit_job(io.BytesIO(b'kein Bild'), 'notiz.doc')  # vor dem Start eingereiht
+        env = dict(os.environ, JOBS_DIR=self.tmp.name, JOB_POLL_INTERVAL='0.1')
+        process = subprocess.Popen([sys.executable, '-m', 'src.jobs'], env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            deadline = time.time() + 20
+            while jobs.get_job(job_id)['status'] != 'done' and time.time() < deadline:
+                time.sleep(0.1)
+            self.assertEqual(jobs.get_job(job_id)['status'], 'done')
+            process.send_signal(signal.SIGTERM)
+            self.assertEqual(process.wait(10), 0)
+        finally:
+            if process.poll() is None:
+                process.kill()
+
+    def test_slow_job_keeps_its_claim_and_replaced_worker_cannot_finish(self):
+        job_id = jobs.submit_job(io.BytesIO(b'img'), 'bild.png')
+        first = jobs.claim_next_job()
+        conn = jobs._connect()
+        # Eine Seite dauert länger als JOB_STALE_SECONDS, der Heartbeat läuft aber weiter
+        conn.execute('UPDATE jobs SET updated_at = 0')
+        self.assertIsNone(jobs.claim_next_job())
+
+        # Heartbeat bleibt aus: der Job wird neu vergeben
+        conn.execute('UPDATE jobs SET heartbeat_at = 0')
+        conn.close()
+        second = jobs.claim_next_job()
+        self.assertEqual(second['id'], job_id)
+        self.assertNotEqual(second['claim_id'], first['claim_id'])
+
+        with mock.patch.object(jobs, 'process_file', return_value='alt'):
+            jobs.run_job(first)
+        job = jobs.get_job(job_id)
+        self.assertEqual(job['status'], 'running')
+        self.assertTrue(Path(job['input_path']).exists())  # Upload gehört dem neuen Worker
+
+        with mock.patch.object(jobs, 'process_file', return_value='neu'):
+            jobs.run_job(second)
+        self.assertEqual(self.client.get(f'/api/jobs/{job_id}/result').get_json()['text'], 'neu')
+        self.assertFalse(Path(job['input_path']).exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
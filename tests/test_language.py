@@ -0,0 +1,51 @@
+import os
+import unittest
+from unittest import mock
+
+from PIL import Image
+
+from src import language
+
+
+class TestLanguageDetection(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ, {'OCR_ENGINE': 'pytesseract'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_monolingual_text_uses_single_model(self):
+        self.assertEqual(language.detect_language_from_text(
+            'Die Rechnung ist bis zum Monatsende zu bezahlen und wird mit der Post zugestellt.'), 'deu')
+        self.assertEqual(language.detect_language_from_text(
+            'The invoice is due at the end of the month and will be sent to you by mail.'), 'eng')
+        self.assertEqual(language.detect_language_from_text(
+            'La facture est payable à la fin du mois et vous sera envoyée par la poste.'), 'fra')
+
+    def test_mixed_text_uses_two_models(self):
+        text = ('Die Rechnung ist bis zum Monatsende zu bezahlen und wird mit der Post zugestellt. '
+                'The invoice is due at the end of the month and will be sent by mail.')
+        self.assertEqual(set(language.detect_language_from_text(text).split('+')), {'deu', 'eng'})
+
+    def test_uncertain_text_uses_all_models(self):
+        self.assertEqual(language.detect_language_from_text('4711 CHF 1234.50 / 30.09.2025'),
+                         language.ALL_LANGUAGES)
+        self.assertEqual(language.detect_language_from_text('kurz'), 'deu+eng')
+
+    def test_probe_runs_on_downscaled_page(self):
+        image = Image.new('RGB', (2000, 3000), 'white')
+        with mock.patch('pytesseract.image_to_string',
+                        return_value='Sehr geehrte Damen und Herren, die Lieferung ist für Montag geplant.') as ocr:
+            self.assertEqual(language.probe_language(image), 'deu')
+
+        probe_image = ocr.call_args[0][0]
+        self.assertEqual(probe_image.size, (1000, 1500))
+        self.assertEqual(ocr.call_args[1]['lang'], language.ALL_LANGUAGES)
+
+    def test_probe_without_text_keeps_all_models(self):
+        with mock.patch('pytesseract.image_to_string', return_value='  \n'):
+            self.assertEqual(language.probe_language(Image.new('L', (100, 100), 255)), language.ALL_LANGUAGES)
+
+
+if __name__ == '__main__':
+    unittest.main()
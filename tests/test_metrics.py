@@ -0,0 +1,79 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from src import cache, jobs, metrics
+from src.api import app
+from benchmarks.corpus import build_corpus
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        for patcher in (mock.patch.object(metrics, 'METRICS_DIR', os.path.join(self.tmp.name, 'metrics')),
+                        mock.patch.object(cache, 'CACHE_DIR', os.path.join(self.tmp.name, 'cache')),
+                        mock.patch.object(jobs, 'JOBS_DIR', os.path.join(self.tmp.name, 'jobs')),
+                        mock.patch.dict(metrics._state, {'pid': None}),
+                        mock.patch.dict(os.environ, {'OCR_CACHE_ENABLED': '0'})):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_span_records_histogram_and_logs_tags(self):
+        with self.assertLogs('src.metrics', level='DEBUG') as logs:
+            with metrics.span('rasterize', pages='1-4', dpi=300, lang=None):
+                pass
+        self.assertRegex(logs.output[0], r'span stage=rasterize duration_ms=[\d.]+ status=ok pages=1-4 dpi=300$')
+
+        output = metrics.render()
+        self.assertIn('# TYPE pdf2ocr_stage_seconds histogram', output)
+        self.assertIn('pdf2ocr_stage_seconds_count{stage="rasterize"} 1', output)
+        self.assertIn('pdf2ocr_stage_seconds_bucket{stage="rasterize",le="+Inf"} 1', output)
+
+    def test_render_sums_all_worker_processes(self):
+        os.makedirs(metrics.METRICS_DIR)
+        other = {'counters': [['pdf2ocr_pages_total', [['source', 'ocr']], 5]], 'histograms': []}
+        with open(os.path.join(metrics.METRICS_DIR, '99999999-abcd1234.json'), 'w') as f:
+            json.dump(other, f)
+
+        metrics.inc('pdf2ocr_pages_total', 2, source='ocr')
+        self.assertIn('pdf2ocr_pages_total{source="ocr"} 7', metrics.render())
+
+    def test_recycled_worker_is_folded_in_and_counters_stay_monotonic(self):
+        metrics.inc('pdf2ocr_pages_total', 5, source='ocr')
+        metrics.flush()
+        metrics.retire(os.getpid())  # Worker beendet, Gunicorn-Master faltet ihn ein
+        self.assertEqual(os.listdir(metrics.METRICS_DIR), ['retired.json'])
+
+        metrics._state['pid'] = None  # neuer Worker mit derselben PID
+        metrics.inc('pdf2ocr_pages_total', 1, source='ocr')
+        self.assertIn('pdf2ocr_pages_total{source="ocr"} 6', metrics.render())
+        metrics.retire(os.getpid())
+        self.assertIn('pdf2ocr_pages_total{source="ocr"} 6', metrics.render())
+        self.assertEqual(len(os.listdir(metrics.METRICS_DIR)), 2)  # retired.json und die Datei von render
+
+        metrics.reset()
+        self.assertEqual(os.listdir(metrics.METRICS_DIR), [])
+
+    def test_metrics_endpoint(self):
+        document = build_corpus(quick=True)[0]
+        from src.ocr import process_file
+        process_file(io.BytesIO(document['data']), document['filename'])
+
+        response = app.test_client().get('/metrics')
+        body = response.get_data(as_text=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain; version=0.0.4'))
+        self.assertIn('pdf2ocr_stage_seconds_count{stage="extract"} 1', body)
+        self.assertIn('pdf2ocr_pages_total{source="embedded"} 1', body)
+        self.assertIn('pdf2ocr_documents_total{status="ok",type="pdf"} 1', body)
+        self.assertIn('pdf2ocr_jobs{status="queued"} 0', body)
+        self.assertIn('pdf2ocr_cache_hits_total{cache="result"} 0', body)
+
+
+if __name__ == '__main__':
+    unittest.main()
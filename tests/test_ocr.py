@@ -1,22 +1,58 @@
+import io
+import os
 import unittest
-from src.ocr import process_image  # Assuming process_image is the function to test
+from unittest import mock
 
-class TestOCR(unittest.TestCase):
+from PIL import Image, ImageDraw
+
+from src.ocr import process_file
+from benchmarks.corpus import build_corpus
+
+
+def _ocr_data(text):
+    words = text.split()
+    return {
+        'level': [5] * len(words), 'text': words, 'conf': ['90'] * len(words),
+        'left': [10 + 60 * i for i in range(len(words))], 'top': [10] * len(words),
+        'width': [50] * len(words), 'height': [12] * len(words),
+        'block_num': [1] * len(words), 'par_num': [1] * len(words), 'line_num': [1] * len(words),
+    }
+
+
+class TestProcessFile(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ, {'OCR_CACHE_ENABLED': '0', 'OCR_ENGINE': 'pytesseract',
+                                               'OCR_LANGUAGE_PROBE': '0', 'OCR_PREPROCESS': 'none'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
 
     def test_process_image_valid(self):
-        # Test with a valid image file
-        result = process_image('path/to/valid/image.png')
-        self.assertIsInstance(result, str)  # Assuming the result is a string of extracted text
+        image = Image.new('RGB', (300, 100), 'white')
+        ImageDraw.Draw(image).rectangle((10, 10, 250, 22), fill='black')
+        stream = io.BytesIO()
+        image.save(stream, 'PNG')
+        stream.seek(0)
+        with mock.patch('pytesseract.image_to_data', return_value=_ocr_data('Rechnung Nr. 4711')):
+            result = process_file(stream, 'beleg.png')
+        self.assertEqual(result, 'Rechnung Nr. 4711')
+
+    def test_process_text_pdf_without_ocr(self):
+        document = build_corpus(quick=True)[0]
+        self.assertEqual(document['kind'], 'text-pdf')
+        with mock.patch('pytesseract.image_to_data') as image_to_data:
+            result = process_file(io.BytesIO(document['data']), document['filename'])
+        image_to_data.assert_not_called()
+        self.assertEqual(' '.join(result.split()), ' '.join(document['expected'].split()))
 
     def test_process_image_invalid(self):
-        # Test with an invalid image file
-        result = process_image('path/to/invalid/image.png')
-        self.assertIsNone(result)  # Assuming the function returns None for invalid input
+        result = process_file(io.BytesIO(b'kein Bild'), 'kaputt.png')
+        self.assertEqual(result, 'Kein Text gefunden.')
+
+    def test_process_unsupported_file(self):
+        result = process_file(io.BytesIO(b''), 'notiz.docx')
+        self.assertIn('Unterstützte Formate', result)
 
-    def test_process_image_empty(self):
-        # Test with an empty file
-        result = process_image('path/to/empty/image.png')
-        self.assertIsNone(result)  # Assuming the function returns None for empty input
 
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
@@ -0,0 +1,465 @@
+import io
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import PyPDF2
+from PIL import Image, ImageDraw
+
+from src import ocr
+
+
+def _ocr_data(words, conf='91.5'):
+    """Baut eine `image_to_data`-Ausgabe (Output.DICT) aus (text, block, par, line, box[, conf]) Tupeln."""
+    data = {key: [] for key in ('level', 'text', 'left', 'top', 'width', 'height', 'conf',
+                                'block_num', 'par_num', 'line_num')}
+    for text, block, par, line, (left, top, width, height), *word_conf in words:
+        data['level'].append(5)
+        data['text'].append(text)
+        data['left'].append(left)
+        data['top'].append(top)
+        data['width'].append(width)
+        data['height'].append(height)
+        data['conf'].append(word_conf[0] if word_conf else conf)
+        data['block_num'].append(block)
+        data['par_num'].append(par)
+        data['line_num'].append(line)
+    return data
+
+
+SAMPLE_DATA = _ocr_data([
+    ('Rechnung', 1, 1, 1, (10, 10, 80, 20)),
+    ('Nr.', 1, 1, 1, (100, 10, 30, 20)),
+    ('Betrag', 1, 1, 2, (10, 40, 60, 20)),
+    ('Total', 2, 1, 1, (10, 90, 50, 20)),
+])
+
+
+def _page_image(size=(200, 150)):
+    """Seitenbild mit dunklen Balken als Textzeilen, damit es nicht als Leerseite gilt."""
+    image = Image.new('RGB', size, 'white')
+    draw = ImageDraw.Draw(image)
+    for top in range(10, size[1] - 20, 30):
+        draw.rectangle((10, top, size[0] - 60, top + 12), fill='black')
+    return image
+
+
+def _a4_page(dpi, font_size):
+    """A4-Seite in der angegebenen Auflösung mit Wortbalken in der Höhe einer Schrift von `font_size` Punkt."""
+    size = (int(8.27 * dpi), int(11.69 * dpi))
+    image = Image.new('L', size, 255)
+    if font_size:
+        draw = ImageDraw.Draw(image)
+        height = max(1, round(font_size / 72 * dpi))
+        for top in range(dpi, size[1] - dpi, 2 * height):
+            for left in range(dpi, size[0] - dpi, 6 * height):
+                draw.rectangle((left, top, left + 5 * height, top + height - 1), fill=0)
+    return image
+
+
+class TestPageOCR(unittest.TestCase):
+
+    def setUp(self):
+        # Ohne Vorverarbeitung, damit die Wortboxen direkt den Testdaten entsprechen
+        patcher = mock.patch.dict(os.environ, {'OCR_CACHE_ENABLED': '0', 'OCR_ENGINE': 'pytesseract', 'OCR_PREPROCESS': 'none'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_ocr_page_runs_tesseract_once(self):
+        image = _page_image()
+        with mock.patch('pytesseract.image_to_data', return_value=SAMPLE_DATA) as image_to_data:
+            result = ocr.ocr_page(image)
+
+        self.assertEqual(image_to_data.call_count, 1)
+        self.assertEqual(result['text'], 'Rechnung Nr.\nBetrag\n\nTotal')
+        self.assertEqual(len(result['words']), 4)
+        self.assertEqual(result['words'][0]['conf'], 91.5)
+        self.assertEqual((result['width'], result['height']), (200, 150))
+
+    def test_blank_page_skips_tesseract(self):
+        image = Image.new('RGB', (1654, 2339), 'white')
+        draw = ImageDraw.Draw(image)
+        for x, y in ((100, 200), (900, 1500), (1500, 2200)):  # Staub und Lochung
+            draw.ellipse((x, y, x + 6, y + 6), fill='black')
+
+        with mock.patch('pytesseract.image_to_data') as image_to_data:
+            result = ocr.ocr_page(image)
+
+        image_to_data.assert_not_called()
+        self.assertTrue(result['blank'])
+        self.assertEqual(result['text'], '')
+        self.assertFalse(ocr.is_blank_page(_page_image()))
+        self.assertFalse(ocr.is_blank_page(Image.eval(_page_image(), lambda v: 255 - v)))  # helle Schrift
+
+    def test_only_low_confidence_lines_are_recognized_again(self):
+        first_pass = _ocr_data([
+            ('Rechnung', 1, 1, 1, (10, 10, 80, 20)),
+            ('Nr.', 1, 1, 1, (100, 10, 30, 20)),
+            ('Betr4g', 1, 1, 2, (10, 40, 60, 20), '30'),
+            ('Total', 2, 1, 1, (10, 90, 50, 20)),
+        ])
+        second_pass = _ocr_data([('Betrag', 1, 1, 1, (16, 16, 60, 20), '88')])
+
+        with mock.patch('pytesseract.image_to_data', side_effect=[first_pass, second_pass]) as image_to_data:
+            result = ocr.ocr_page(_page_image(), lang='deu')
+
+        self.assertEqual(image_to_data.call_count, 2)
+        strip = image_to_data.call_args[0][0]
+        self.assertEqual(strip.size, (92, 52))  # nur der Ausschnitt der unsicheren Zeile
+        self.assertEqual(image_to_data.call_args[1]['config'], '--psm 6')
+        self.assertEqual(image_to_data.call_args[1]['lang'], 'deu')  # Sprache des Dokuments bleibt
+        self.assertEqual(result['text'], 'Rechnung Nr.\nBetrag\n\nTotal')
+        word = result['words'][2]
+        self.assertEqual((word['left'], word['top'], word['line'], word['conf']), (10, 40, 2, 88.0))
+
+    def test_page_without_confident_lines_is_not_recognized_again(self):
+        with mock.patch('pytesseract.image_to_data', return_value=_ocr_data(
+                [('~', 1, 1, 1, (10, 10, 20, 20)), ('%', 1, 1, 2, (10, 40, 20, 20))], conf='12')) as image_to_data:
+            ocr.ocr_page(_page_image())
+
+        self.assertEqual(image_to_data.call_count, 1)
+
+    def test_create_pdf_reuses_word_boxes(self):
+        image = _page_image()
+        with mock.patch('pytesseract.image_to_data', return_value=SAMPLE_DATA):
+            page_result = ocr.ocr_page(image)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            output_path = os.path.join(tmp, 'out.pdf')
+            with mock.patch('pytesseract.image_to_data') as image_to_data:
+                success = ocr.create_pdf_with_text(__file__, [page_result], output_path, images_cache=[image])
+            self.assertTrue(success)
+            image_to_data.assert_not_called()
+            self.assertGreater(os.path.getsize(output_path), 0)
+
+    def test_text_layer_is_written_per_line_in_invisible_mode(self):
+        from reportlab.pdfgen import canvas
+
+        words = ocr._words_from_ocr_data(SAMPLE_DATA)
+        buffer = io.BytesIO()
+        c = canvas.Canvas(buffer, pageCompression=0)
+        self.assertEqual(ocr._draw_text_layer(c, words, 200, 150, (0, 0, 400, 300)), 4)
+        content = '\n'.join(c._code)
+        c.save()
+
+        self.assertEqual(content.count('BT '), 3)  # eine Textzeile pro OCR-Zeile
+        self.assertEqual(content.count(' Tr '), 1)
+        self.assertEqual(content.count(' Tf '), 1)  # gleiche Zeilenhöhe, Font wird weiterverwendet
+        text = PyPDF2.PdfReader(buffer).pages[0].extract_text()
+        self.assertIn('Rechnung Nr.', text)
+        self.assertIn('Betrag', text)
+
+    def test_ocr_pages_keeps_page_order(self):
+        images = [Image.new('RGB', (10 + i, 10), 'white') for i in range(6)]
+
+        def fake_ocr_page(image, initial_text=""):
+            time.sleep(0.01 * (16 - image.size[0]))  # spätere Seiten werden zuerst fertig
+            return ocr._empty_page_result(image)
+
+        with mock.patch.dict(os.environ, {'OCR_WORKERS': '3'}), \
+                mock.patch.object(ocr, 'ocr_page', side_effect=fake_ocr_page):
+            results = ocr.ocr_pages(images)
+
+        self.assertEqual([r['width'] for r in results], [10, 11, 12, 13, 14, 15])
+
+    def test_ocr_pages_isolates_page_errors(self):
+        images = [Image.new('RGB', (10, 10), 'white') for _ in range(3)]
+        with mock.patch.dict(os.environ, {'OCR_WORKERS': '1'}), \
+                mock.patch.object(ocr, 'ocr_page', side_effect=[ocr._empty_page_result(images[0]), RuntimeError('kaputt'), ocr._empty_page_result(images[2])]):
+            results = ocr.ocr_pages(images)
+
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[1]['text'], '')
+
+
+def _scanned_pdf_bytes(page_count, text_pages=()):
+    """Erzeugt eine PDF ohne eingebetteten Text (nur Grafik) wie bei gescannten Dokumenten.
+
+    Seiten in `text_pages` (0-basiert) erhalten stattdessen eingebetteten Text.
+    """
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer)
+    for i in range(page_count):
+        if i in text_pages:
+            c.drawString(100, 700, f'Digitales Deckblatt Nummer {i + 1} mit eingebettetem Text')
+        else:
+            c.rect(100, 100, 200, 50, fill=1)
+        c.showPage()
+    c.save()
+    buffer.seek(0)
+    return buffer
+
+
+def _read_result_pdf(path):
+    """Liest eine Ergebnis-PDF ein und löscht die temporäre Datei wie die API nach dem Versand."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    os.unlink(path)
+    assert data.startswith(b'%PDF')
+    return PyPDF2.PdfReader(io.BytesIO(data))
+
+
+class TestStreamingPipeline(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ, {'OCR_CACHE_ENABLED': '0', 'OCR_ENGINE': 'pytesseract', 'OCR_DPI': '200'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_pdf_is_rasterized_in_windows(self):
+        rendered = []
+
+        def fake_convert(pdf_path, dpi=200, first_page=None, last_page=None, **kwargs):
+            rendered.append((first_page, last_page))
+            return [_page_image() for _ in range(first_page, last_page + 1)]
+
+        with mock.patch.dict(os.environ, {'OCR_WORKERS': '1', 'OCR_RENDER_WINDOW': '2'}), \
+                mock.patch.object(ocr, 'convert_from_path', side_effect=fake_convert), \
+                mock.patch('pytesseract.image_to_data', return_value=SAMPLE_DATA):
+            result = ocr.extract_text_from_pdf(_scanned_pdf_bytes(5))
+
+        self.assertEqual(rendered, [(1, 2), (3, 4), (5, 5)])
+        self.assertIsInstance(result, os.PathLike)
+        self.assertEqual(len(_read_result_pdf(result).pages), 5)
+
+    def test_mixed_pdf_only_ocrs_scanned_pages(self):
+        rendered = []
+
+        def fake_convert(pdf_path, dpi=200, first_page=None, last_page=None, **kwargs):
+            rendered.append((first_page, last_page))
+            return [_page_image() for _ in range(first_page, last_page + 1)]
+
+        with mock.patch.dict(os.environ, {'OCR_WORKERS': '1', 'OCR_RENDER_WINDOW': '4'}), \
+                mock.patch.object(ocr, 'convert_from_path', side_effect=fake_convert), \
+                mock.patch('pytesseract.image_to_data', return_value=SAMPLE_DATA) as image_to_data:
+            result = ocr.extract_text_from_pdf(_scanned_pdf_bytes(4, text_pages=(0, 2)))
+
+        self.assertEqual(rendered, [(2, 2), (4, 4)])
+        self.assertEqual(image_to_data.call_count, 2)
+        pages = _read_result_pdf(result).pages
+        self.assertEqual(len(pages), 4)
+        self.assertIn('Digitales Deckblatt Nummer 1', pages[0].extract_text())
+        self.assertIn('Digitales Deckblatt Nummer 3', pages[2].extract_text())
+
+    def test_language_is_probed_once_per_document(self):
+        def fake_convert(pdf_path, dpi=200, first_page=None, last_page=None, **kwargs):
+            return [_page_image() for _ in range(first_page, last_page + 1)]
+
+        details = {}
+        with mock.patch.dict(os.environ, {'OCR_WORKERS': '1', 'OCR_RENDER_WINDOW': '2'}), \
+                mock.patch.object(ocr, 'convert_from_path', side_effect=fake_convert), \
+                mock.patch('pytesseract.image_to_string', return_value='Die Rechnung ist bis zum Monatsende zu bezahlen.') as probe, \
+                mock.patch('pytesseract.image_to_data', return_value=SAMPLE_DATA) as image_to_data:
+            result = ocr.extract_text_from_pdf(_scanned_pdf_bytes(3), details=details)
+        _read_result_pdf(result)
+
+        self.assertEqual(probe.call_count, 1)
+        self.assertEqual([call[1]['lang'] for call in image_to_data.call_args_list], ['deu'] * 3)
+        self.assertEqual(details['language'], 'deu')
+
+    def test_auto_dpi_renders_each_page_only_as_fine_as_needed(self):
+        font_sizes = {1: 10, 2: 24, 3: 0, 4: 6}  # Punkt, 0 = leere Seite
+        rendered = []
+
+        def fake_convert(pdf_path, dpi=200, first_page=None, last_page=None, **kwargs):
+            rendered.append((first_page, last_page, dpi))
+            return [_a4_page(dpi, font_sizes[page]) for page in range(first_page, last_page + 1)]
+
+        with mock.patch.dict(os.environ, {'OCR_WORKERS': '1', 'OCR_DPI': 'auto', 'OCR_RENDER_WINDOW': '4'}), \
+                mock.patch.object(ocr, 'convert_from_path', side_effect=fake_convert):
+            windows = list(ocr.iter_pdf_page_windows('scan.pdf', 4))
+
+        self.assertEqual(rendered, [(1, 4, ocr.PROBE_DPI), (1, 1, 200), (2, 3, 100), (4, 4, 325)])
+        self.assertEqual([image.info['dpi'][0] for image in windows[0][1]], [200, 100, 100, 325])
+
+    def test_document_pages_keep_order_without_building_a_pdf(self):
+        def fake_convert(pdf_path, dpi=200, first_page=None, last_page=None, **kwargs):
+            return [_page_image() for _ in range(first_page, last_page + 1)]
+
+        with mock.patch.dict(os.environ, {'OCR_WORKERS': '1', 'OCR_RENDER_WINDOW': '2'}), \
+                mock.patch.object(ocr, 'convert_from_path', side_effect=fake_convert), \
+                mock.patch.object(ocr, '_write_searchable_pdf') as write_pdf, \
+                mock.patch('pytesseract.image_to_data', return_value=SAMPLE_DATA):
+            pages = list(ocr.iter_document_pages(_scanned_pdf_bytes(3, text_pages=(1,)), 'mix.pdf'))
+
+        write_pdf.assert_not_called()
+        self.assertEqual([(index, page['source']) for index, page in pages], [(0, 'ocr'), (1, 'embedded'), (2, 'ocr')])
+        self.assertEqual((pages[0][1]['dpi'], len(pages[0][1]['words'])), (200, 4))
+        self.assertIn('Digitales Deckblatt Nummer 2', pages[1][1]['text'])
+
+    def test_page_that_cannot_be_rasterized_is_an_error_entry(self):
+        def fake_convert(pdf_path, dpi=200, first_page=None, last_page=None, **kwargs):
+            if first_page <= 2 <= last_page:
+                raise RuntimeError('pdftoppm: Syntax Error')
+            return [_page_image() for _ in range(first_page, last_page + 1)]
+
+        with mock.patch.dict(os.environ, {'OCR_WORKERS': '1', 'OCR_RENDER_WINDOW': '3'}), \
+                mock.patch.object(ocr, 'convert_from_path', side_effect=fake_convert), \
+                mock.patch('pytesseract.image_to_data', return_value=SAMPLE_DATA):
+            pages = list(ocr.iter_document_pages(_scanned_pdf_bytes(4), 'scan.pdf'))
+
+        self.assertEqual([index for index, _ in pages], [0, 1, 2, 3])
+        self.assertEqual([bool(page.get('error')) for _, page in pages], [False, True, False, False])
+        self.assertIn('Syntax Error', pages[1][1]['error'])
+        self.assertEqual(len(pages[2][1]['words']), 4)
+
+    def test_page_range_rasterizes_only_requested_pages(self):
+        rendered = []
+
+        def fake_convert(pdf_path, dpi=200, first_page=None, last_page=None, **kwargs):
+            rendered.append((first_page, last_page))
+            return [_page_image() for _ in range(first_page, last_page + 1)]
+
+        with mock.patch.dict(os.environ, {'OCR_WORKERS': '1', 'OCR_RENDER_WINDOW': '4'}), \
+                mock.patch.object(ocr, 'convert_from_path', side_effect=fake_convert), \
+                mock.patch('pytesseract.image_to_data', return_value=SAMPLE_DATA):
+            result = ocr.extract_text_from_pdf(_scanned_pdf_bytes(6, text_pages=(1,)), pages=ocr.parse_page_ranges('1-2,5'))
+
+        self.assertEqual(rendered, [(1, 1), (5, 5)])
+        pages = _read_result_pdf(result).pages
+        self.assertEqual(len(pages), 3)
+        self.assertIn('Digitales Deckblatt Nummer 2', pages[1].extract_text())
+
+    def test_regions_only_ocr_the_crops(self):
+        def fake_convert(pdf_path, dpi=200, first_page=None, last_page=None, **kwargs):
+            return [_page_image() for _ in range(first_page, last_page + 1)]
+
+        regions = ocr.parse_regions('2:0,0,1,0.2; 2:0.5,0.5,1,1')
+        with mock.patch.dict(os.environ, {'OCR_WORKERS': '1', 'OCR_PREPROCESS': 'none', 'OCR_SKIP_BLANK_PAGES': '0'}), \
+                mock.patch.object(ocr, 'convert_from_path', side_effect=fake_convert) as convert, \
+                mock.patch('pytesseract.image_to_data', return_value=SAMPLE_DATA) as image_to_data:
+            pages = list(ocr.iter_document_pages(_scanned_pdf_bytes(3, text_pages=(1,)), 'scan.pdf', regions=regions))
+
+        # Nur Seite 2 hat Bereiche, auch ihr eingebetteter Text wird durch die Ausschnitte ersetzt
+        self.assertEqual([(call[1]['first_page'], call[1]['last_page']) for call in convert.call_args_list], [(2, 2)])
+        self.assertEqual([call[0][0].size for call in image_to_data.call_args_list], [(200, 30), (100, 75)])
+        self.assertEqual([index for index, _ in pages], [1])
+        page = pages[0][1]
+        self.assertEqual(page['regions'], [[0, 0, 200, 30], [100, 75, 200, 150]])
+        self.assertEqual((page['words'][4]['left'], page['words'][4]['top']), (110, 85))  # in Seitenkoordinaten
+        self.assertEqual(page['text'].count('Rechnung'), 2)
+
+    def test_page_and_region_parameters_are_validated(self):
+        self.assertEqual(ocr.parse_page_ranges('3, 1-2'), [0, 1, 2])
+        self.assertEqual(ocr.parse_regions('2:0,0,1,0.5'), [{'page': 1, 'box': [0.0, 0.0, 1.0, 0.5]}])
+        for spec in ('0', '3-1', 'a'):
+            self.assertRaises(ValueError, ocr.parse_page_ranges, spec)
+
+    def test_huge_page_range_is_rejected_without_building_the_index_list(self):
+        self.assertEqual(len(ocr.parse_page_ranges(f'1-{ocr.MAX_PAGE_NUMBER}')), ocr.MAX_PAGE_NUMBER)
+        # Würde ohne Obergrenze zwei Milliarden Indizes anlegen
+        with self.assertRaisesRegex(ValueError, 'above'):
+            ocr.parse_page_ranges('1-2000000000')
+        for spec in ('0,0,1', '0.5,0,0.2,1', '0,0,1,2', 'x:0,0,1,1'):
+            self.assertRaises(ValueError, ocr.parse_regions, spec)
+
+    def test_born_digital_pdf_returns_text_without_rasterizing(self):
+        with mock.patch.object(ocr, 'convert_from_path') as convert:
+            result = ocr.extract_text_from_pdf(_scanned_pdf_bytes(2, text_pages=(0, 1)))
+
+        convert.assert_not_called()
+        self.assertIn('Digitales Deckblatt Nummer 2', result)
+
+    def test_multi_frame_tiff_recognizes_every_frame(self):
+        frames = [_page_image() for _ in range(3)]
+        stream = io.BytesIO()
+        frames[0].save(stream, 'TIFF', save_all=True, append_images=frames[1:])
+        progress = []
+
+        with mock.patch.dict(os.environ, {'OCR_WORKERS': '1', 'OCR_RENDER_WINDOW': '2', 'OCR_LANGUAGE_PROBE': '0'}), \
+                mock.patch('pytesseract.image_to_data', return_value=SAMPLE_DATA) as image_to_data:
+            text = ocr.process_file(io.BytesIO(stream.getvalue()), 'fax.tif',
+                                    progress=lambda done, total: progress.append((done, total)))
+            result = ocr.process_file(io.BytesIO(stream.getvalue()), 'fax.tif', image_output='pdf')
+
+        self.assertEqual(image_to_data.call_count, 6)
+        self.assertIn('--- Seite 3 ---\nRechnung Nr.', text)
+        self.assertEqual(progress, [(1, 3), (2, 3), (3, 3)])
+        self.assertIsInstance(result, os.PathLike)
+        self.assertEqual(len(_read_result_pdf(result).pages), 3)
+
+    def test_frames_are_decoded_per_window(self):
+        stream = io.BytesIO()
+        frames = [_page_image() for _ in range(5)]
+        for i, frame in enumerate(frames):
+            ImageDraw.Draw(frame).rectangle((150 + 5 * i, 10, 152 + 5 * i, 20), fill='red')  # GIF fasst gleiche Frames zusammen
+        frames[0].save(stream, 'GIF', save_all=True, append_images=frames[1:])
+        image = Image.open(stream)
+
+        windows = ocr.iter_image_frame_windows(image, window=2)
+        indices, first = next(windows)
+        self.assertEqual((indices, image.tell()), ([0, 1], 1))  # spätere Frames noch nicht dekodiert
+        self.assertEqual(first[0].mode, 'RGB')
+        self.assertEqual([indices for indices, _ in windows], [[2, 3], [4]])
+
+
+class TestOverlayMode(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ, {'OCR_CACHE_ENABLED': '0', 'OCR_ENGINE': 'pytesseract', 'OCR_WORKERS': '1'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_display_coordinates_are_unrotated(self):
+        # Seite 100x200 (Nutzerraum), angezeigt um 90° gedreht als 200x100
+        self.assertEqual(ocr._display_to_user_space(0, 100, 100, 200, 90), (0, 0))
+        self.assertEqual(ocr._display_to_user_space(200, 100, 100, 200, 90), (0, 200))
+        self.assertEqual(ocr._display_to_user_space(0, 0, 100, 200, 180), (100, 200))
+        self.assertEqual(ocr._display_to_user_space(0, 0, 100, 200, 270), (0, 200))
+
+    def test_text_layer_follows_the_rendered_mediabox_not_the_cropbox(self):
+        from reportlab.pdfgen import canvas
+
+        buffer = io.BytesIO()
+        c = canvas.Canvas(buffer, pagesize=(200, 150))
+        c.rect(10, 10, 50, 20, fill=1)
+        c.save()
+        writer = PyPDF2.PdfWriter()
+        writer.add_page(PyPDF2.PdfReader(io.BytesIO(buffer.getvalue())).pages[0])
+        writer.pages[0].cropbox = PyPDF2.generic.RectangleObject((20, 20, 180, 130))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            source_path, layer_path = os.path.join(tmp, 'scan.pdf'), os.path.join(tmp, 'layer.pdf')
+            with open(source_path, 'wb') as f:
+                writer.write(f)
+            # Bild der ganzen MediaBox (200x150 pt bei 72 DPI), wie es pdftoppm liefert
+            page_result = {'words': ocr._words_from_ocr_data(SAMPLE_DATA), 'width': 200, 'height': 150}
+            self.assertTrue(ocr._write_text_layer_pdf([(0, _page_image(), page_result)], source_path, layer_path))
+            content = PyPDF2.PdfReader(layer_path).pages[0].get_contents().get_data().decode('latin-1')
+
+        # 'Rechnung' bei x=10, Grundlinie 150 - (10 + 20) = 120 im Nutzerraum der MediaBox
+        self.assertIn('1 0 0 1 10 120 Tm', content)
+
+    def test_overlay_keeps_original_pages(self):
+        source = PyPDF2.PdfReader(_scanned_pdf_bytes(2))
+        writer = PyPDF2.PdfWriter()
+        for page in source.pages:
+            writer.add_page(page)
+        writer.pages[1].rotate(90)
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        buffer.seek(0)
+
+        def fake_convert(pdf_path, dpi=200, first_page=None, last_page=None, **kwargs):
+            return [_page_image() for _ in range(first_page, last_page + 1)]
+
+        with mock.patch.object(ocr, 'convert_from_path', side_effect=fake_convert), \
+                mock.patch('pytesseract.image_to_data', return_value=SAMPLE_DATA):
+            result = ocr.extract_text_from_pdf(buffer, output_mode='overlay')
+
+        pages = _read_result_pdf(result).pages
+        self.assertEqual(len(pages), 2)
+        self.assertEqual(pages[1].rotation, 90)
+        for original, page in zip(source.pages, pages):
+            self.assertEqual(list(page.mediabox), list(original.mediabox))
+            self.assertIn('Rechnung', page.extract_text())
+            xobjects = page['/Resources'].get('/XObject') or {}
+            self.assertEqual(len(xobjects), 0)  # keine neu eingebetteten Seitenbilder
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import random
+import unittest
+from unittest import mock
+
+from PIL import Image, ImageChops, ImageDraw, ImageOps
+
+from src import utils
+from benchmarks.corpus import apply_shadow, page_lines, render_page_image
+
+
+def _scan(line_height=16, skew=0.0, border=False, size=(1200, 1600)):
+    """Seitenbild mit Balken als Textzeilen, optional schräg und mit dunklem Scannerrand."""
+    image = Image.new('RGB', size, 'white')
+    draw = ImageDraw.Draw(image)
+    for top in range(200, size[1] - 300, line_height * 3):
+        for left in range(150, size[0] - 250, 120):  # Wörter
+            draw.rectangle((left, top, left + 90, top + line_height), fill=(30, 30, 30))
+    if skew:
+        image = image.rotate(skew, resample=Image.BICUBIC, fillcolor='white')
+    if border:
+        draw = ImageDraw.Draw(image)
+        draw.rectangle((0, 0, size[0], 40), fill='black')
+        draw.rectangle((0, 0, 30, size[1]), fill='black')
+    return image
+
+
+def _ink_box(image):
+    return ImageOps.invert(image.convert('L')).point(lambda v: 255 if v > 128 else 0).getbbox()
+
+
+class TestPreprocessing(unittest.TestCase):
+
+    def test_steps_are_configurable(self):
+        with mock.patch.dict(os.environ, {'OCR_PREPROCESS': 'binarize, deskew'}):
+            self.assertEqual(utils.preprocess_steps(), ('deskew', 'binarize'))
+        with mock.patch.dict(os.environ, {'OCR_PREPROCESS': 'none'}):
+            self.assertEqual(utils.preprocess_steps(), ())
+            image = _scan()
+            processed, transform = utils.preprocess_image(image)
+            self.assertIs(processed, image)
+            self.assertEqual(transform['timings'], {})
+
+    def test_skewed_scan_with_border_is_cleaned_up(self):
+        processed, transform = utils.preprocess_image(_scan(skew=3, border=True), steps=utils.PREPROCESS_STEPS)
+
+        self.assertAlmostEqual(transform['angle'], -3, delta=0.3)  # zurückdrehen
+        self.assertGreater(transform['offset'][0], 30)  # Rand und leerer Bereich abgeschnitten
+        self.assertGreater(transform['offset'][1], 40)
+        self.assertEqual(processed.mode, 'L')
+        self.assertEqual({value for value, count in enumerate(processed.histogram()) if count}, {0, 255})
+        self.assertEqual(set(transform['timings']), set(utils.PREPROCESS_STEPS))
+
+    def test_text_in_shadow_survives_binarization(self):
+        page = render_page_image(page_lines(random.Random(1), 'deu'), 200)
+        ink = ImageOps.invert(page).point(lambda v: 255 if v > 128 else 0)
+        shadowed = apply_shadow(page)
+
+        def ink_kept(binarized):
+            return ImageChops.multiply(ink, ImageOps.invert(binarized)).histogram()[255] / ink.histogram()[255]
+
+        def false_ink(binarized):
+            return ImageChops.subtract(ImageOps.invert(binarized), ink).histogram()[255] / (page.size[0] * page.size[1])
+
+        processed, _ = utils.preprocess_image(shadowed, steps=('binarize',))
+        self.assertGreater(ink_kept(processed), 0.95)
+        self.assertLess(false_ink(processed), 0.01)
+        # Ein globaler Schwellwert färbt den Schattenbereich schwarz, der Text darin ist weg
+        with mock.patch.object(utils, 'BINARIZE', 'otsu'):
+            processed, _ = utils.preprocess_image(shadowed, steps=('binarize',))
+        self.assertGreater(false_ink(processed), 0.2)
+
+    def test_large_text_is_scaled_to_target_x_height(self):
+        image = _scan(line_height=80, size=(3000, 4000))
+        processed, transform = utils.preprocess_image(image, steps=('grayscale', 'scale'))
+
+        self.assertLess(transform['scale'], 0.75)
+        self.assertLess(processed.size[0], image.size[0] * 0.75)
+
+    def test_boxes_are_mapped_back_to_original_coordinates(self):
+        image = _scan(line_height=60, skew=2, size=(2400, 3200))
+        processed, transform = utils.preprocess_image(image, steps=utils.PREPROCESS_STEPS)
+        self.assertNotEqual(transform['scale'], 1.0)
+
+        left, top, right, bottom = _ink_box(processed)
+        word = {'text': 'x', 'left': left, 'top': top, 'width': right - left, 'height': bottom - top}
+        mapped = utils.map_words_to_original([word], transform)[0]
+
+        expected = _ink_box(image)
+        tolerance = 0.06 * image.size[0]  # umschließendes Rechteck der gedrehten Box ist etwas größer
+        self.assertAlmostEqual(mapped['left'], expected[0], delta=tolerance)
+        self.assertAlmostEqual(mapped['top'], expected[1], delta=tolerance)
+        self.assertAlmostEqual(mapped['left'] + mapped['width'], expected[2], delta=tolerance)
+        self.assertAlmostEqual(mapped['top'] + mapped['height'], expected[3], delta=tolerance)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import threading
+import unittest
+from unittest import mock
+
+from src import warmup
+from src.api import app
+
+
+class TestWarmUp(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.dict(warmup._state, {'pid': None})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_preload_without_tesseract(self):
+        with mock.patch('pytesseract.image_to_string', side_effect=OSError('tesseract fehlt')), \
+                self.assertLogs('src.warmup', level='WARNING'):
+            warmup.preload()
+        self.assertTrue(warmup._preloaded)
+
+    def test_warm_languages(self):
+        with mock.patch.dict(os.environ, {'OCR_WARM_LANGUAGES': 'deu+eng, deu'}):
+            self.assertEqual(warmup.warm_languages(), ['deu+eng', 'deu'])
+        with mock.patch.dict(os.environ, {'OCR_WARM_LANGUAGES': 'none'}):
+            self.assertEqual(warmup.warm_languages(), [])
+
+    def test_ready_reports_warming_until_engines_are_loaded(self):
+        release = threading.Event()
+
+        def slow_warm_up(langs):
+            release.wait(5)
+            return len(langs)
+
+        client = app.test_client()
+        with mock.patch.object(warmup, '_preloaded', True), \
+                mock.patch.object(warmup.engine, 'warm_up', side_effect=slow_warm_up):
+            response = client.get('/ready')
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.get_json()['status'], 'warming')
+
+            release.set()
+            warmup._state['thread'].join(5)
+            response = client.get('/ready')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['status'], 'ready')
+        self.assertEqual(response.get_json()['engines'], 1)
+        self.assertEqual(client.get('/health').status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()